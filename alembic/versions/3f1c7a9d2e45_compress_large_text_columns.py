@@ -0,0 +1,72 @@
+"""compress large text columns
+
+Revision ID: 3f1c7a9d2e45
+Revises: b66bac4a05cd
+Create Date: 2026-10-19 10:12:03.481207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import config
+from utils.text_compression import compress_text, decompress_text, text_compression_from_config
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c7a9d2e45'
+down_revision: Union[str, Sequence[str], None] = 'b66bac4a05cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# plain table, so the rows are read and written as stored (no CompressedText processing)
+content = sa.table(
+    'content',
+    sa.column('id', sa.String),
+    sa.column('content_data', sa.Text),
+    sa.column('content_html', sa.Text),
+)
+
+
+def _rewrite_rows(transform) -> None:
+    """Walk the content table by primary key in batches and rewrite content_data/content_html with `transform`"""
+    connection = op.get_bind()
+    last_id = ''
+    while True:
+        rows = connection.execute(
+            sa.select(content.c.id, content.c.content_data, content.c.content_html)
+            .where(content.c.id > last_id)
+            .order_by(content.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            content_data, content_html = transform(row.content_data), transform(row.content_html)
+            if (content_data, content_html) != (row.content_data, row.content_html):
+                updates.append({'row_id': row.id, 'content_data': content_data, 'content_html': content_html})
+        if updates:
+            connection.execute(
+                content.update()
+                .where(content.c.id == sa.bindparam('row_id'))
+                .values(content_data=sa.bindparam('content_data'), content_html=sa.bindparam('content_html')),
+                updates,
+            )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    settings = text_compression_from_config(config.config_json)
+    if not settings.get("enabled", True):
+        return
+    _rewrite_rows(lambda value: compress_text(value, settings))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rewrite_rows(decompress_text)
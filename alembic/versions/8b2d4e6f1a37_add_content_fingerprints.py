@@ -0,0 +1,93 @@
+"""add content fingerprints and duplicate links
+
+Revision ID: 8b2d4e6f1a37
+Revises: 3f1c7a9d2e45
+Create Date: 2026-10-19 14:31:52.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import config
+from utils.simhash import fingerprint_columns, FINGERPRINT_BANDS
+from utils.text_compression import decompress_text
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2d4e6f1a37'
+down_revision: Union[str, Sequence[str], None] = '3f1c7a9d2e45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+BAND_COLUMNS = [f'fingerprint_band_{band}' for band in range(FINGERPRINT_BANDS)]
+
+
+def _backfill_fingerprints() -> None:
+    """Fingerprint the contents that are already stored, in batches ordered by id"""
+    min_tokens = config.config_json.get("near_duplicate", {}).get("min_tokens", 5)
+    content = sa.table(
+        'content',
+        sa.column('id', sa.String),
+        sa.column('content_data', sa.Text),
+        sa.column('fingerprint', sa.BigInteger),
+        *[sa.column(column, sa.Integer) for column in BAND_COLUMNS],
+    )
+    connection = op.get_bind()
+    last_id = ''
+    while True:
+        rows = connection.execute(
+            sa.select(content.c.id, content.c.content_data)
+            .where(content.c.id > last_id)
+            .order_by(content.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = [
+            {'row_id': row.id, **fingerprint_columns(decompress_text(row.content_data), min_tokens)}
+            for row in rows
+        ]
+        connection.execute(
+            content.update()
+            .where(content.c.id == sa.bindparam('row_id'))
+            .values({column: sa.bindparam(column) for column in ['fingerprint', *BAND_COLUMNS]}),
+            updates,
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('content', sa.Column('fingerprint', sa.BigInteger(), nullable=True))
+    for column in BAND_COLUMNS:
+        op.add_column('content', sa.Column(column, sa.Integer(), nullable=True))
+        op.create_index(op.f(f'ix_content_{column}'), 'content', [column], unique=False)
+    op.create_table('content_duplicate',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('content_id', sa.String(length=36), nullable=False),
+    sa.Column('duplicate_of_id', sa.String(length=36), nullable=False),
+    sa.Column('hamming_distance', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['content_id'], ['content.id'], ),
+    sa.ForeignKeyConstraint(['duplicate_of_id'], ['content.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_id', 'duplicate_of_id', name='uq_content_duplicate')
+    )
+    op.create_index(op.f('ix_content_duplicate_content_id'), 'content_duplicate', ['content_id'], unique=False)
+    op.create_index(op.f('ix_content_duplicate_duplicate_of_id'), 'content_duplicate', ['duplicate_of_id'], unique=False)
+    _backfill_fingerprints()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_content_duplicate_duplicate_of_id'), table_name='content_duplicate')
+    op.drop_index(op.f('ix_content_duplicate_content_id'), table_name='content_duplicate')
+    op.drop_table('content_duplicate')
+    with op.batch_alter_table('content') as batch_op:
+        for column in BAND_COLUMNS:
+            batch_op.drop_index(batch_op.f(f'ix_content_{column}'))
+            batch_op.drop_column(column)
+        batch_op.drop_column('fingerprint')
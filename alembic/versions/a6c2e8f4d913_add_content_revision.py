@@ -0,0 +1,30 @@
+"""add content revision
+
+Revision ID: a6c2e8f4d913
+Revises: f3b8d1c7e592
+Create Date: 2026-10-19 22:15:47.302651
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e8f4d913'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d1c7e592'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # part of the ETag of GET /contents/, every existing row starts at its first revision
+    op.add_column('content', sa.Column('revision', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.drop_column('revision')
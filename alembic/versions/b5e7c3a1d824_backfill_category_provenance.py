@@ -0,0 +1,33 @@
+"""backfill category provenance
+
+Revision ID: b5e7c3a1d824
+Revises: a6c2e8f4d913
+Create Date: 2026-10-20 09:12:05.664120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e7c3a1d824'
+down_revision: Union[str, Sequence[str], None] = 'a6c2e8f4d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # the classified rows stored before the provenance column were all decided by the category agent
+    op.execute(
+        sa.text("UPDATE content SET category_provenance = 'llm' "
+                "WHERE category_provenance IS NULL AND classification_state = 'classified' AND category IS NOT NULL")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the backfilled rows can't be told apart from the agent's later decisions, they keep 'llm'
+    pass
@@ -0,0 +1,35 @@
+"""add content llm usage columns
+
+Revision ID: c4e8a2f19b63
+Revises: 8b2d4e6f1a37
+Create Date: 2026-10-19 16:02:11.418327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2f19b63'
+down_revision: Union[str, Sequence[str], None] = '8b2d4e6f1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('content', sa.Column('llm_prompt_tokens', sa.Integer(), nullable=True))
+    op.add_column('content', sa.Column('llm_completion_tokens', sa.Integer(), nullable=True))
+    op.add_column('content', sa.Column('llm_latency_ms', sa.Integer(), nullable=True))
+    op.add_column('content', sa.Column('llm_cost_usd', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.drop_column('llm_cost_usd')
+        batch_op.drop_column('llm_latency_ms')
+        batch_op.drop_column('llm_completion_tokens')
+        batch_op.drop_column('llm_prompt_tokens')
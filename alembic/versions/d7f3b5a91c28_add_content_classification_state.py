@@ -0,0 +1,32 @@
+"""add content classification state
+
+Revision ID: d7f3b5a91c28
+Revises: c4e8a2f19b63
+Create Date: 2026-10-19 17:24:40.905112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3b5a91c28'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a2f19b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # every stored content was classified (or fell back to 'other') when it was written
+    op.add_column('content', sa.Column('classification_state', sa.String(), nullable=False, server_default='classified'))
+    op.create_index(op.f('ix_content_classification_state'), 'content', ['classification_state'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_content_classification_state'))
+        batch_op.drop_column('classification_state')
@@ -0,0 +1,36 @@
+"""add content category provenance
+
+Revision ID: e2a9c6d4b817
+Revises: d7f3b5a91c28
+Create Date: 2026-10-19 21:02:13.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9c6d4b817'
+down_revision: Union[str, Sequence[str], None] = 'd7f3b5a91c28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nullable, how the existing rows were classified was never recorded
+    op.add_column('content', sa.Column('category_provenance', sa.String(length=20), nullable=True))
+    op.add_column('content', sa.Column('category_confidence', sa.Float(), nullable=True))
+    op.add_column('content', sa.Column('category_rules', sa.JSON(), nullable=True))
+    op.create_index(op.f('ix_content_category_provenance'), 'content', ['category_provenance'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_content_category_provenance'))
+        batch_op.drop_column('category_rules')
+        batch_op.drop_column('category_confidence')
+        batch_op.drop_column('category_provenance')
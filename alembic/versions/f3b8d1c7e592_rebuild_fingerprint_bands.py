@@ -0,0 +1,64 @@
+"""rebuild fingerprint bands sized to max_distance
+
+Revision ID: f3b8d1c7e592
+Revises: e2a9c6d4b817
+Create Date: 2026-10-19 21:48:30.117406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import config
+from utils.simhash import band_columns, band_layout, to_unsigned, DEFAULT_MAX_DISTANCE, FINGERPRINT_BANDS
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1c7e592'
+down_revision: Union[str, Sequence[str], None] = 'e2a9c6d4b817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+BAND_COLUMNS = [f'fingerprint_band_{band}' for band in range(FINGERPRINT_BANDS)]
+
+
+def _rebuild_bands(layout: list[tuple[int, int]]) -> None:
+    """Recompute the band columns from the stored fingerprints, in batches ordered by id"""
+    content = sa.table(
+        'content',
+        sa.column('id', sa.String),
+        sa.column('fingerprint', sa.BigInteger),
+        *[sa.column(column, sa.Integer) for column in BAND_COLUMNS],
+    )
+    connection = op.get_bind()
+    last_id = ''
+    while True:
+        rows = connection.execute(
+            sa.select(content.c.id, content.c.fingerprint)
+            .where(content.c.id > last_id, content.c.fingerprint.isnot(None))
+            .order_by(content.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            content.update()
+            .where(content.c.id == sa.bindparam('row_id'))
+            .values({column: sa.bindparam(column) for column in BAND_COLUMNS}),
+            [{'row_id': row.id, **band_columns(to_unsigned(row.fingerprint), layout)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # the bands were 8 x 8 bits whatever the distance, now max_distance + 1 wider ones
+    _rebuild_bands(band_layout(config.config_json.get("near_duplicate", {}).get("max_distance", DEFAULT_MAX_DISTANCE)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the previous layout, FINGERPRINT_BANDS bands of 8 bits
+    _rebuild_bands(band_layout(FINGERPRINT_BANDS - 1))
@@ -0,0 +1,147 @@
+"""
+Concurrency benchmark for the content routes: the old handlers (async def calling the sync
+ContentTableService/Session, i.e. blocking the event loop) against the new async repository path.
+
+run from the repository root:
+    python -m benchmarks.bench_async_routes --rows 2000 --concurrency 32 --requests 256
+
+it seeds a temporary SQLite file, fires parallel POST /contents/search_query requests through an
+in-process ASGI client and measures requests/sec plus the /health latency while the searches run.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from models import Base, Content, ContentType, Source, Category, Entity, EntityType
+from deps import get_async_db
+from routes.content_table_router import router as content_table_router
+from schemas.schemas import SearchQuery
+from services.content_table_service import ContentTableService
+
+
+def seed(path: str, rows: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    categories = list(Category)
+    for i in range(rows):
+        content = Content(
+            id=f"content-{i}", source_id=str(i), content_type=ContentType.TEXT,
+            content_data=f"message number {i} about project {i % 50}",
+            source=Source.EMAIL if i % 2 else Source.TELEGRAM, category=categories[i % len(categories)],
+            timestamp=datetime.now() - timedelta(minutes=i),
+        )
+        session.add(content)
+        session.add(Entity(content_id=content.id, entity_type=EntityType.PROJECT, entity_value=f"tag{i % 500}x"))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+
+def build_blocking_app(path: str) -> FastAPI:
+    """The handlers as they were: async def with a synchronous Session inside."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+    app = FastAPI()
+
+    @app.post("/contents/search_query")
+    async def search_contents(search_query: SearchQuery):
+        db = SessionLocal()
+        try:
+            return ContentTableService(db).search_contents(search_query)
+        finally:
+            db.close()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def build_async_app(path: str) -> FastAPI:
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(content_table_router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+async def run_load(app: FastAPI, concurrency: int, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        health_latencies = []
+        done = asyncio.Event()
+
+        async def one_search(i: int):
+            async with semaphore:
+                response = await client.post("/contents/search_query", json={"keywords": [f"tag{i % 500}x"]})
+                response.raise_for_status()
+
+        async def probe_health():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.005)
+
+        probe = asyncio.create_task(probe_health())
+        start = time.perf_counter()
+        await asyncio.gather(*(one_search(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe
+
+    health_latencies.sort()
+    return {
+        "requests_per_sec": requests / elapsed,
+        "health_probes": len(health_latencies),
+        "health_p50_ms": statistics.median(health_latencies) if health_latencies else 0.0,
+        "health_max_ms": health_latencies[-1] if health_latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        for name, app in (("blocking (before)", build_blocking_app(path)), ("async (after)", build_async_app(path))):
+            result = asyncio.run(run_load(app, args.concurrency, args.requests))
+            print(
+                f"{name:<18} {result['requests_per_sec']:8.1f} req/s   "
+                f"/health answered {result['health_probes']:4d}x   "
+                f"p50 {result['health_p50_ms']:7.1f} ms   max {result['health_max_ms']:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
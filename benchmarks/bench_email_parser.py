@@ -0,0 +1,61 @@
+"""
+EmailTextParser throughput over the .eml fixture corpus (test/fixtures/eml), each message parsed as:
+- eager: only the decoding work of a naive walker (every leaf part base64 + utf-8 decoded, no parsing at all)
+- full: the MIME walker, only the chosen text/plain and text/html parts are decoded
+- raw: the streaming parser used for big messages (format='raw'), stops after the first text part
+
+run from the repository root:
+    python -m benchmarks.bench_email_parser --iterations 2000
+"""
+import argparse
+import base64
+import time
+
+from message_parsers.email.email_text_parser import EmailTextParser
+from sources.email.fake_gmail import load_eml_fixtures, eml_to_gmail_message
+
+
+def parse_eager(message: dict) -> list[str]:
+    texts = []
+    stack = [message['payload']]
+    while stack:
+        part = stack.pop()
+        stack.extend(part.get('parts', []))
+        data = part.get('body', {}).get('data')
+        if data:
+            texts.append(base64.urlsafe_b64decode(data + '=' * (-len(data) % 4)).decode('utf-8', errors='replace'))
+    return texts
+
+
+def bench(function, message: dict, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(message)
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    email_parser = EmailTextParser()
+    print(f"{'fixture':<34} {'size':>8} {'eager':>10} {'full':>10} {'raw':>10}  (msg/s)")
+    totals = {'eager': 0.0, 'full': 0.0, 'raw': 0.0}
+    for name, eml in load_eml_fixtures().items():
+        full = eml_to_gmail_message(eml, name, "full")
+        raw = eml_to_gmail_message(eml, name, "raw")
+        rates = {
+            'eager': bench(parse_eager, full, args.iterations),
+            'full': bench(email_parser.parse, full, args.iterations),
+            'raw': bench(email_parser.parse, raw, args.iterations),
+        }
+        for key, rate in rates.items():
+            totals[key] += 1 / rate
+        print(f"{name:<34} {len(eml):>8} {rates['eager']:>10.0f} {rates['full']:>10.0f} {rates['raw']:>10.0f}")
+    count = len(load_eml_fixtures())
+    print(f"{'corpus (mean)':<34} {'':>8} " + " ".join(f"{count / totals[key]:>10.0f}" for key in ('eager', 'full', 'raw')))
+
+
+if __name__ == "__main__":
+    main()
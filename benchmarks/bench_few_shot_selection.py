@@ -0,0 +1,72 @@
+"""
+Agent prompt size with relevance based few-shot selection (ai_agents/<agent>/few_shot.json top_k)
+against the whole examples.json in every prompt, over the .eml fixture corpus (test/fixtures/eml)
+parsed and cleaned the way MessageService prepares the classification input. no request is sent.
+also reports the selection cost per message (one hashing embedding + one matrix-vector product)
+and the size of the byte-stable system prompt every call starts with (what the provider's prompt cache can reuse,
+OpenAI only caches prefixes of 1024 tokens and more).
+
+run from the repository root:
+    python -m benchmarks.bench_few_shot_selection --iterations 200
+"""
+import argparse
+import time
+
+from message_parsers.email.email_text_parser import EmailTextParser
+from services.agent_service import AgentService
+from sources.email.fake_gmail import load_eml_fixtures
+from utils.text_normalization import clean_payload
+from utils.token_count import estimate_tokens
+
+AGENTS = ("category_agent", "entity_agent")
+
+
+def classification_inputs() -> list[dict]:
+    parser = EmailTextParser()
+    inputs = []
+    for eml in load_eml_fixtures().values():
+        content_data = parser.parse_eml(eml)['content_data']
+        inputs.append(clean_payload({key: value for key, value in content_data.items() if key != 'content_html'}))
+    return inputs
+
+
+def prompt_tokens(agent_service: AgentService, agent_name: str, inputs: list[dict]) -> int:
+    total = 0
+    for input_data in inputs:
+        system_prompt, user_message, _ = agent_service.prepare_agent_request(agent_name, input_data)
+        total += estimate_tokens(system_prompt) + estimate_tokens(user_message)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    inputs = classification_inputs()
+    selecting, sending_all = AgentService(), AgentService()
+    print(f"{len(inputs)} messages")
+    for agent_name in AGENTS:
+        selector, all_examples_tokens = sending_all.load_example_selector(agent_name)
+        selector.top_k = None
+        with_selection = prompt_tokens(selecting, agent_name, inputs)
+        without_selection = prompt_tokens(sending_all, agent_name, inputs)
+
+        selector, _ = selecting.load_example_selector(agent_name)
+        static_prefix = estimate_tokens(selecting.load_agent_prompt(agent_name)[0])
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            for input_data in inputs:
+                selector.select(input_data)
+        selection_us = (time.perf_counter() - start) / (args.iterations * len(inputs)) * 1e6
+
+        print(
+            f"{agent_name:15s} top_k {selector.top_k} of {len(selector.examples)} examples ({all_examples_tokens} tokens): "
+            f"prompt ~{without_selection / len(inputs):.0f} -> ~{with_selection / len(inputs):.0f} tokens per call "
+            f"({1 - with_selection / without_selection:.1%} less), static prefix ~{static_prefix} tokens, "
+            f"selection {selection_us:.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+mbox import parsing throughput (messages/s) against the number of parser processes,
+over an mbox built from the .eml fixture corpus (test/fixtures/eml), the database load is left out.
+
+run from the repository root:
+    python -m benchmarks.bench_mail_archive --messages 20000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from sources.email.mail_archive import MailArchiveImporter
+from sources.email.fake_gmail import load_eml_fixtures, write_mbox
+
+
+def build_archive(path: str, messages: int):
+    emls = list(load_eml_fixtures().values())
+    unique = []
+    for index in range(messages):
+        eml = re.sub(rb"(?im)^Message-ID:.*$", b"", emls[index % len(emls)], count=1)
+        unique.append(b"Message-ID: <bench-%d@example.com>\n" % index + eml)
+    write_mbox(path, unique)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.mbox")
+        build_archive(path, args.messages)
+        print(f"{args.messages} messages, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} cores")
+        baseline = None
+        for workers in args.workers:
+            importer = MailArchiveImporter(workers=workers, chunk_size=args.chunk_size)
+            start = time.perf_counter()
+            count = sum(1 for _ in importer.iter_items([path]))
+            rate = count / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print(f"workers {workers:>3}: {rate:>8.0f} msg/s  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Concurrent read/write throughput on SQLite with the performance profile (utils/sqlite_profile.py) on and off.
+
+run from the repository root:
+    python -m benchmarks.bench_sqlite_profile --seconds 5 --writers 2 --readers 4
+
+writer threads insert one content per transaction (like the pollers), reader threads run the
+indexed duplicate lookup done for every message, every thread has its own connection from the engine pool.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Content, ContentType, Source, Category
+from repository.content_repository import ContentRepository
+from utils.sqlite_profile import apply_sqlite_profile, DEFAULT_SQLITE_PROFILE
+
+
+def run(path: str, profile: dict, seconds: float, writers: int, readers: int) -> dict:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                           pool_size=writers + readers)
+    apply_sqlite_profile(engine, profile)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+    counts = {"writes": 0, "reads": 0, "locked_errors": 0}
+    counts_lock = threading.Lock()
+    stop = threading.Event()
+
+    def writer():
+        db = SessionLocal()
+        repository = ContentRepository(db)
+        while not stop.is_set():
+            content = Content(
+                source_id=str(uuid.uuid4()), content_type=ContentType.TEXT, content_data="benchmark message",
+                source=Source.TELEGRAM, category=Category.OTHER, timestamp=datetime.now()
+            )
+            try:
+                repository.create_content(content)
+                key = "writes"
+            except OperationalError:
+                key = "locked_errors"
+            with counts_lock:
+                counts[key] += 1
+        db.close()
+
+    def reader():
+        db = SessionLocal()
+        repository = ContentRepository(db)
+        while not stop.is_set():
+            try:
+                repository.content_exists(str(uuid.uuid4()), Source.TELEGRAM)
+                db.rollback()
+                key = "reads"
+            except OperationalError:
+                db.rollback()
+                key = "locked_errors"
+            with counts_lock:
+                counts[key] += 1
+        db.close()
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {key: value / seconds for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    profiles = (("profile off", {"enabled": False}), ("profile on", DEFAULT_SQLITE_PROFILE))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, profile in profiles:
+            result = run(os.path.join(tmp, f"{uuid.uuid4()}.db"), profile, args.seconds, args.writers, args.readers)
+            print(
+                f"{name:<12} writes {result['writes']:8.1f}/s   reads {result['reads']:8.1f}/s   "
+                f"lock errors {result['locked_errors']:6.1f}/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
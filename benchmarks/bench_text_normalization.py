@@ -0,0 +1,102 @@
+"""
+Text cleaning throughput: utils.text_utils.clean_text (the original) against utils.text_normalization,
+over generated mixed-script corpora (latin, cyrillic, arabic, CJK, emoji, fullwidth forms, combining marks,
+windows-1252 punctuation as C1 characters, control characters, odd whitespace).
+every text is first checked to clean to the exact same output with both, the benchmark stops on a difference.
+
+- single: one clean_text call per message
+- pipeline: what a message goes through today (parser, classification kwargs, agent input: up to 3 passes),
+  against one pass whose result is skipped by the later stages
+- clean_many: the batch API over the whole corpus
+
+run from the repository root:
+    python -m benchmarks.bench_text_normalization --messages 5000 --iterations 5
+"""
+import argparse
+import random
+import time
+
+from utils import text_normalization, text_utils
+
+SCRIPTS = {
+    'latin': "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZàéîõüçñß",
+    'cyrillic': "абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГД",
+    'arabic': "ابتثجحخدذرزسشصضطظعغفقكلمنهوي",
+    'cjk': "的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年",
+    'emoji': "😀🚀📅✅🔥👍🏽",
+    'fullwidth': "ＡＢＣａｂｃ１２３！？",
+    'compat': "ﬁﬂ½²™㎞①",
+    'combining': "éäôñ",
+}
+NOISE = ['\x9d', '\x9c', '\x93', '\x94', '\x91', '\x92', '\x85', '\x96', '\x97', '\x00', '\x07', '\x0b', '\x1f', '\x7f',
+         ' ', ' ', '\t', '\r\n', '\n\n', '  ']
+
+
+def random_text(rng: random.Random, script_names: list[str]) -> str:
+    words = []
+    for _ in range(rng.randint(5, 300)):
+        alphabet = SCRIPTS[rng.choice(script_names)]
+        words.append("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10))))
+        words.append(rng.choice(NOISE) if rng.random() < 0.15 else " ")
+    return "".join(words)
+
+
+def build_corpora(messages: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    corpora = {
+        'ascii': ['latin'],
+        'mixed': list(SCRIPTS),
+        'cjk+emoji': ['cjk', 'emoji', 'latin'],
+        'cyrillic+arabic': ['cyrillic', 'arabic', 'latin'],
+    }
+    return {name: [random_text(rng, scripts) for _ in range(messages)] for name, scripts in corpora.items()}
+
+
+def check_identical(texts: list[str]):
+    for text in texts:
+        expected, actual = text_utils.clean_text(text), text_normalization.clean_text(text)
+        if expected != actual:
+            raise SystemExit(f"Output differs for {text!r}:\n  original: {expected!r}\n  normalized: {actual!r}")
+    if [text_utils.clean_text(text) for text in texts] != text_normalization.clean_many(texts):
+        raise SystemExit("clean_many output differs from the original clean_text")
+
+
+def bench(function, texts: list[str], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(texts)
+    return iterations * len(texts) / (time.perf_counter() - start)
+
+
+def original_pipeline(texts):
+    for text in texts:
+        text_utils.clean_text(text_utils.clean_text(text_utils.clean_text(text)))
+
+
+def marked_pipeline(texts):
+    for text in texts:
+        text_normalization.clean_text(text_normalization.clean_text(text_normalization.clean_text(text)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'corpus':<18} {'original':>10} {'normalized':>10} {'pipe orig':>10} {'pipe once':>10} {'many':>10}  (msg/s)")
+    for name, texts in build_corpora(args.messages).items():
+        check_identical(texts)
+        rates = [
+            bench(lambda batch: [text_utils.clean_text(text) for text in batch], texts, args.iterations),
+            bench(lambda batch: [text_normalization.clean_text(text) for text in batch], texts, args.iterations),
+            bench(original_pipeline, texts, args.iterations),
+            bench(marked_pipeline, texts, args.iterations),
+            bench(text_normalization.clean_many, texts, args.iterations),
+        ]
+        print(f"{name:<18} " + " ".join(f"{rate:>10.0f}" for rate in rates))
+    print("outputs identical on every corpus")
+
+
+if __name__ == "__main__":
+    main()
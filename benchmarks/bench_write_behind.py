@@ -0,0 +1,92 @@
+"""
+Ingestion persistence throughput: one transaction per message (MessageService.create_content_message)
+against the write-behind BatchWriter at several batch sizes.
+
+run from the repository root:
+    python -m benchmarks.bench_write_behind --messages 2000 --batch-sizes 1 10 50 100 500
+
+classification and embedding are left out, only the database writes are measured.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Content, ContentType, Source, Category, Entity, EntityType
+from repository.batch_writer import BatchWriter
+from repository.content_repository import ContentRepository
+from repository.entity_repository import EntityRepository
+
+
+def parsed_message(i: int) -> dict:
+    return {
+        'type': 'text',
+        'content_data': {
+            'source_id': str(i),
+            'content_type': ContentType.TEXT,
+            'content_data': f'burst message number {i}',
+            'content_html': None,
+            'source': Source.TELEGRAM,
+            'timestamp': datetime.now(),
+        },
+    }
+
+
+def entities_for(i: int) -> list:
+    return [Entity(entity_type=EntityType.KEYWORD, entity_value=f'keyword {i}')]
+
+
+def new_session_factory(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def bench_per_message(path: str, messages: int) -> float:
+    db = new_session_factory(path)()
+    content_repository = ContentRepository(db)
+    entity_repository = EntityRepository(db)
+    start = time.perf_counter()
+    for i in range(messages):
+        content = Content(**parsed_message(i)['content_data'], category=Category.TASK)
+        content_repository.create_content(content, commit=False)
+        entities = entities_for(i)
+        for entity in entities:
+            entity.content_id = content.id
+        entity_repository.create_entities(entities, commit=False)
+        db.commit()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return messages / elapsed
+
+
+def bench_batch_writer(path: str, messages: int, batch_size: int) -> float:
+    writer = BatchWriter(new_session_factory(path), max_rows=batch_size, max_delay_ms=60000)
+    start = time.perf_counter()
+    for i in range(messages):
+        writer.submit(Content(**parsed_message(i)['content_data'], category=Category.TASK), entities_for(i))
+    writer.close()
+    elapsed = time.perf_counter() - start
+    return messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50, 100, 500])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rate = bench_per_message(os.path.join(tmp, "per_message.db"), args.messages)
+        print(f"{'one transaction per message':<30} {rate:9.1f} msg/s")
+        for batch_size in args.batch_sizes:
+            rate = bench_batch_writer(os.path.join(tmp, f"batch_{batch_size}.db"), args.messages, batch_size)
+            print(f"{f'write-behind batch={batch_size}':<30} {rate:9.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import asyncio
+import random
+import re
+import time
+import httpx
+import openai
+from openai import AsyncOpenAI
+from config import config
+from utils.token_count import estimate_tokens
+from utils.llm_metrics import llm_metrics
+
+DEFAULT_OPENAI_ASYNC = {
+    "model": "gpt-4o-mini",
+    "concurrency": 8,
+    "timeout_seconds": 30,
+    "connect_timeout_seconds": 5,
+    "max_retries": 5,
+    "retry_base_delay_seconds": 0.5,
+    "retry_max_delay_seconds": 20,
+    # completion tokens reserved per request in the tokens bucket (OpenAI counts them against the TPM limit)
+    "expected_output_tokens": 300,
+}
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+llm_metrics.configure_pricing(config.config_json.get("llm_pricing"))
+
+
+def openai_async_from_config(config_json: dict) -> dict:
+    return {**DEFAULT_OPENAI_ASYNC, **config_json.get("openai_async", {})}
+
+
+def parse_reset_duration(value: str) -> float:
+    """x-ratelimit-reset-* values ('20ms', '1s', '6m0s', '1m30.5s') in seconds"""
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in _DURATION_RE.findall(value or ""))
+
+
+def _header_int(headers, name: str):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """
+        one token bucket (requests or tokens) that follows the x-ratelimit-* headers:
+        capacity and refill rate come from the per minute limit, the level is reset to what the server says remains
+        no limiting at all until the first response tells us the limit
+    """
+    def __init__(self):
+        self.capacity = None
+        self.rate = None
+        self.level = 0.0
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.capacity is None:
+            return 0.0
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        # a request bigger than the whole bucket only waits for a full one
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.capacity is not None:
+            self.level -= min(amount, self.capacity)
+
+    def update(self, limit: int, remaining: int, reset_seconds: float, now: float):
+        if not limit:
+            return
+        self.capacity = float(limit)
+        self.rate = limit / 60.0
+        self.level = float(remaining) if remaining is not None else self.level
+        self.updated_at = now
+        if remaining is not None and remaining <= 0:
+            self.blocked_until = now + reset_seconds
+
+
+class AdaptiveRateLimiter:
+    """requests and tokens buckets for one api key, shared by every request of the client"""
+    def __init__(self):
+        self.requests = _Bucket()
+        self.tokens = _Bucket()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        now = time.monotonic()
+        for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            bucket.update(
+                _header_int(headers, f"x-ratelimit-limit-{name}"),
+                _header_int(headers, f"x-ratelimit-remaining-{name}"),
+                parse_reset_duration(headers.get(f"x-ratelimit-reset-{name}")),
+                now,
+            )
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    if response is None:
+        return 0.0
+    retry_after_ms = _header_int(response.headers, "retry-after-ms")
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class AsyncOpenAIClient:
+    """
+        async variant of OpenAIClient for parallel ingestion
+        - one httpx connection pool shared by all requests, sized to the concurrency cap
+        - at most `concurrency` requests in flight (semaphore)
+        - requests and tokens buckets driven by the x-ratelimit-* response headers, so we slow down before
+          the quota runs out instead of being throttled
+        - jittered exponential retries (full jitter, honouring retry-after) on 429, 5xx, timeouts and connection errors
+    """
+    def __init__(self, settings: dict = None, http_client: httpx.AsyncClient = None):
+        settings = settings or openai_async_from_config(config.config_json)
+        self.model = settings["model"]
+        self.max_retries = settings["max_retries"]
+        self.retry_base_delay = settings["retry_base_delay_seconds"]
+        self.retry_max_delay = settings["retry_max_delay_seconds"]
+        self.expected_output_tokens = settings["expected_output_tokens"]
+        self.http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=settings["concurrency"], max_keepalive_connections=settings["concurrency"]),
+            timeout=httpx.Timeout(settings["timeout_seconds"], connect=settings["connect_timeout_seconds"]),
+        )
+        # the sdk's own retries are off, ours share the rate limiter
+        self.client = AsyncOpenAI(api_key=config.OPENAI_API_KEY, http_client=self.http_client, max_retries=0)
+        self.semaphore = asyncio.Semaphore(settings["concurrency"])
+        self.rate_limiter = AdaptiveRateLimiter()
+        self.retries = 0
+
+    async def _request(self, create, estimated_tokens: int, **kwargs):
+        """Run one `with_raw_response` create call under the concurrency cap, rate limit and retry policy"""
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(estimated_tokens)
+            try:
+                async with self.semaphore:
+                    raw_response = await create(**kwargs)
+                self.rate_limiter.update_from_headers(raw_response.headers)
+                return raw_response.parse()
+            except Exception as e:
+                response = getattr(e, "response", None)
+                if response is not None:
+                    self.rate_limiter.update_from_headers(response.headers)
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                delay = max(random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt)), _retry_after(e))
+                print(f"OpenAI request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def request_agent(self, system_prompt: str, user_message: str, output_schema: dict, agent_name: str = "agent"):
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_message) + self.expected_output_tokens
+        # the latency recorded includes the rate limiter waits and retries, what the message actually paid
+        with llm_metrics.track(agent_name, self.model) as call:
+            response = await self._request(
+                self.client.chat.completions.with_raw_response.create, estimated_tokens,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message}
+                ],
+                response_format={"type": "json_object"},
+            )
+            call['usage'] = getattr(response, 'usage', None)
+        return response.choices[0].message.content
+
+    async def create_embedding(self, text: str, model: str = "text-embedding-3-small", dimensions: int = None) -> list[float]:
+        kwargs = {"dimensions": dimensions} if dimensions else {}
+        with llm_metrics.track("embedding", model) as call:
+            response = await self._request(
+                self.client.embeddings.with_raw_response.create, estimate_tokens(text), model=model, input=text, **kwargs
+            )
+            call['usage'] = getattr(response, 'usage', None)
+        return response.data[0].embedding
+
+    async def aclose(self):
+        await self.http_client.aclose()
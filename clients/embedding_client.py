@@ -0,0 +1,63 @@
+import hashlib
+import re
+import numpy as np
+from clients.openai_client import OpenAIClient
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddingClient:
+    """
+        deterministic local embedding backend based on the hashing trick
+        every word and word bigram is hashed into one of `dimension` buckets with a signed weight
+        no network and no model files, so it is fast and stable across runs (used in tests)
+    """
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def _bucket(self, token: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'little')
+        sign = 1.0 if value & 1 else -1.0
+        return (value >> 1) % self.dimension, sign
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        tokens = _TOKEN_PATTERN.findall((text or "").lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class OpenAIEmbeddingClient:
+    """Embedding backend using the OpenAI embeddings endpoint, vectors are shortened to `dimension`."""
+    def __init__(self, dimension: int = 256, model: str = "text-embedding-3-small"):
+        self.dimension = dimension
+        self.model = model
+        self.openai_client = OpenAIClient()
+
+    def embed(self, text: str) -> np.ndarray:
+        values = self.openai_client.create_embedding(text or " ", model=self.model, dimensions=self.dimension)
+        vector = np.asarray(values, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+EMBEDDING_BACKENDS = {
+    'hashing': HashingEmbeddingClient,
+    'openai': OpenAIEmbeddingClient,
+}
+
+
+def get_embedding_client(backend: str, dimension: int):
+    """simply choose the right embedding backend by its name in config.json"""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    return EMBEDDING_BACKENDS[backend](dimension=dimension)
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+DEFAULT_LOCAL_CLASSIFIER = {
+    "enabled": True,
+    "model_path": "data/local_classifier.npz",
+    "threshold": 0.85,
+    "n_features": 65536,
+    "epochs": 150,
+    "learning_rate": 0.1,
+    "l2": 0.0001,
+}
+
+
+def local_classifier_from_config(config_json: dict) -> dict:
+    return {**DEFAULT_LOCAL_CLASSIFIER, **config_json.get("local_classifier", {})}
+
+
+@lru_cache(maxsize=200000)
+def _bucket(feature: str, n_features: int) -> tuple[int, float]:
+    # same hashing trick as HashingEmbeddingClient: stable across processes, one bit of the hash for the sign
+    value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+    return (value >> 1) % n_features, 1.0 if value & 1 else -1.0
+
+
+def hashed_term_counts(text: str, n_features: int) -> dict[int, float]:
+    """signed counts of the hashed word unigrams and bigrams of `text`"""
+    tokens = _TOKEN_PATTERN.findall((text or "").lower())
+    counts = {}
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        index, sign = _bucket(feature, n_features)
+        counts[index] = counts.get(index, 0.0) + sign
+    return counts
+
+
+class LocalClassifier:
+    """
+        small local text classifier trained on the categories the category agent already assigned
+        features: hashed word unigrams + bigrams, sublinear tf * idf, l2 normalized, plus a bias feature
+        model: multinomial logistic regression (softmax) trained with full batch Adam in NumPy,
+        the documents are kept sparse (CSR arrays) so memory is O(number of words), not O(docs * n_features)
+    """
+    def __init__(self, n_features: int = 65536):
+        self.n_features = n_features
+        self.classes: list[str] = []
+        self.idf = None
+        self.weights = None
+        self.metadata = {}
+
+    def _vectorize(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """CSR (indptr, indices, data) of the documents, the bias feature (index n_features) is in every row"""
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            counts = hashed_term_counts(text, self.n_features)
+            for index, count in counts.items():
+                indices.append(index)
+                # sublinear tf keeps the sign of the hashed feature
+                data.append(math.copysign(1.0 + math.log(abs(count)), count) if count else 0.0)
+            indices.append(self.n_features)
+            data.append(1.0)
+            indptr.append(len(indices))
+        return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64), np.asarray(data, dtype=np.float64)
+
+    def _features(self, texts: list[str]):
+        indptr, indices, data = self._vectorize(texts)
+        rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+        data = data * self.idf[indices]
+        is_word = indices != self.n_features
+        norms = np.sqrt(np.bincount(rows[is_word], weights=data[is_word] ** 2, minlength=len(texts)))
+        data[is_word] /= np.maximum(norms[rows[is_word]], 1e-12)
+        return rows, indices, data
+
+    def _scores(self, rows, indices, data, count: int) -> np.ndarray:
+        scores = np.empty((count, len(self.classes)))
+        for k in range(len(self.classes)):
+            scores[:, k] = np.bincount(rows, weights=data * self.weights[indices, k], minlength=count)
+        return scores
+
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(self, texts: list[str], labels: list[str], epochs: int = 150, learning_rate: float = 0.1, l2: float = 1e-4):
+        self.classes = sorted(set(labels))
+        class_index = {label: index for index, label in enumerate(self.classes)}
+        targets = np.zeros((len(texts), len(self.classes)))
+        targets[np.arange(len(texts)), [class_index[label] for label in labels]] = 1.0
+
+        indptr, indices, _ = self._vectorize(texts)
+        document_frequency = np.bincount(indices, minlength=self.n_features + 1)
+        self.idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+        self.idf[self.n_features] = 1.0
+        rows, indices, data = self._features(texts)
+
+        self.weights = np.zeros((self.n_features + 1, len(self.classes)))
+        first_moment = np.zeros_like(self.weights)
+        second_moment = np.zeros_like(self.weights)
+        for step in range(1, epochs + 1):
+            errors = (self._softmax(self._scores(rows, indices, data, len(texts))) - targets) / len(texts)
+            gradient = np.empty_like(self.weights)
+            for k in range(len(self.classes)):
+                gradient[:, k] = np.bincount(indices, weights=data * errors[rows, k], minlength=self.n_features + 1)
+            gradient[:self.n_features] += l2 * self.weights[:self.n_features]
+            first_moment = 0.9 * first_moment + 0.1 * gradient
+            second_moment = 0.999 * second_moment + 0.001 * gradient ** 2
+            self.weights -= learning_rate * (first_moment / (1 - 0.9 ** step)) / (np.sqrt(second_moment / (1 - 0.999 ** step)) + 1e-8)
+        return self
+
+    def predict_proba(self, texts: list[str]) -> np.ndarray:
+        rows, indices, data = self._features(texts)
+        return self._softmax(self._scores(rows, indices, data, len(texts)))
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """most likely category of one text and its probability"""
+        probabilities = self.predict_proba([text])[0]
+        best = int(probabilities.argmax())
+        return self.classes[best], float(probabilities[best])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary_path = path + ".tmp.npz"
+        np.savez_compressed(
+            temporary_path, weights=self.weights.astype(np.float32), idf=self.idf.astype(np.float32),
+            classes=np.asarray(self.classes), n_features=self.n_features, metadata=json.dumps(self.metadata),
+        )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        with np.load(path) as stored:
+            model = cls(int(stored["n_features"]))
+            model.weights = stored["weights"].astype(np.float64)
+            model.idf = stored["idf"].astype(np.float64)
+            model.classes = [str(label) for label in stored["classes"]]
+            model.metadata = json.loads(str(stored["metadata"]))
+        return model
+
+
+def evaluate(model: LocalClassifier, texts: list[str], labels: list[str], threshold: float) -> dict:
+    """held-out accuracy overall and above the confidence threshold (what the LLM would be spared) plus latency"""
+    latencies, correct, confident, confident_correct = [], 0, 0, 0
+    for text, label in zip(texts, labels):
+        start = time.perf_counter()
+        predicted, probability = model.predict(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += predicted == label
+        if probability >= threshold:
+            confident += 1
+            confident_correct += predicted == label
+    count = max(len(texts), 1)
+    return {
+        'examples': len(texts),
+        'accuracy': correct / count,
+        'threshold': threshold,
+        'coverage': confident / count,
+        'accuracy_above_threshold': confident_correct / confident if confident else None,
+        'latency_ms_p50': float(np.percentile(latencies, 50)) if latencies else None,
+        'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies else None,
+    }
+
+
+class LazyLocalClassifier:
+    """
+        loads the model file on first use, and again when the file changes (after a retrain), never before;
+        without a model file every prediction is None and the category agent decides
+    """
+    def __init__(self, model_path: str, threshold: float, enabled: bool = True):
+        self.model_path = model_path
+        self.threshold = threshold
+        self.enabled = enabled
+        self._model = None
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+        self.predictions = 0
+        self.accepted = 0
+
+    def _current_model(self) -> LocalClassifier:
+        try:
+            mtime = os.stat(self.model_path).st_mtime
+        except OSError:
+            return None
+        if mtime != self._loaded_mtime:
+            with self._lock:
+                if mtime != self._loaded_mtime:
+                    try:
+                        self._model = LocalClassifier.load(self.model_path)
+                    except Exception as e:
+                        print(f"Error loading local classifier {self.model_path}: {e}")
+                        self._model = None
+                    self._loaded_mtime = mtime
+        return self._model
+
+    def classify(self, text: str) -> tuple[str, float]:
+        """(category, probability) when the model is at least `threshold` sure, None otherwise"""
+        if not self.enabled:
+            return None
+        model = self._current_model()
+        if model is None:
+            return None
+        category, probability = model.predict(text)
+        with self._lock:
+            self.predictions += 1
+            self.accepted += probability >= self.threshold
+        return (category, probability) if probability >= self.threshold else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'model_loaded': self._model is not None,
+                'predictions': self.predictions,
+                'llm_calls_avoided': self.accepted,
+                'avoided_rate': self.accepted / self.predictions if self.predictions else 0.0,
+            }
+
+
+_shared_local_classifier = None
+
+
+def get_shared_local_classifier(config_json: dict) -> LazyLocalClassifier:
+    """one lazily loaded model per process"""
+    global _shared_local_classifier
+    if _shared_local_classifier is None:
+        settings = local_classifier_from_config(config_json)
+        _shared_local_classifier = LazyLocalClassifier(settings["model_path"], settings["threshold"], settings["enabled"])
+    return _shared_local_classifier
@@ -1,28 +1,48 @@
 from config import config
 import io
 from openai import OpenAI
+from utils.llm_metrics import llm_metrics
+
+llm_metrics.configure_pricing(config.config_json.get("llm_pricing"))
 
 class OpenAIClient:
+    """every call is timed and its token usage and estimated cost recorded in utils.llm_metrics"""
     def __init__(self):
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+        # a hung request counts as a failure for the circuit breaker instead of blocking the poller for minutes,
+        # and the SDK's own retries (2 by default, with backoff) are kept low so an outage trips the breaker quickly
+        self.client = OpenAI(
+            api_key=config.OPENAI_API_KEY,
+            timeout=config.config_json.get("openai_timeout_seconds", 30),
+            max_retries=config.config_json.get("openai_max_retries", 0),
+        )
 
-    def transcribe_audio(self, mp3_bytes: bytes) -> str:
+    def transcribe_audio(self, mp3_bytes: bytes, audio_seconds: float = None) -> str:
         audio = io.BytesIO(mp3_bytes)
         audio.name = "voice.mp3"
 
-        resp = self.client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio,
-            response_format="text"
-        )
+        # whisper is billed per minute of audio, the text response has no usage
+        with llm_metrics.track("transcription", "whisper-1", audio_seconds=audio_seconds):
+            resp = self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio,
+                response_format="text"
+            )
         return resp  
-    def request_agent(self, system_prompt: str, user_message: str , output_schema: dict):
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            response_format={"type": "json_object"}
-        )
-        return response.choices[0].message.content
\ No newline at end of file
+    def request_agent(self, system_prompt: str, user_message: str , output_schema: dict, agent_name: str = "agent"):
+        with llm_metrics.track(agent_name, "gpt-4o-mini") as call:
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message}
+                ],
+                response_format={"type": "json_object"}
+            )
+            call['usage'] = getattr(response, 'usage', None)
+        return response.choices[0].message.content
+    def create_embedding(self, text: str, model: str = "text-embedding-3-small", dimensions: int = None) -> list[float]:
+        kwargs = {"dimensions": dimensions} if dimensions else {}
+        with llm_metrics.track("embedding", model) as call:
+            response = self.client.embeddings.create(model=model, input=text, **kwargs)
+            call['usage'] = getattr(response, 'usage', None)
+        return response.data[0].embedding
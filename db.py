@@ -2,11 +2,19 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from config import config
 from models import Base  # Add this import
+from utils.sqlite_profile import apply_sqlite_profile, sqlite_profile_from_config
+from utils.text_compression import configure_text_compression, text_compression_from_config
+from utils.simhash import configure_fingerprint_bands, DEFAULT_MAX_DISTANCE
+
+sqlite_profile = sqlite_profile_from_config(config.config_json)
+configure_text_compression(text_compression_from_config(config.config_json))
+configure_fingerprint_bands(config.config_json.get("near_duplicate", {}).get("max_distance", DEFAULT_MAX_DISTANCE))
 
 # Create synchronous engine
 sql_engine = create_engine(
     config.SQL_URI, echo=False
 )
+apply_sqlite_profile(sql_engine, sqlite_profile)
 
 # Create tables automatically in development
 Base.metadata.create_all(bind=sql_engine)
@@ -15,19 +23,22 @@ SessionLocal = sessionmaker(
     bind=sql_engine, expire_on_commit=False
 )
 
-# Add async engine and session for async tests (only if needed)
+# Async engine and session used by the API routes (deps.AsyncSessionDep), the pollers keep the sync one
 try:
     from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
     
-    # Convert sync URI to async URI for SQLite
+    # Convert sync URI to the async driver of the same database
     if config.SQL_URI.startswith('sqlite:///'):
         async_uri = config.SQL_URI.replace('sqlite:///', 'sqlite+aiosqlite:///')
+    elif config.SQL_URI.startswith('postgresql://'):
+        async_uri = config.SQL_URI.replace('postgresql://', 'postgresql+asyncpg://', 1)
     else:
         async_uri = config.SQL_URI
     
     async_engine = create_async_engine(
         async_uri, echo=False
     )
+    apply_sqlite_profile(async_engine.sync_engine, sqlite_profile)
     AsyncSessionLocal = sessionmaker(
         bind=async_engine, class_=AsyncSession, expire_on_commit=False
     )
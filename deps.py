@@ -1,9 +1,10 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Base
 from fastapi import Depends
 from typing import Annotated
-from db import SessionLocal
+from db import SessionLocal, AsyncSessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -12,7 +13,14 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database driver is not installed (aiosqlite / asyncpg)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 
 
 
@@ -5,8 +5,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from sources.email.email_poller import EmailPoller
 from services.message_service import MessageService
 from sources.telegram.telegram_poller import TelegramPoller
-from db import SessionLocal
+from db import SessionLocal, sql_engine, sqlite_profile
+from utils.sqlite_profile import start_optimize_scheduler
+from config import config
+from repository.batch_writer import BatchWriter
 from routes.content_table_router import router as content_table_router
+from routes.metrics_router import router as metrics_router
+from services.agent_service import get_shared_llm_circuit_breaker
+from services.pending_reclassifier import PendingReclassifier, deferred_classification_from_config
 
 
 app = FastAPI(title="Altair Code Backend", version="1.0.0")
@@ -21,6 +27,7 @@ app.add_middleware(
 )
 
 app.include_router(content_table_router)
+app.include_router(metrics_router)
 
 
 
@@ -29,7 +36,11 @@ email_poller_thread = None
 telegram_poller_thread = None
 email_poller = None
 telegram_poller = None
+pending_reclassifier_thread = None
+pending_reclassifier = None
 message_service = None
+batch_writer = None
+sqlite_optimize_stop = None
 
 @app.on_event("startup")
 async def startup_event():
@@ -39,10 +50,20 @@ async def startup_event():
     to modfify time duration of sleep , we can change the time in the config.json file
     """
     
-    global email_poller_thread, telegram_poller_thread, email_poller, telegram_poller, message_service
+    global email_poller_thread, telegram_poller_thread, email_poller, telegram_poller, message_service, batch_writer, sqlite_optimize_stop
+    global pending_reclassifier_thread, pending_reclassifier
+ 
+    if sqlite_profile.get("enabled", True):
+        sqlite_optimize_stop = start_optimize_scheduler(sql_engine, sqlite_profile.get("optimize_interval_seconds"))
  
     db = SessionLocal()
-    message_service = MessageService(db)
+    if config.config_json.get("write_behind_enabled", False):
+        batch_writer = BatchWriter(
+            SessionLocal,
+            max_rows=config.config_json.get("write_behind_max_rows", 100),
+            max_delay_ms=config.config_json.get("write_behind_max_delay_ms", 500),
+        )
+    message_service = MessageService(db, batch_writer=batch_writer)
     
  
     email_poller = EmailPoller(message_service)
@@ -60,14 +81,33 @@ async def startup_event():
     )
     telegram_poller_thread.start()
 
+    # messages stored while the LLM was down are classified here, with a session of its own
+    deferred_classification = deferred_classification_from_config(config.config_json)
+    if deferred_classification["enabled"]:
+        pending_reclassifier = PendingReclassifier(
+            MessageService(SessionLocal()), deferred_classification["batch_size"], deferred_classification["sleep_time"]
+        )
+        pending_reclassifier_thread = threading.Thread(
+            target=pending_reclassifier.start_polling,
+            daemon=True
+        )
+        pending_reclassifier_thread.start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     
-    global email_poller, telegram_poller
+    global email_poller, telegram_poller, batch_writer, sqlite_optimize_stop, pending_reclassifier
     if email_poller:
         email_poller.is_running = False
     if telegram_poller:
         telegram_poller.is_running = False
+    if pending_reclassifier:
+        pending_reclassifier.is_running = False
+    if batch_writer:
+        # write whatever is still buffered before the process exits
+        batch_writer.close()
+    if sqlite_optimize_stop:
+        sqlite_optimize_stop.set()
 
 @app.get("/")
 async def root():
@@ -75,15 +115,18 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    global email_poller_thread, telegram_poller_thread
+    global email_poller_thread, telegram_poller_thread, pending_reclassifier_thread
     
     email_status = "running" if email_poller_thread and email_poller_thread.is_alive() else "stopped"
     telegram_status = "running" if telegram_poller_thread and telegram_poller_thread.is_alive() else "stopped"
+    reclassifier_status = "running" if pending_reclassifier_thread and pending_reclassifier_thread.is_alive() else "stopped"
     
     return {
         "status": "healthy",
         "email_poller_thread": email_status,
         "telegram_poller_thread": telegram_status,
+        "pending_reclassifier_thread": reclassifier_status,
+        "llm_circuit_breaker": get_shared_llm_circuit_breaker().snapshot()["state"],
         "timestamp": time.time()
     }
 
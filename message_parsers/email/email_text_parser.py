@@ -1,10 +1,21 @@
 import base64
-from datetime import datetime
+import hashlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from models.content import Content, ContentType, Source
+from message_parsers.email.streaming_mime_parser import StreamingMimeParser, RawMimeResult, decode_text, DEFAULT_MAX_DECODED_BYTES, TEXT_TYPES
+from message_parsers.email.html_reducer import html_to_text
+from utils.token_count import estimate_tokens
+from config import config
+
+# top level headers kept for the pre-classifier rules (format='full' has them all, the raw parser only keeps these)
+RULE_HEADERS = ('List-Unsubscribe', 'List-Id', 'Precedence', 'Auto-Submitted')
+
 
 class EmailTextParser:
-    def __init__(self):
-        pass 
+    def __init__(self, max_decoded_bytes: int = None):
+        # cap on the decoded size of a text part, a runaway body is cut instead of being stored and sent to the agents
+        self.max_decoded_bytes = max_decoded_bytes or config.config_json.get("email_max_decoded_bytes", DEFAULT_MAX_DECODED_BYTES)
     def convert_to_timestamp(self, internal_date: str) -> datetime:
         """
         add this later to utils as it would be used in other parsers too with a good chance
@@ -13,8 +24,10 @@ class EmailTextParser:
         return datetime.fromtimestamp(int(internal_date) / 1000)
     
     def parse(self, raw_data: dict) -> dict:
-        """Parse Gmail API response and return structured data."""
+        """Parse Gmail API response (format='full', or format='raw' for big messages) and return structured data."""
         
+        if 'raw' in raw_data and 'payload' not in raw_data:
+            raw_data = self._raw_to_payload(raw_data)
 
         gmail_id = raw_data.get('id') 
         snippet = raw_data.get('snippet', '')
@@ -24,6 +37,9 @@ class EmailTextParser:
         subject=self.extract_subject(raw_data)
 
         content_data, html_content = self._extract_content(raw_data)
+        if not content_data and html_content:
+            # html only email: the agents get the reduced text, the original html stays in content_html
+            content_data = self._reduce_html(gmail_id, html_content)
         
         final_content_data = content_data if content_data else snippet
         
@@ -37,49 +53,117 @@ class EmailTextParser:
             'subject': subject
         }
         
+        headers = self.extract_headers(raw_data)
         parsed_data = {
             'type': 'text',
             'source': Source.EMAIL,
             'source_id': gmail_id,
             'content_data': content_data,
             'content_html': html_content,
+            # not stored, only for the pre-classifier rules
+            'sender': headers.get('from', ''),
+            'headers': headers,
+            'mime_types': self.extract_mime_types(raw_data),
         }
         return parsed_data
     
 
     
     def _extract_content(self, raw_data: dict) -> tuple[str, str]:
-        """Extract text and HTML content from Gmail API response."""
-        text_content = ""
-        html_content = ""
-        
+        """Extract text and HTML content from Gmail API response, only the two chosen parts are decoded."""
         payload = raw_data.get('payload', {})
-        
-        # Check if email has parts (multipart)
-        if 'parts' in payload:
-            for part in payload['parts']:
-                mime_type = part.get('mimeType', '')
-                body_data = part.get('body', {}).get('data', '')
-                
-                if mime_type == 'text/plain' and body_data:
-                    text_content = self._decode_base64(body_data)
-                elif mime_type == 'text/html' and body_data:
-                    html_content = self._decode_base64(body_data)
-        
-        # If no parts, check if it's a simple email
-        elif payload.get('mimeType') == 'text/plain':
-            body_data = payload.get('body', {}).get('data', '')
-            if body_data:
-                text_content = self._decode_base64(body_data)
-        
-        elif payload.get('mimeType') == 'text/html':
-            body_data = payload.get('body', {}).get('data', '')
-            if body_data:
-                html_content = self._decode_base64(body_data)
-        
+        plain_part, html_part = self._find_text_parts(payload)
+        text_content = self._decode_part(plain_part) if plain_part else ""
+        html_content = self._decode_part(html_part) if html_part else ""
         return text_content, html_content
     
-    def _decode_base64(self, data: str) -> str:
+    def _reduce_html(self, gmail_id: str, html_content: str) -> str:
+        reduced = html_to_text(html_content)
+        print(f"Reduced html of email {gmail_id}: ~{estimate_tokens(html_content)} -> ~{estimate_tokens(reduced)} tokens")
+        return reduced
+    
+    def _find_text_parts(self, payload: dict) -> tuple[dict, dict]:
+        """
+        Walk the MIME tree (any depth, e.g. multipart/mixed -> multipart/alternative) in document order with an
+        explicit stack and return the first text/plain and the first text/html part that are not attachments
+        """
+        plain_part = html_part = None
+        stack = [payload]
+        while stack and (plain_part is None or html_part is None):
+            part = stack.pop()
+            if part.get('parts'):
+                stack.extend(reversed(part['parts']))
+                continue
+            if part.get('filename') or not part.get('body', {}).get('data'):
+                continue
+            mime_type = part.get('mimeType', '').lower()
+            if mime_type == 'text/plain' and plain_part is None:
+                plain_part = part
+            elif mime_type == 'text/html' and html_part is None:
+                html_part = part
+        return plain_part, html_part
+    
+    def _part_charset(self, part: dict) -> str:
+        for header in part.get('headers', []):
+            if header.get('name', '').lower() == 'content-type':
+                for param in header.get('value', '').split(';')[1:]:
+                    key, _, value = param.strip().partition('=')
+                    if key.strip().lower() == 'charset':
+                        return value.strip().strip('"')
+        return 'utf-8'
+    
+    def _decode_part(self, part: dict) -> str:
+        """Decode one part's body in its own charset, only as much base64 as the byte cap needs"""
+        data = part['body']['data']
+        max_encoded = -(-self.max_decoded_bytes // 3) * 4
+        decoded_bytes = self._decode_base64_bytes(data[:max_encoded + 4])
+        return decode_text(decoded_bytes, self._part_charset(part), self.max_decoded_bytes)
+    
+    def _raw_to_payload(self, raw_data: dict) -> dict:
+        """
+        Turn a format='raw' response into the payload shape of format='full' with only the parts we keep,
+        the streaming parser stops after the first text part and never decodes attachments
+        """
+        mime = StreamingMimeParser(
+            header_names=('Subject', 'From', 'Date', *RULE_HEADERS), max_decoded_bytes=self.max_decoded_bytes
+        ).parse(raw_data['raw'])
+        return {**{key: value for key, value in raw_data.items() if key != 'raw'}, 'payload': self._mime_to_payload(mime)}
+
+    def _mime_to_payload(self, mime: RawMimeResult) -> dict:
+        parts = []
+        for part in (mime.plain, mime.html):
+            if part is not None:
+                encoded = base64.urlsafe_b64encode(part.text.encode('utf-8')).decode('ascii')
+                parts.append({'mimeType': part.mime_type, 'body': {'size': len(part.text), 'data': encoded}})
+        # the other part types, without bodies, so the payload still tells what the message contained
+        parts += [{'mimeType': mime_type, 'body': {'size': 0}} for mime_type in mime.mime_types if mime_type not in TEXT_TYPES]
+        return {'mimeType': 'multipart/mixed', 'headers': mime.headers, 'parts': parts}
+
+    def parse_eml(self, eml: bytes) -> dict:
+        """
+        Parse an RFC 822 message that never went through Gmail (.eml file, mbox entry) into the same structure
+        as parse, the source_id is its Message-ID (a hash of the message when it has none or it is too long)
+        and the timestamp its Date header
+        """
+        mime = StreamingMimeParser(
+            header_names=('Subject', 'From', 'Date', 'Message-ID', *RULE_HEADERS), max_decoded_bytes=self.max_decoded_bytes
+        ).parse_bytes(eml)
+        headers = {header['name']: header['value'] for header in mime.headers}
+        message_id = headers.get('Message-ID', '').strip().strip('<>')
+        if not message_id or len(message_id) > 255:
+            message_id = hashlib.sha256(message_id.encode() if message_id else eml).hexdigest()
+        try:
+            received_at = parsedate_to_datetime(headers['Date'])
+        except (KeyError, TypeError, ValueError):
+            received_at = datetime.fromtimestamp(0, timezone.utc)
+        return self.parse({
+            'id': message_id,
+            'internalDate': str(int(received_at.timestamp() * 1000)),
+            'snippet': '',
+            'payload': self._mime_to_payload(mime),
+        })
+
+    def _decode_base64_bytes(self, data: str) -> bytes:
         """Decode base64 data from Gmail API."""
         try:
             # Gmail uses URL-safe base64, so we need to handle padding
@@ -89,11 +173,26 @@ class EmailTextParser:
             if padding != 4:
                 data += '=' * padding
             
-            decoded_bytes = base64.b64decode(data)
-            return decoded_bytes.decode('utf-8')
+            return base64.b64decode(data)
         except Exception as e:
             print(f"Error decoding base64 data: {e}")
-            return ""
+            return b""
+    def extract_headers(self, raw_data: dict) -> dict:
+        """top level headers by lowercase name"""
+        return {header['name'].lower(): header['value'] for header in raw_data.get('payload', {}).get('headers', [])}
+
+    def extract_mime_types(self, raw_data: dict) -> list[str]:
+        """types of every leaf part (text/calendar of an invite, application/pdf of an invoice...)"""
+        mime_types = []
+        stack = [raw_data.get('payload', {})]
+        while stack:
+            part = stack.pop()
+            if part.get('parts'):
+                stack.extend(reversed(part['parts']))
+            elif part.get('mimeType'):
+                mime_types.append(part['mimeType'].lower())
+        return mime_types
+
     def extract_subject(self, raw_data: dict) -> str:
         """Extract subject from Gmail API response."""
         subject = ""
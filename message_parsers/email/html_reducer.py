@@ -0,0 +1,115 @@
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+# content of these is never text the reader sees
+SKIPPED_TAGS = {'head', 'style', 'script', 'noscript', 'template', 'svg', 'title', 'blockquote'}
+# quoted reply chains and signatures of the common mail clients (Gmail, Apple Mail, Thunderbird, Outlook)
+SKIPPED_CLASSES = {'gmail_quote', 'gmail_signature', 'moz-cite-prefix', 'moz-signature', 'yahoo_quoted', 'ms-outlook-signature'}
+SKIPPED_IDS = {'signature', 'Signature'}
+# everything after these is the quoted original message
+REPLY_MARKER_IDS = {'divRplyFwdMsg', 'appendonsend'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'tr', 'table', 'li', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'section', 'article', 'header', 'footer', 'hr', 'pre', 'center',
+}
+# table cells of a row stay on its line, a space apart
+CELL_TAGS = {'td', 'th'}
+
+_REPLY_HEADER_RE = re.compile(r"^\s*(On .{0,200} wrote:|-{2,}\s*Original Message\s*-{2,}|From: .+ Sent: .+)\s*$", re.IGNORECASE)
+_SIGNATURE_RE = re.compile(r"^--\s?$")
+_SPACES_RE = re.compile(r"[ \t\r\f\v ]+")
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        # the tag that opened the skipped region and how many of it are open, other tags inside may never be closed
+        self.skip_tag = None
+        self.skip_depth = 0
+        self.stopped = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.stopped:
+            return
+        if self.skip_depth:
+            if tag == self.skip_tag:
+                self.skip_depth += 1
+            return
+        attributes = dict(attrs)
+        if attributes.get('id') in REPLY_MARKER_IDS:
+            self.stopped = True
+            return
+        classes = set((attributes.get('class') or '').split())
+        if tag in SKIPPED_TAGS or classes & SKIPPED_CLASSES or attributes.get('id') in SKIPPED_IDS:
+            if tag not in VOID_TAGS:
+                self.skip_tag, self.skip_depth = tag, 1
+            return
+        if tag in BLOCK_TAGS:
+            self.chunks.append("\n")
+        if tag in CELL_TAGS:
+            self.chunks.append(" ")
+        if tag == 'li':
+            self.chunks.append("- ")
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/> <img/> ..., never opens a skipped region
+        if not self.stopped and not self.skip_depth and tag in BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_endtag(self, tag):
+        if self.stopped:
+            return
+        if self.skip_depth:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+            return
+        if tag in BLOCK_TAGS:
+            self.chunks.append("\n")
+        if tag in CELL_TAGS:
+            self.chunks.append(" ")
+
+    def handle_data(self, data):
+        if not self.stopped and not self.skip_depth:
+            self.chunks.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Visible text of an HTML email: markup, css, scripts, images (tracking pixels) and links' urls dropped,
+    quoted reply chains and signatures dropped, blocks kept as lines
+    """
+    if not html:
+        return ""
+    extractor = _TextExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except Exception as e:
+        print(f"Error extracting text from html, falling back to stripping tags: {e}")
+        return normalize_lines(unescape(re.sub(r"<[^>]+>", " ", html)))
+    return strip_reply_and_signature(normalize_lines("".join(extractor.chunks)))
+
+
+def normalize_lines(text: str) -> str:
+    lines = [_SPACES_RE.sub(" ", line).strip() for line in text.splitlines()]
+    reduced = []
+    for line in lines:
+        # no more than one empty line in a row
+        if line or (reduced and reduced[-1]):
+            reduced.append(line)
+    return "\n".join(reduced).strip()
+
+
+def strip_reply_and_signature(text: str) -> str:
+    """Cut plain text at the first reply header ("On ... wrote:") or signature delimiter ("-- "), drop '>' quoted lines"""
+    kept = []
+    for line in text.splitlines():
+        if _REPLY_HEADER_RE.match(line) or _SIGNATURE_RE.match(line):
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        kept.append(line)
+    return "\n".join(kept).strip()
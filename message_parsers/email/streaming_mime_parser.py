@@ -0,0 +1,204 @@
+import base64
+import codecs
+import quopri
+from dataclasses import dataclass, field
+from email.header import decode_header, make_header
+
+TEXT_TYPES = ('text/plain', 'text/html')
+DEFAULT_MAX_DECODED_BYTES = 1024 * 1024
+
+
+@dataclass
+class MimeTextPart:
+    mime_type: str
+    charset: str
+    text: str
+
+
+@dataclass
+class RawMimeResult:
+    headers: list[dict] = field(default_factory=list)   # top level headers, same shape as Gmail's payload.headers
+    plain: MimeTextPart = None
+    html: MimeTextPart = None
+    mime_types: list[str] = field(default_factory=list)   # every leaf part type seen before the parser stopped
+
+
+def iter_raw_lines(raw: str, chunk_size: int = 64 * 1024):
+    """
+    Decode a Gmail `raw` (base64url of the RFC 822 message) chunk by chunk and yield its lines,
+    so a message with big attachments is never decoded into one huge bytes object
+    """
+    raw = raw.replace('-', '+').replace('_', '/')
+    chunk_size -= chunk_size % 4
+    pending = b""
+    for start in range(0, len(raw), chunk_size):
+        chunk = raw[start:start + chunk_size]
+        if start + chunk_size >= len(raw):
+            chunk += '=' * (-len(chunk) % 4)
+        pending += base64.b64decode(chunk)
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r")
+    # always yielded, an empty last line keeps the trailing newline of a single part body
+    yield pending.rstrip(b"\r")
+
+
+def iter_message_lines(message: bytes):
+    """lines of an RFC 822 message that is already bytes (.eml file, mbox entry), same shape as iter_raw_lines"""
+    start = 0
+    while True:
+        end = message.find(b"\n", start)
+        if end < 0:
+            yield message[start:].rstrip(b"\r")
+            return
+        yield message[start:end].rstrip(b"\r")
+        start = end + 1
+
+
+def _parse_header_value(value: str) -> tuple[str, dict]:
+    """'text/plain; charset="UTF-8"' -> ('text/plain', {'charset': 'UTF-8'})"""
+    main, *params = value.split(';')
+    parsed = {}
+    for param in params:
+        key, _, param_value = param.strip().partition('=')
+        parsed[key.strip().lower()] = param_value.strip().strip('"')
+    return main.strip().lower(), parsed
+
+
+def _decode_header_value(value: str) -> str:
+    """RFC 2047 encoded words ('=?utf-8?q?H=C3=A9llo?=') to text, Gmail's full format returns them decoded too"""
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return value
+
+
+def decode_text(data: bytes, charset: str = None, max_bytes: int = None) -> str:
+    """
+    Bytes of a text part in its declared charset (utf-8 when missing or unknown), cut at `max_bytes`,
+    a multi-byte character split by the cut is dropped instead of turning into garbage
+    """
+    truncated = max_bytes is not None and len(data) > max_bytes
+    if truncated:
+        data = data[:max_bytes]
+    try:
+        decoder = codecs.getincrementaldecoder(charset or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    return decoder.decode(data, final=not truncated)
+
+
+def _decode_body(lines: list[bytes], transfer_encoding: str, charset: str, max_bytes: int = None) -> str:
+    body = b"\n".join(lines)
+    if transfer_encoding == 'base64':
+        data = b"".join(line.strip() for line in lines)
+        if max_bytes is not None:
+            # only the base64 quanta that cover the first max_bytes are decoded
+            data = data[:(max_bytes // 3 + 1) * 4]
+        body = base64.b64decode(data + b"=" * (-len(data) % 4))
+    elif transfer_encoding == 'quoted-printable':
+        body = quopri.decodestring(body)
+    return decode_text(body, charset, max_bytes)
+
+
+class StreamingMimeParser:
+    """
+        line based MIME reader for messages fetched with format='raw'
+        it walks the message once, keeps only the headers it needs, skips attachments and other non text parts
+        without buffering them, and stops as soon as the first text/plain part is complete
+        (a text/html part seen before it is kept as a fallback)
+    """
+    def __init__(self, header_names: tuple = ('Subject', 'From', 'Date'), max_decoded_bytes: int = DEFAULT_MAX_DECODED_BYTES):
+        self.header_names = {name.lower(): name for name in header_names}
+        self.max_decoded_bytes = max_decoded_bytes
+
+    def parse(self, raw: str) -> RawMimeResult:
+        return self.parse_lines(iter_raw_lines(raw))
+
+    def parse_bytes(self, message: bytes) -> RawMimeResult:
+        return self.parse_lines(iter_message_lines(message))
+
+    def parse_lines(self, lines) -> RawMimeResult:
+        result = RawMimeResult()
+        headers = self._read_headers(lines)
+        result.headers = [
+            {'name': self.header_names[name], 'value': _decode_header_value(value)}
+            for name, value in headers.items() if name in self.header_names
+        ]
+        self._read_entity(lines, headers, boundaries=[], result=result)
+        return result
+
+    def _read_headers(self, lines) -> dict:
+        headers = {}
+        last_name = None
+        for line in lines:
+            if not line:
+                break
+            text = line.decode('utf-8', errors='replace')
+            if text[:1] in (' ', '\t') and last_name:
+                headers[last_name] += ' ' + text.strip()
+                continue
+            name, _, value = text.partition(':')
+            last_name = name.strip().lower()
+            headers[last_name] = value.strip()
+        return headers
+
+    def _read_entity(self, lines, headers: dict, boundaries: list, result: RawMimeResult):
+        """
+        Read one entity whose headers were already consumed.
+        returns the boundary line that ended it (None at end of input), result.plain set means stop
+        """
+        mime_type, params = _parse_header_value(headers.get('content-type', 'text/plain'))
+        disposition, _ = _parse_header_value(headers.get('content-disposition', ''))
+
+        if mime_type.startswith('multipart/') and params.get('boundary'):
+            boundary = params['boundary'].encode()
+            inner = boundaries + [boundary]
+            end_line = self._skip_until_boundary(lines, inner)
+            # preamble skipped, read the parts until this multipart's closing boundary
+            while end_line == b"--" + boundary:
+                part_headers = self._read_headers(lines)
+                end_line = self._read_entity(lines, part_headers, inner, result)
+                if result.plain is not None:
+                    return None
+            if end_line == b"--" + boundary + b"--":
+                # epilogue until the enclosing boundary
+                return self._skip_until_boundary(lines, boundaries)
+            return end_line
+
+        result.mime_types.append(mime_type)
+        wanted = (
+            mime_type in TEXT_TYPES and disposition != 'attachment'
+            and not (mime_type == 'text/html' and result.html is not None)
+        )
+        body_lines = [] if wanted else None
+        end_line = self._skip_until_boundary(lines, boundaries, body_lines)
+        if wanted:
+            part = MimeTextPart(
+                mime_type=mime_type,
+                charset=params.get('charset', 'utf-8'),
+                text=_decode_body(
+                    body_lines, headers.get('content-transfer-encoding', '7bit').lower(), params.get('charset'),
+                    self.max_decoded_bytes
+                ),
+            )
+            if mime_type == 'text/plain':
+                result.plain = part
+            else:
+                result.html = part
+        return end_line
+
+    def _skip_until_boundary(self, lines, boundaries: list, collect: list = None):
+        """Consume lines until a delimiter of any enclosing multipart, optionally collecting them"""
+        delimiters = {b"--" + boundary for boundary in boundaries} | {b"--" + boundary + b"--" for boundary in boundaries}
+        # encoded text is at most ~3x its decoded size (quoted-printable), past that the lines can't be needed
+        collect_limit = self.max_decoded_bytes * 3 if self.max_decoded_bytes is not None else None
+        collected = 0
+        for line in lines:
+            if line.startswith(b"--") and line.rstrip() in delimiters:
+                return line.rstrip()
+            if collect is not None and (collect_limit is None or collected < collect_limit):
+                collect.append(line)
+                collected += len(line) + 1
+        return None
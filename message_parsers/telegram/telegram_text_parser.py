@@ -1,6 +1,6 @@
 from datetime import datetime
 from models import Source, ContentType
-from utils.text_utils import clean_text
+from utils.text_normalization import clean_text
 
 class TelegramTextParser:
     def __init__(self):
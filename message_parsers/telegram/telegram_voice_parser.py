@@ -55,6 +55,7 @@ class TelegramVoiceParser:
         parsed_data = {
             'type': 'voice',
             'voice_file_id': voice.get('file_id'),
+            'voice_duration': voice.get('duration'),
             'content_data': content_data,
             'sender_data': sender_data,
         }
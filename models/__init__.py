@@ -3,8 +3,9 @@ from sqlalchemy.orm import declarative_base
 # Create a shared Base for all models
 Base = declarative_base()
 
-from .content import Content, ContentType, Source, Category
+from .content import Content, ContentType, Source, Category, ClassificationState
 from .entity import Entity, EntityType
+from .content_duplicate import ContentDuplicate
 
 __all__ = [
     'Base',
@@ -13,5 +14,7 @@ __all__ = [
     'EntityType',
     'Source',
     'Category',
-    'Entity'
+    'ClassificationState',
+    'Entity',
+    'ContentDuplicate'
 ] 
\ No newline at end of file
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, String, DateTime, Text, Integer, Enum, UniqueConstraint
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, DateTime, Text, Integer, BigInteger, Float, JSON, Enum, UniqueConstraint
+from sqlalchemy.sql import func, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import TypeDecorator, String as SQLAString
 from . import Base
 from enum import Enum as PyEnum
+from utils.text_compression import compress_text, decompress_text
 import uuid
 """
     I should change name of this model and its classses to message if I get time later 
@@ -25,10 +26,16 @@ class Category(PyEnum):
     IDEA = 'idea'
     OTHER = 'other'
     
+class ClassificationState(PyEnum):
+    CLASSIFIED = 'classified'
+    # stored while the LLM was unavailable, category 'other' and no entities until the reclassifier gets to it
+    PENDING = 'pending'
+    
 class FlexibleEnum(TypeDecorator):
     """A flexible enum type that can handle both enum objects and strings"""
     
     impl = SQLAString  # Tells SQLAlchemy to store the value as a string
+    cache_ok = True
     
     def __init__(self, enum_class):
         self.enum_class = enum_class
@@ -55,6 +62,23 @@ class FlexibleEnum(TypeDecorator):
     @property
     def python_type(self):
         return self.enum_class
+
+
+class CompressedText(TypeDecorator):
+    """Text column that is stored compressed above a size threshold (see utils/text_compression), plain rows still read"""
+    
+    impl = Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+    
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+    
+    @property
+    def python_type(self):
+        return str
     
 class Content(Base):
     """Main content table for all message types (text, voice, image, etc.).
@@ -73,13 +97,36 @@ class Content(Base):
     source_id = Column(String(255), nullable=False)  
     content_type = Column(FlexibleEnum(ContentType), nullable=False)   
     category = Column(FlexibleEnum(Category), nullable=False, default=Category.OTHER)
+    classification_state = Column(FlexibleEnum(ClassificationState), nullable=False, default=ClassificationState.CLASSIFIED,
+                                  server_default=ClassificationState.CLASSIFIED.value, index=True)
+    # how the category was decided (services.pre_classifier.CategoryDecision), None for older rows and while pending
+    category_provenance = Column(String(20), nullable=True, index=True)
+    category_confidence = Column(Float, nullable=True)
+    category_rules = Column(JSON, nullable=True)
     subject = Column(String(255), nullable=True)    
-    content_data = Column(Text, nullable=False)         
-    content_html = Column(Text, nullable=True)          
+    content_data = Column(CompressedText, nullable=False)         
+    content_html = Column(CompressedText, nullable=True)          
     source = Column(FlexibleEnum(Source), nullable=False)        
     timestamp = Column(DateTime, nullable=False)        
     created_at = Column(DateTime, default=func.now())   
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    # bumped by every update, updated_at has whole second resolution on SQLite and can't tell two edits of a second apart
+    revision = Column(Integer, nullable=False, default=1, server_default='1', onupdate=literal_column('revision') + 1)
+    # SimHash of content_data (utils/simhash) and its bands (as many as the layout uses), indexed for near-duplicate lookups
+    fingerprint = Column(BigInteger, nullable=True)
+    fingerprint_band_0 = Column(Integer, nullable=True, index=True)
+    fingerprint_band_1 = Column(Integer, nullable=True, index=True)
+    fingerprint_band_2 = Column(Integer, nullable=True, index=True)
+    fingerprint_band_3 = Column(Integer, nullable=True, index=True)
+    fingerprint_band_4 = Column(Integer, nullable=True, index=True)
+    fingerprint_band_5 = Column(Integer, nullable=True, index=True)
+    fingerprint_band_6 = Column(Integer, nullable=True, index=True)
+    fingerprint_band_7 = Column(Integer, nullable=True, index=True)
+    # LLM usage of the message (agents + transcription, utils/llm_metrics), only filled when llm_usage_per_content is on
+    llm_prompt_tokens = Column(Integer, nullable=True)
+    llm_completion_tokens = Column(Integer, nullable=True)
+    llm_latency_ms = Column(Integer, nullable=True)
+    llm_cost_usd = Column(Float, nullable=True)
     
  
     entities = relationship("Entity", back_populates="content", cascade="all, delete-orphan")
@@ -101,6 +148,9 @@ class Content(Base):
             'content_html': self.content_html,
             'source': self.source.value if self.source else None,
             'category': self.category.value if self.category else None,
+            'category_provenance': self.category_provenance,
+            'category_confidence': self.category_confidence,
+            'category_rules': self.category_rules,
             'subject': self.subject if self.subject else None,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from . import Base
+
+
+class ContentDuplicate(Base):
+    """Links a content to an earlier near-duplicate of it that arrived through another source (email <-> telegram)."""
+    
+    __tablename__ = 'content_duplicate'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_id = Column(String(36), ForeignKey('content.id'), nullable=False, index=True)
+    duplicate_of_id = Column(String(36), ForeignKey('content.id'), nullable=False, index=True)
+    hamming_distance = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('content_id', 'duplicate_of_id', name='uq_content_duplicate'),
+    )
@@ -0,0 +1,114 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, and_, func, insert
+from sqlalchemy.orm import selectinload
+from models import Content, Entity
+from schemas.schemas import SearchQuery
+from repository.content_repository import build_search_conditions, skip_duplicates_insert, existing_keys_query, rows_without_existing
+from typing import List
+
+
+class AsyncContentRepository:
+    """
+    Async twin of ContentRepository used by the API routes, queries run on the aiosqlite/asyncpg engine
+    so a slow query never blocks the event loop.
+    entities are always loaded with selectinload because lazy loading is not possible on an AsyncSession
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_content(self, content: Content) -> Content:
+        try:
+            self.db.add(content)
+            await self.db.commit()
+            return content
+        except IntegrityError as e:
+            await self.db.rollback()
+            if "UNIQUE constraint failed: content.source_id, content.source" in str(e) or "uq_source_id_source" in str(e):
+                print(f"Duplicate message detected: source_id={content.source_id}, source={content.source}")
+                return None
+            else:
+                raise e
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+    async def bulk_create_contents(self, content_rows: list[dict], entity_rows: list[dict]) -> set[str]:
+        """
+        Insert many contents and their entities in a single transaction with set based INSERTs.
+        content rows must carry their own id, rows that hit uq_source_id_source are skipped by the database
+        (ON CONFLICT DO NOTHING) and so are their entities. Returns the ids that were actually inserted
+        """
+        if not content_rows:
+            return set()
+        try:
+            statement = skip_duplicates_insert(self.db.bind.dialect.name)
+            if statement is not None:
+                result = await self.db.execute(statement, content_rows)
+                inserted_ids = set(result.scalars().all())
+            else:
+                # no portable ON CONFLICT, look the existing keys up first
+                existing = await self.db.execute(existing_keys_query(content_rows))
+                new_rows = rows_without_existing(content_rows, existing.all())
+                if new_rows:
+                    await self.db.execute(insert(Content), new_rows)
+                inserted_ids = {row['id'] for row in new_rows}
+            
+            new_entity_rows = [row for row in entity_rows if row['content_id'] in inserted_ids]
+            if new_entity_rows:
+                await self.db.execute(insert(Entity), new_entity_rows)
+            await self.db.commit()
+            return inserted_ids
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+    async def get_data_version(self, content_id: str = None) -> tuple:
+        """
+        (content count, max content.updated_at, sum of content.revision, entity count, max entity id, max entity.created_at)
+        in one round trip, it changes whenever a content or one of its entities is added, updated or deleted,
+        the revisions also tell apart updates made within the same second (updated_at's resolution on SQLite)
+        """
+        content_filter = [Content.id == content_id] if content_id else []
+        entity_filter = [Entity.content_id == content_id] if content_id else []
+        query = select(
+            select(func.count(Content.id)).where(*content_filter).scalar_subquery(),
+            select(func.max(Content.updated_at)).where(*content_filter).scalar_subquery(),
+            select(func.coalesce(func.sum(Content.revision), 0)).where(*content_filter).scalar_subquery(),
+            select(func.count(Entity.id)).where(*entity_filter).scalar_subquery(),
+            select(func.max(Entity.id)).where(*entity_filter).scalar_subquery(),
+            select(func.max(Entity.created_at)).where(*entity_filter).scalar_subquery(),
+        )
+        result = await self.db.execute(query)
+        return tuple(result.one())
+
+    async def get_content_by_id(self, content_id: str) -> Content:
+        result = await self.db.execute(select(Content).filter(Content.id == content_id))
+        return result.scalars().first()
+
+    async def get_public_summary(self, content_id: str = None) -> List[Content]:
+        """Get contents with their entities in two queries to avoid N+1 problem"""
+        query = select(Content).options(selectinload(Content.entities))
+        if content_id:
+            query = query.filter(Content.id == content_id)
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def get_contents_by_ids(self, content_ids: list[str]) -> List[Content]:
+        """Get contents with their entities, in the same order as `content_ids`"""
+        if not content_ids:
+            return []
+        result = await self.db.execute(
+            select(Content).options(selectinload(Content.entities)).filter(Content.id.in_(content_ids))
+        )
+        by_id = {content.id: content for content in result.scalars().all()}
+        return [by_id[content_id] for content_id in content_ids if content_id in by_id]
+
+    async def search_contents(self, search_query: SearchQuery) -> List[Content]:
+        """Same filters as ContentRepository.search_contents"""
+        query = select(Content).options(selectinload(Content.entities))
+        conditions = build_search_conditions(search_query)
+        if conditions:
+            query = query.filter(and_(*conditions))
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
@@ -0,0 +1,18 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Entity
+
+
+class AsyncEntityRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_entity(self, entity: Entity) -> Entity:
+        """Create a single entity"""
+        try:
+            self.db.add(entity)
+            await self.db.commit()
+            await self.db.refresh(entity)
+            return entity
+        except Exception as e:
+            await self.db.rollback()
+            raise ValueError(f"Error creating entity: {e}")
@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+from models import Content, Entity, Category, ClassificationState, ContentDuplicate
+from repository.content_repository import ContentRepository
+from repository.content_duplicate_repository import ContentDuplicateRepository
+
+
+class BatchWriter:
+    """
+        write-behind buffer in front of ContentRepository/EntityRepository
+        processed messages are queued with submit() and written together with one multi-row INSERT per table
+        and a single commit, either when `max_rows` messages are waiting or `max_delay_ms` after the oldest one
+        flush() writes everything right away, the pollers call it before they move their checkpoint
+        (telegram offset / marking emails as read) so a crash never loses an acknowledged message
+    """
+    def __init__(self, session_factory, max_rows: int = 100, max_delay_ms: int = 500, on_flushed=None):
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_delay_ms = max_delay_ms
+        self.on_flushed = on_flushed
+        self._pending: list[tuple[dict, list[dict], Content, list[ContentDuplicate]]] = []
+        self._pending_keys = set()
+        self._oldest_pending_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, content: Content, entities: list[Entity] = None, duplicate_links: list[ContentDuplicate] = None) -> Content:
+        """
+        Queue one content with its entities (and links to near-duplicates of it),
+        the content gets its id now so callers can use it right away
+        """
+        if content.id is None:
+            content.id = str(uuid.uuid4())
+        if content.category is None:
+            content.category = Category.OTHER
+        if content.classification_state is None:
+            content.classification_state = ClassificationState.CLASSIFIED
+        content_row = {column.name: getattr(content, column.name) for column in Content.__table__.columns
+                       if column.name not in ('created_at', 'updated_at', 'revision')}
+        entity_rows = [
+            {'content_id': content.id, 'entity_type': entity.entity_type, 'entity_value': entity.entity_value}
+            for entity in entities or []
+        ]
+        for entity in entities or []:
+            entity.content_id = content.id
+        for link in duplicate_links or []:
+            link.content_id = content.id
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchWriter is closed")
+            self._pending.append((content_row, entity_rows, content, duplicate_links or []))
+            self._pending_keys.add(self._key(content.source_id, content.source))
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+            should_flush = len(self._pending) >= self.max_rows
+            self._wakeup.notify()
+        if should_flush:
+            self.flush()
+        return content
+
+    def is_pending(self, source_id: str, source) -> bool:
+        """True if this message is queued but not written yet (duplicate check before classification)"""
+        with self._lock:
+            return self._key(source_id, source) in self._pending_keys
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write every queued message now in one transaction, returns how many contents were inserted"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = []
+                self._oldest_pending_at = None
+            if not batch:
+                return 0
+            db = self.session_factory()
+            try:
+                inserted_ids = ContentRepository(db).bulk_create_contents(
+                    [content_row for content_row, _, _, _ in batch],
+                    [row for _, entity_rows, _, _ in batch for row in entity_rows],
+                    commit=False,
+                )
+                links = [link for _, _, content, content_links in batch if content.id in inserted_ids for link in content_links]
+                if links:
+                    ContentDuplicateRepository(db).create_links(links, commit=False)
+                db.commit()
+            except Exception:
+                # put the batch back in front so the next flush retries it
+                with self._lock:
+                    self._pending = batch + self._pending
+                    self._oldest_pending_at = time.monotonic()
+                raise
+            finally:
+                db.close()
+            with self._lock:
+                for content_row, _, _, _ in batch:
+                    self._pending_keys.discard(self._key(content_row['source_id'], content_row['source']))
+            if self.on_flushed:
+                try:
+                    self.on_flushed([content for _, _, content, _ in batch if content.id in inserted_ids])
+                except Exception as e:
+                    print(f"Error in BatchWriter on_flushed callback: {e}")
+            return len(inserted_ids)
+
+    def close(self):
+        """Flush what is left and stop the background thread, called on shutdown"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join(timeout=max(self.max_delay_ms / 1000, 1))
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                if self._oldest_pending_at is None:
+                    self._wakeup.wait()
+                    continue
+                remaining = self._oldest_pending_at + self.max_delay_ms / 1000 - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing write-behind batch: {e}")
+                time.sleep(self.max_delay_ms / 1000)
+
+    def _key(self, source_id: str, source) -> tuple:
+        return (source_id, getattr(source, 'value', source))
@@ -0,0 +1,248 @@
+import io
+import json
+import time
+import uuid
+from sqlalchemy.orm import Session
+from models import ContentType, Source, Category, ClassificationState, EntityType
+from schemas.schemas import BulkContentItem
+from repository.content_repository import ContentRepository
+from utils.text_compression import compress_text
+from utils.simhash import fingerprint_columns, FINGERPRINT_BANDS
+
+CONTENT_COPY_COLUMNS = [
+    'id', 'source_id', 'content_type', 'category', 'classification_state',
+    'category_provenance', 'category_confidence', 'category_rules',
+    'subject', 'content_data', 'content_html', 'source', 'timestamp',
+    'fingerprint', *[f'fingerprint_band_{band}' for band in range(FINGERPRINT_BANDS)],
+]
+ENTITY_COPY_COLUMNS = ['content_id', 'entity_type', 'entity_value']
+COMPRESSED_COLUMNS = ('content_data', 'content_html')
+
+
+def bulk_item_rows(item: BulkContentItem) -> tuple[dict, list[dict]]:
+    """Validated insert rows for one bulk item (content row with a new id + its entity rows), ValueError on bad enums"""
+    try:
+        content_type = ContentType(item.content_type.lower()).value
+        source = Source(item.source.lower()).value
+        category = Category(item.category.lower()).value
+        classification_state = ClassificationState(item.classification_state.lower()).value
+        entity_types = [EntityType(entity.entity_type.upper()).value for entity in item.entities]
+    except ValueError as e:
+        raise ValueError(f"Invalid value: {e}")
+    content_id = str(uuid.uuid4())
+    content_row = {
+        'id': content_id,
+        'source_id': item.source_id,
+        'content_type': content_type,
+        'category': category,
+        'classification_state': classification_state,
+        # only set on the importer's ArchiveContentItem, what a client sends is never taken as provenance
+        'category_provenance': getattr(item, 'category_provenance', None),
+        'category_confidence': getattr(item, 'category_confidence', None),
+        'category_rules': getattr(item, 'category_rules', None),
+        'subject': item.subject,
+        'content_data': item.content_data,
+        'content_html': item.content_html,
+        'source': source,
+        'timestamp': item.timestamp,
+        **fingerprint_columns(item.content_data),
+    }
+    entity_rows = [
+        {'content_id': content_id, 'entity_type': entity_type, 'entity_value': entity.entity_value}
+        for entity_type, entity in zip(entity_types, item.entities)
+    ]
+    return content_row, entity_rows
+
+
+class _CsvStream(io.RawIOBase):
+    """
+    read-only file object that renders rows to CSV on demand, so COPY FROM STDIN can pull a batch
+    without the whole CSV text ever being built in memory
+    """
+    def __init__(self, rows, columns: list[str]):
+        self._rows = iter(rows)
+        self._columns = columns
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def _render(self, row: dict) -> bytes:
+        # every value is quoted so '' stays an empty string, None is left as a bare empty field which COPY reads as NULL
+        # (csv.writer can't do this before 3.12, QUOTE_NONNUMERIC writes None as "")
+        fields = []
+        for column in self._columns:
+            value = row.get(column)
+            if value is None:
+                fields.append("")
+                continue
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif hasattr(value, 'value'):
+                value = value.value
+            fields.append('"' + str(value).replace('"', '""') + '"')
+        return (",".join(fields) + "\n").encode("utf-8")
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += self._render(next(self._rows))
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class BulkLoadReport:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.entities = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def rows_per_sec(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"read {self.read} | inserted {self.inserted} | skipped (duplicates) {self.skipped} | "
+                f"invalid {self.invalid} | entities {self.entities} | {self.rows_per_sec:.0f} rows/s")
+
+
+class PostgresCopyLoader:
+    """
+        loads a batch with COPY FROM STDIN into temporary staging tables and merges it into content/entity
+        with one INSERT ... SELECT ... ON CONFLICT ON CONSTRAINT uq_source_id_source DO NOTHING,
+        entities are only merged for the contents that were really inserted
+    """
+    MERGE_SQL = f"""
+        WITH inserted AS (
+            INSERT INTO content ({', '.join(CONTENT_COPY_COLUMNS)}, created_at, updated_at)
+            SELECT DISTINCT ON (source_id, source) {', '.join(CONTENT_COPY_COLUMNS)}, now(), now()
+            FROM content_staging
+            ORDER BY source_id, source
+            ON CONFLICT ON CONSTRAINT uq_source_id_source DO NOTHING
+            RETURNING id
+        ), inserted_entities AS (
+            INSERT INTO entity ({', '.join(ENTITY_COPY_COLUMNS)}, created_at)
+            SELECT es.content_id, es.entity_type, es.entity_value, now()
+            FROM entity_staging es JOIN inserted i ON i.id = es.content_id
+            RETURNING 1
+        )
+        SELECT (SELECT array_agg(id) FROM inserted), (SELECT count(*) FROM inserted_entities)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def load_batch(self, content_rows: list[dict], entity_rows: list[dict]) -> tuple[set[str], int]:
+        """Returns (ids of the contents inserted, entities inserted), the batch is one transaction"""
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS content_staging "
+                "(LIKE content INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS entity_staging "
+                "(content_id varchar(36), entity_type varchar, entity_value text) ON COMMIT DELETE ROWS"
+            )
+            cursor.copy_expert(
+                f"COPY content_staging ({', '.join(CONTENT_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                # COPY skips the CompressedText and JSON column types, so compress the big text columns
+                # and serialize the fired rules here
+                _CsvStream(
+                    ({**row, **{column: compress_text(row[column]) for column in COMPRESSED_COLUMNS},
+                      'category_rules': json.dumps(row['category_rules']) if row['category_rules'] is not None else None}
+                     for row in content_rows),
+                    CONTENT_COPY_COLUMNS,
+                ),
+            )
+            cursor.copy_expert(
+                f"COPY entity_staging ({', '.join(ENTITY_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                _CsvStream(entity_rows, ENTITY_COPY_COLUMNS),
+            )
+            cursor.execute(self.MERGE_SQL)
+            inserted_ids, entities = cursor.fetchone()
+            connection.commit()
+            return set(inserted_ids or []), entities
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+
+class ExecutemanyLoader:
+    """Fallback for SQLite (and anything without COPY), same set based insert as the bulk API"""
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def load_batch(self, content_rows: list[dict], entity_rows: list[dict]) -> tuple[set[str], int]:
+        db: Session = self.session_factory()
+        try:
+            inserted_ids = ContentRepository(db).bulk_create_contents(content_rows, entity_rows)
+        finally:
+            db.close()
+        return inserted_ids, sum(1 for row in entity_rows if row['content_id'] in inserted_ids)
+
+
+def get_bulk_loader(engine, session_factory):
+    if engine.dialect.name == "postgresql":
+        return PostgresCopyLoader(engine)
+    return ExecutemanyLoader(session_factory)
+
+
+def load_items(loader, items, batch_size: int = 10000, report: BulkLoadReport = None, on_batch=None,
+               embedding_service=None) -> BulkLoadReport:
+    """
+    Stream BulkContentItem objects into the database batch by batch, only one batch is held in memory.
+    with an `embedding_service` the contents inserted by a batch are indexed for semantic search once it is committed,
+    like the bulk API does. `on_batch(report)` is called after every committed batch (progress output)
+    """
+    report = report or BulkLoadReport()
+    content_rows, entity_rows = [], []
+
+    def flush():
+        if not content_rows:
+            return
+        inserted_ids, entities = loader.load_batch(content_rows, entity_rows)
+        report.inserted += len(inserted_ids)
+        report.entities += entities
+        report.skipped += len(content_rows) - len(inserted_ids)
+        if embedding_service is not None and inserted_ids:
+            try:
+                embedding_service.index_rows([row for row in content_rows if row['id'] in inserted_ids])
+            except Exception as e:
+                print(f"Failed to index bulk loaded contents for semantic search: {e}")
+        content_rows.clear()
+        entity_rows.clear()
+        if on_batch:
+            on_batch(report)
+
+    for item in items:
+        report.read += 1
+        try:
+            content_row, rows = bulk_item_rows(item)
+        except ValueError as e:
+            report.invalid += 1
+            print(f"Skipping invalid record {item.source_id}: {e}")
+            continue
+        content_rows.append(content_row)
+        entity_rows.extend(rows)
+        if len(content_rows) >= batch_size:
+            flush()
+    flush()
+    return report
@@ -0,0 +1,21 @@
+from sqlalchemy.orm import Session
+from models import ContentDuplicate
+
+class ContentDuplicateRepository:
+    def __init__(self, db: Session):
+        self.db = db
+        
+    def create_links(self, links: list[ContentDuplicate], commit: bool = True):
+        try:
+            self.db.add_all(links)
+            if commit:
+                self.db.commit()
+            else:
+                self.db.flush()
+        except Exception as e:
+            self.db.rollback()
+            raise ValueError(f"Error creating duplicate links: {e}")
+    
+    def get_duplicates_of(self, content_id: str) -> list[ContentDuplicate]:
+        """Links where `content_id` is the original, one per later copy from another source"""
+        return self.db.query(ContentDuplicate).filter(ContentDuplicate.duplicate_of_id == content_id).all()
@@ -1,13 +1,86 @@
 from sqlalchemy.orm import Session 
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import text
-from sqlalchemy.orm import joinedload
-from models import Content, Source, Entity, Category
+from sqlalchemy.orm import joinedload, selectinload
+from models import Content, Source, Entity, Category, ClassificationState
 import uuid
 from schemas.schemas import Public_Summary, SearchQuery
 from typing import List
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select, insert, tuple_, bindparam
+from sqlalchemy.dialects import sqlite, postgresql
 from datetime import datetime, timedelta
+from utils.simhash import band_columns, fingerprint_bands, hamming_distance, to_unsigned
+
+def build_search_conditions(search_query: SearchQuery) -> list:
+    """SQL filter conditions for a SearchQuery, shared by the sync and async repositories"""
+    # Build filter conditions
+    conditions = []
+    
+    # Filter by keywords (search in entity values)
+    if search_query.keywords and len(search_query.keywords) > 0:
+        keyword_conditions = []
+        for keyword in search_query.keywords:
+            # Skip empty keywords
+            if keyword and keyword.strip():
+                # Search in entity values using LIKE for partial matches
+                keyword_conditions.append(
+                    Content.entities.any(Entity.entity_value.ilike(f"%{keyword}%"))
+                )
+        if keyword_conditions:
+            conditions.append(or_(*keyword_conditions))
+    
+    # Filter by category (convert string to enum if not empty)
+    if search_query.category and search_query.category.strip():
+        try:
+            category_enum = Category(search_query.category.lower())
+            conditions.append(Content.category == category_enum)
+        except ValueError:
+            # If invalid category, skip this filter
+            pass
+    
+    # Filter by source (convert string to enum if not empty)
+    if search_query.source and search_query.source.strip():
+        try:
+            source_enum = Source(search_query.source.lower())
+            conditions.append(Content.source == source_enum)
+        except ValueError:
+            # If invalid source, skip this filter
+            pass
+    
+    # Filter by start date (content timestamp >= start_date_duration)
+    if search_query.start_date_duration is not None:
+        start_date = datetime.now() - timedelta(days=search_query.start_date_duration)
+        conditions.append(Content.timestamp >= start_date)
+    
+    # Filter by end date (content timestamp <= end_date_duration)
+    if search_query.end_date_duration is not None:
+        end_date = datetime.now() - timedelta(days=search_query.end_date_duration)
+        conditions.append(Content.timestamp <= end_date)
+    
+    return conditions
+
+def skip_duplicates_insert(dialect_name: str):
+    """
+    Multi-row INSERT into content that lets the database skip rows hitting uq_source_id_source
+    (ON CONFLICT DO NOTHING) and returns the ids it really inserted, None for dialects without ON CONFLICT
+    """
+    if dialect_name not in ("sqlite", "postgresql"):
+        return None
+    dialect_insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+    return dialect_insert(Content).on_conflict_do_nothing(
+        index_elements=[Content.source_id, Content.source]
+    ).returning(Content.id)
+
+def existing_keys_query(content_rows: list[dict]):
+    keys = [(row['source_id'], getattr(row['source'], 'value', row['source'])) for row in content_rows]
+    return select(Content.source_id, Content.source).where(tuple_(Content.source_id, Content.source).in_(keys))
+
+def rows_without_existing(content_rows: list[dict], existing_rows) -> list[dict]:
+    existing_keys = {(source_id, getattr(source, 'value', source)) for source_id, source in existing_rows}
+    return [
+        row for row in content_rows
+        if (row['source_id'], getattr(row['source'], 'value', row['source'])) not in existing_keys
+    ]
 
 class ContentRepository:
     """
@@ -16,10 +89,17 @@ class ContentRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_content(self, content: Content) -> Content:
+    def create_content(self, content: Content, commit: bool = True) -> Content:
+        """
+        commit=False only flushes, so the caller can write more rows and commit them all together (one unit of work),
+        a duplicate still returns None but then the whole pending transaction is rolled back
+        """
         try : 
             self.db.add(content)
-            self.db.commit()
+            if commit:
+                self.db.commit()
+            else:
+                self.db.flush()
             return content 
         except IntegrityError as e:
             self.db.rollback()
@@ -31,14 +111,121 @@ class ContentRepository:
         except Exception as e:
             self.db.rollback()
             raise e
-    def update_content(self, content: Content) -> Content:
+    def update_content(self, content: Content, commit: bool = True) -> Content:
         try : 
             self.db.add(content)
-            self.db.commit()
+            if commit:
+                self.db.commit()
+            else:
+                self.db.flush()
             return content 
         except Exception as e:
             self.db.rollback()
             raise ValueError(f"Error updating content: {e}")
+    def bulk_create_contents(self, content_rows: list[dict], entity_rows: list[dict], commit: bool = True) -> set[str]:
+        """
+        Insert many contents and their entities with set based INSERTs in one transaction.
+        content rows must carry their own id, rows hitting uq_source_id_source are skipped and so are their entities.
+        Returns the ids that were actually inserted
+        """
+        if not content_rows:
+            return set()
+        try:
+            statement = skip_duplicates_insert(self.db.get_bind().dialect.name)
+            if statement is not None:
+                inserted_ids = set(self.db.execute(statement, content_rows).scalars().all())
+            else:
+                # no portable ON CONFLICT, look the existing keys up first
+                existing = self.db.execute(existing_keys_query(content_rows)).all()
+                new_rows = rows_without_existing(content_rows, existing)
+                if new_rows:
+                    self.db.execute(insert(Content), new_rows)
+                inserted_ids = {row['id'] for row in new_rows}
+            
+            new_entity_rows = [row for row in entity_rows if row['content_id'] in inserted_ids]
+            if new_entity_rows:
+                self.db.execute(insert(Entity), new_entity_rows)
+            if commit:
+                self.db.commit()
+            return inserted_ids
+        except Exception as e:
+            self.db.rollback()
+            raise e
+    def content_exists(self, source_id: str, source: Source) -> bool:
+        """Cheap check on uq_source_id_source, used to skip duplicates before paying for classification"""
+        result = self.db.execute(
+            text("SELECT 1 FROM content WHERE source_id = :source_id AND source = :source LIMIT 1"),
+            {"source_id": source_id, "source": source.value if hasattr(source, 'value') else source}
+        ).first()
+        return result is not None
+    def get_existing_source_keys(self, content_rows: list[dict]) -> set[tuple[str, str]]:
+        """(source_id, source value) of the rows among `content_rows` that are already stored"""
+        if not content_rows:
+            return set()
+        return {(source_id, getattr(source, 'value', source)) for source_id, source in self.db.execute(existing_keys_query(content_rows))}
+
+    def find_near_duplicate(self, fingerprint: int, max_distance: int, since: datetime = None):
+        """
+        Closest stored content whose fingerprint is within `max_distance` bits of `fingerprint` (the stored, signed value),
+        as (content with entities, distance) or None.
+        candidates come from the indexed band columns (one equal band is enough), only their fingerprints are loaded
+        """
+        if fingerprint is None:
+            return None
+        bands = fingerprint_bands(to_unsigned(fingerprint))
+        conditions = [or_(*[
+            Content.__table__.c[f'fingerprint_band_{band}'] == value for band, value in enumerate(bands)
+        ])]
+        if since is not None:
+            conditions.append(Content.timestamp >= since)
+        candidates = self.db.execute(
+            select(Content.id, Content.fingerprint).where(and_(*conditions))
+        ).all()
+        best = min(
+            ((hamming_distance(to_unsigned(candidate_fingerprint), to_unsigned(fingerprint)), content_id)
+             for content_id, candidate_fingerprint in candidates if candidate_fingerprint is not None),
+            default=None,
+        )
+        if best is None or best[0] > max_distance:
+            return None
+        distance, content_id = best
+        content = self.db.query(Content).options(
+            selectinload(Content.entities)
+        ).filter(Content.id == content_id).first()
+        return content, distance
+
+    def rebuild_fingerprint_bands(self, batch_size: int = 1000) -> int:
+        """
+        Recompute the band columns of every fingerprinted content with the current band layout (after max_distance
+        changed), from the stored fingerprints, in batches ordered by id each committed on its own. Returns the rows updated
+        """
+        table = Content.__table__
+        updated, last_id = 0, ''
+        while True:
+            rows = self.db.execute(
+                select(table.c.id, table.c.fingerprint)
+                .where(table.c.id > last_id, table.c.fingerprint.isnot(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return updated
+            self.db.execute(
+                table.update().where(table.c.id == bindparam('row_id')).values(
+                    {column: bindparam(column) for column in band_columns(0)}
+                ),
+                [{'row_id': row.id, **band_columns(to_unsigned(row.fingerprint))} for row in rows],
+            )
+            self.db.commit()
+            updated += len(rows)
+            last_id = rows[-1].id
+
+    def get_pending_contents(self, limit: int) -> list[Content]:
+        """oldest contents stored while the LLM was unavailable, for the reclassifier"""
+        return self.db.query(Content).filter(
+            Content.classification_state == ClassificationState.PENDING
+        ).order_by(Content.timestamp, Content.id).limit(limit).all()
+
     def get_last_source_id(self, source: Source):
         """To get the last processed source_id for a given source."""
         try:
@@ -57,6 +244,15 @@ class ContentRepository:
             return 0
     def get_content_by_id(self, content_id: uuid.UUID) -> Content:
         return self.db.query(Content).filter(Content.id == content_id).first()
+    def get_contents_by_ids(self, content_ids: list[str]) -> list[Content]:
+        """Get contents with their entities, in the same order as `content_ids`"""
+        if not content_ids:
+            return []
+        contents = self.db.query(Content).options(
+            joinedload(Content.entities)
+        ).filter(Content.id.in_(content_ids)).all()
+        by_id = {content.id: content for content in contents}
+        return [by_id[content_id] for content_id in content_ids if content_id in by_id]
     def get_public_summary(self, content_id: str = None) -> list[Content]:
         """Get contents with their entities in a single query to avoid N+1 problem"""
         query = self.db.query(Content).options(
@@ -81,49 +277,7 @@ class ContentRepository:
             joinedload(Content.entities)
         )
         
-        # Build filter conditions
-        conditions = []
-        
-        # Filter by keywords (search in entity values)
-        if search_query.keywords and len(search_query.keywords) > 0:
-            keyword_conditions = []
-            for keyword in search_query.keywords:
-                # Skip empty keywords
-                if keyword and keyword.strip():
-                    # Search in entity values using LIKE for partial matches
-                    keyword_conditions.append(
-                        Content.entities.any(Entity.entity_value.ilike(f"%{keyword}%"))
-                    )
-            if keyword_conditions:
-                conditions.append(or_(*keyword_conditions))
-        
-        # Filter by category (convert string to enum if not empty)
-        if search_query.category and search_query.category.strip():
-            try:
-                category_enum = Category(search_query.category.lower())
-                conditions.append(Content.category == category_enum)
-            except ValueError:
-                # If invalid category, skip this filter
-                pass
-        
-        # Filter by source (convert string to enum if not empty)
-        if search_query.source and search_query.source.strip():
-            try:
-                source_enum = Source(search_query.source.lower())
-                conditions.append(Content.source == source_enum)
-            except ValueError:
-                # If invalid source, skip this filter
-                pass
-        
-        # Filter by start date (content timestamp >= start_date_duration)
-        if search_query.start_date_duration is not None:
-            start_date = datetime.now() - timedelta(days=search_query.start_date_duration)
-            conditions.append(Content.timestamp >= start_date)
-        
-        # Filter by end date (content timestamp <= end_date_duration)
-        if search_query.end_date_duration is not None:
-            end_date = datetime.now() - timedelta(days=search_query.end_date_duration)
-            conditions.append(Content.timestamp <= end_date)
+        conditions = build_search_conditions(search_query)
         
         # Apply all conditions if any exist
         if conditions:
@@ -131,4 +285,20 @@ class ContentRepository:
         
         # Execute query and return results
         contents = query.all()
-        return contents
\ No newline at end of file
+        return contents
+    def iter_contents(self, search_query: SearchQuery = None, batch_size: int = 1000):
+        """
+        Stream contents (with entities) matching the optional search query.
+        yield_per keeps only one batch in memory and makes the driver use a server side cursor where it has one,
+        entities are loaded per batch with one extra IN query (joinedload can not be combined with yield_per)
+        """
+        query = self.db.query(Content).options(
+            selectinload(Content.entities)
+        ).order_by(Content.timestamp, Content.id)
+        
+        conditions = build_search_conditions(search_query) if search_query else []
+        if conditions:
+            query = query.filter(and_(*conditions))
+        
+        for content in query.yield_per(batch_size):
+            yield content
@@ -5,10 +5,13 @@ class EntityRepository:
     def __init__(self, db: Session):
         self.db = db
         
-    def create_entities(self, entities: list[Entity]):
+    def create_entities(self, entities: list[Entity], commit: bool = True):
         try:
             self.db.add_all(entities)
-            self.db.commit()
+            if commit:
+                self.db.commit()
+            else:
+                self.db.flush()
         except Exception as e:
             self.db.rollback()
             raise ValueError(f"Error creating entities: {e}")
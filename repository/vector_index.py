@@ -0,0 +1,133 @@
+import fcntl
+import os
+import threading
+import numpy as np
+
+
+class VectorIndex:
+    """
+        file backed store of content embeddings
+        - vectors.f32 : contiguous float32 matrix, one row per content, appended in place
+        - ids.txt     : the content id of every row, one per line in the same order
+        the matrix is opened as a read only memmap on the first search, so startup never touches it,
+        and appends only write the new rows to the end of both files (the vector first, then its id)
+        the pollers, the API and the CLIs each hold their own instance, so writes take an exclusive
+        flock on index.lock and reload whatever the other processes appended before writing
+        a crash between or during the two writes leaves the files out of step, loading keeps the rows
+        both files have complete and a writer's load cuts both files back to them under the lock
+    """
+    VECTORS_FILE = "vectors.f32"
+    IDS_FILE = "ids.txt"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, index_path: str, dimension: int):
+        self.index_path = index_path
+        self.dimension = dimension
+        self.vectors_path = os.path.join(index_path, self.VECTORS_FILE)
+        self.ids_path = os.path.join(index_path, self.IDS_FILE)
+        self.lock_path = os.path.join(index_path, self.LOCK_FILE)
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._ids = None
+        self._row_by_id = None
+        # (vectors.f32 size, ids.txt size) when the ids were read, a change means another process wrote
+        self._loaded_sizes = None
+        # whether both files held exactly the loaded rows, nothing left over by a crash
+        self._aligned = True
+
+    def _row_bytes(self) -> int:
+        return self.dimension * np.dtype(np.float32).itemsize
+
+    def _file_sizes(self) -> tuple[int, int]:
+        return tuple(os.path.getsize(path) if os.path.exists(path) else 0 for path in (self.vectors_path, self.ids_path))
+
+    def _load_ids(self, recover: bool = False):
+        """
+            read the ids again if either file changed since the last load
+            only a writer holding the file lock may `recover`, the readers just ignore the unpaired rows
+        """
+        sizes = self._file_sizes()
+        if self._ids is not None and sizes == self._loaded_sizes and (self._aligned or not recover):
+            return
+        lines = [""]
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                lines = f.read().split("\n")
+        # the last piece is "" after a complete line, anything else is an id whose write was cut short
+        ids = [line for line in lines[:-1] if line.strip()]
+        # a crash between the two appends can leave one file a row ahead, trust the shorter one
+        rows = sizes[0] // self._row_bytes()
+        self._ids = ids[:rows]
+        self._row_by_id = {content_id: row for row, content_id in enumerate(self._ids)}
+        self._aligned = sizes[0] == len(self._ids) * self._row_bytes() and len(ids) <= rows and not lines[-1]
+        if recover and not self._aligned:
+            if sizes[0] > len(self._ids) * self._row_bytes():
+                # a vector without its id or half a row
+                with open(self.vectors_path, "r+b") as f:
+                    f.truncate(len(self._ids) * self._row_bytes())
+            if len(ids) > rows or lines[-1]:
+                self._rewrite_ids_file()
+            sizes = self._file_sizes()
+            self._aligned = True
+        self._loaded_sizes = sizes
+
+    def _load_matrix(self):
+        if self._matrix is not None and self._matrix.shape[0] == len(self._ids):
+            return
+        if not self._ids:
+            self._matrix = np.empty((0, self.dimension), dtype=np.float32)
+            return
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self._ids), self.dimension))
+
+    def __len__(self):
+        with self._lock:
+            self._load_ids()
+            return len(self._ids)
+
+    def add(self, content_id: str, vector: np.ndarray):
+        """Append one vector, or overwrite its row in place if the content was already indexed."""
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dimension:
+            raise ValueError(f"Expected vector of dimension {self.dimension}, got {vector.shape[0]}")
+        os.makedirs(self.index_path, exist_ok=True)
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load_ids(recover=True)
+                row = self._row_by_id.get(content_id)
+                if row is not None:
+                    with open(self.vectors_path, "r+b") as f:
+                        f.seek(row * self._row_bytes())
+                        f.write(vector.tobytes())
+                    return
+                with open(self.vectors_path, "ab") as f:
+                    f.write(vector.tobytes())
+                with open(self.ids_path, "a", encoding="utf-8") as f:
+                    f.write(content_id + "\n")
+                self._row_by_id[content_id] = len(self._ids)
+                self._ids.append(content_id)
+                self._loaded_sizes = self._file_sizes()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _rewrite_ids_file(self):
+        # drop the ids that have no vector, written aside and renamed so a crash here loses nothing
+        temporary_path = self.ids_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            f.writelines(content_id + "\n" for content_id in self._ids)
+        os.replace(temporary_path, self.ids_path)
+
+    def search(self, query_vector: np.ndarray, top_k: int = 10) -> list[tuple[str, float]]:
+        """Return the `top_k` (content_id, cosine score) pairs, best first. Vectors are stored normalized."""
+        with self._lock:
+            self._load_ids()
+            self._load_matrix()
+            matrix = self._matrix
+            ids = self._ids[:matrix.shape[0]]
+        if top_k <= 0 or matrix.shape[0] == 0:
+            return []
+        scores = matrix @ np.asarray(query_vector, dtype=np.float32)
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(ids[row], float(scores[row])) for row in top]
@@ -1,23 +1,57 @@
-from fastapi import APIRouter, HTTPException, status
-from deps import SessionDep
-from schemas.schemas import ContentResponse, SearchQuery, CreateContentRequest, CreateEntityRequest, EntityResponse
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from deps import AsyncSessionDep
+from db import SessionLocal
+from schemas.schemas import ContentResponse, SearchQuery, CreateContentRequest, CreateEntityRequest, EntityResponse, SemanticSearchQuery, ContentExportQuery
+from schemas.schemas import BulkCreateContentRequest, BulkCreateContentResponse
 from services.content_table_service import ContentTableService
-from typing import List
+from services.async_content_table_service import AsyncContentTableService
+from typing import List, Annotated
 from sqlalchemy.exc import SQLAlchemyError
+from utils.http_cache import is_not_modified, cache_headers
 
 router = APIRouter(tags=["content_table"], prefix="/contents")
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _stream_export(search_query: SearchQuery, export_format: str):
+    # the request scoped session is closed before a streaming body is sent, so the export owns its session
+    db = SessionLocal()
+    try:
+        yield from ContentTableService(db).export_contents(search_query, export_format)
+    finally:
+        db.close()
+
+@router.get("/export")
+async def export_contents(export_query: Annotated[ContentExportQuery, Query()]):
+    """Stream every content matching the optional filters as NDJSON or CSV"""
+    return StreamingResponse(
+        _stream_export(export_query, export_query.format),
+        media_type=EXPORT_MEDIA_TYPES[export_query.format],
+        headers={"Content-Disposition": f'attachment; filename="contents.{export_query.format}"'},
+    )
+
 @router.get("/{content_id}")
-async def get_content_by_id(content_id: str, db: SessionDep):
+async def get_content_by_id(content_id: str, request: Request, response: Response, db: AsyncSessionDep):
     try:
-        content_table_service = ContentTableService(db)
-        content = content_table_service.get_public_summary(content_id=content_id)
+        content_table_service = AsyncContentTableService(db)
+        etag, last_modified, content_count = await content_table_service.get_cache_validators(content_id)
+        if not content_count:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Content with id {content_id} not found"
+            )
+        headers = cache_headers(etag, last_modified)
+        if is_not_modified(request.headers, etag, last_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        content = await content_table_service.get_public_summary(content_id=content_id)
         if not content:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Content with id {content_id} not found"
             )
-        return content[0] if content else None
+        response.headers.update(headers)
+        return content[0]
     except SQLAlchemyError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -25,10 +59,16 @@ async def get_content_by_id(content_id: str, db: SessionDep):
         )
 
 @router.get("/", response_model=List[ContentResponse])
-async def get_public_summary(db: SessionDep) -> List[ContentResponse]:
+async def get_public_summary(request: Request, response: Response, db: AsyncSessionDep) -> List[ContentResponse]:
     try:
-        content_table_service = ContentTableService(db)
-        public_summary = content_table_service.get_public_summary()
+        content_table_service = AsyncContentTableService(db)
+        # the frontend polls this constantly, answer unchanged polls with a 304 from one small aggregate query
+        etag, last_modified, _ = await content_table_service.get_cache_validators()
+        headers = cache_headers(etag, last_modified)
+        if is_not_modified(request.headers, etag, last_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        public_summary = await content_table_service.get_public_summary()
+        response.headers.update(headers)
         return public_summary
     except SQLAlchemyError as e:
         raise HTTPException(
@@ -37,10 +77,10 @@ async def get_public_summary(db: SessionDep) -> List[ContentResponse]:
         )
 
 @router.post("/search_query") 
-async def search_contents(search_query: SearchQuery, db: SessionDep) -> List[ContentResponse]:
+async def search_contents(search_query: SearchQuery, db: AsyncSessionDep) -> List[ContentResponse]:
     try:
-        content_table_service = ContentTableService(db)
-        contents = content_table_service.search_contents(search_query)
+        content_table_service = AsyncContentTableService(db)
+        contents = await content_table_service.search_contents(search_query)
         return contents
     except SQLAlchemyError as e:
         raise HTTPException(
@@ -48,12 +88,41 @@ async def search_contents(search_query: SearchQuery, db: SessionDep) -> List[Con
             detail=f"Database error: {str(e)}"
         )
 
+@router.post("/semantic_search")
+async def semantic_search(search_query: SemanticSearchQuery, db: AsyncSessionDep) -> List[ContentResponse]:
+    """Search contents by meaning instead of exact keywords, most similar first"""
+    try:
+        content_table_service = AsyncContentTableService(db)
+        return await content_table_service.semantic_search(search_query)
+    except SQLAlchemyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
 @router.post("/create", response_model=ContentResponse)
-async def create_content_manually(content_request: CreateContentRequest, db: SessionDep) -> ContentResponse:
+async def create_content_manually(content_request: CreateContentRequest, db: AsyncSessionDep) -> ContentResponse:
     """Manually create a new content entry"""
     try:
-        content_table_service = ContentTableService(db)
-        return content_table_service.create_content_manually(content_request)
+        content_table_service = AsyncContentTableService(db)
+        return await content_table_service.create_content_manually(content_request)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except SQLAlchemyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+@router.post("/bulk", response_model=BulkCreateContentResponse)
+async def bulk_create_contents(bulk_request: BulkCreateContentRequest, db: AsyncSessionDep) -> BulkCreateContentResponse:
+    """Create many contents with their entities at once, the response has one status per item in request order"""
+    try:
+        content_table_service = AsyncContentTableService(db)
+        return await content_table_service.bulk_create_contents(bulk_request)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -66,11 +135,11 @@ async def create_content_manually(content_request: CreateContentRequest, db: Ses
         )
 
 @router.post("/entities/create", response_model=EntityResponse)
-async def create_entity_manually(entity_request: CreateEntityRequest, db: SessionDep) -> EntityResponse:
+async def create_entity_manually(entity_request: CreateEntityRequest, db: AsyncSessionDep) -> EntityResponse:
     """Manually create a new entity entry"""
     try:
-        content_table_service = ContentTableService(db)
-        return content_table_service.create_entity_manually(entity_request)
+        content_table_service = AsyncContentTableService(db)
+        return await content_table_service.create_entity_manually(entity_request)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from config import config
+from utils.llm_metrics import llm_metrics
+from services.agent_service import agent_usage_stats, get_shared_llm_circuit_breaker
+from services.pre_classifier import pre_classifier_stats
+from clients.local_classifier import get_shared_local_classifier
+
+router = APIRouter(tags=["metrics"], prefix="/metrics")
+
+@router.get("")
+async def get_metrics():
+    """Process wide counters since startup: LLM calls per agent and source, agent input budgets, LLM calls avoided"""
+    return {
+        "llm": llm_metrics.snapshot(),
+        "agent_input_tokens": agent_usage_stats.snapshot(),
+        "llm_circuit_breaker": get_shared_llm_circuit_breaker().snapshot(),
+        "pre_classifier": pre_classifier_stats.snapshot(),
+        "local_classifier": get_shared_local_classifier(config.config_json).snapshot(),
+    }
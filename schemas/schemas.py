@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Literal
 from datetime import datetime
 from models import Category , Source
 
@@ -26,6 +26,10 @@ class ContentResponse(BaseModel):
     content_html: Optional[str] = None
     source: str
     category: str
+    # how the category was decided: "rules", "local_model", "llm", "near_duplicate" or "manual" (None for older rows)
+    category_provenance: Optional[str] = None
+    category_confidence: Optional[float] = None
+    category_rules: Optional[List[str]] = None
     subject: Optional[str] = None
     timestamp: datetime
     created_at: Optional[datetime] = None
@@ -51,10 +55,15 @@ class SearchQuery(BaseModel):
     source: Optional[str] = None
     start_date_duration: Optional[int] = None
     end_date_duration: Optional[int] = None
+class ContentExportQuery(SearchQuery):
+    format: Literal["ndjson", "csv"] = "ndjson"
 class ContentSearchContent(BaseModel):
       keywords : Optional[List[str]] = None
 class ISearchQuery(BaseModel):
     query_text:str 
+class SemanticSearchQuery(BaseModel):
+    query_text: str
+    top_k: int = Field(default=10, ge=1, le=100)
 
 # Request schemas for manual creation
 class CreateEntityRequest(BaseModel):
@@ -80,3 +89,48 @@ class CreateContentRequest(BaseModel):
     timestamp: datetime
 
 
+# Request/response schemas for bulk ingest
+class BulkEntityRequest(BaseModel):
+    """Entity nested inside a bulk content item, content_id is filled in by the server"""
+    entity_type: str
+    entity_value: str
+
+
+class BulkContentItem(CreateContentRequest):
+    entities: List[BulkEntityRequest] = []
+    # "pending" leaves the item to the reclassifier (imported while the LLM was unavailable)
+    classification_state: str = "classified"
+
+
+# services.pre_classifier.CategoryDecision provenances
+CategoryProvenance = Literal["rules", "local_model", "llm", "near_duplicate", "manual"]
+
+
+class ArchiveContentItem(BulkContentItem):
+    """
+    bulk item the mail archive importer classified itself, never accepted from API clients:
+    the provenance decides which rows the local classifier is trained on
+    """
+    category_provenance: Optional[CategoryProvenance] = None
+    category_confidence: Optional[float] = None
+    category_rules: Optional[List[str]] = None
+
+
+class BulkCreateContentRequest(BaseModel):
+    items: List[BulkContentItem]
+
+
+class BulkItemStatus(BaseModel):
+    index: int
+    source_id: str
+    source: str
+    status: Literal["created", "duplicate", "error"]
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BulkCreateContentResponse(BaseModel):
+    created: int = 0
+    duplicates: int = 0
+    errors: int = 0
+    items: List[BulkItemStatus] = []
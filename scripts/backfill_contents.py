@@ -0,0 +1,57 @@
+"""
+Backfill historical contents (with their entities) from an NDJSON file into the database.
+
+every line is one content in the same shape GET /contents/export?format=ndjson produces
+(source_id, content_type, content_data, content_html, source, category, subject, timestamp, entities[]),
+ids and created_at/updated_at in the file are ignored and regenerated.
+
+on Postgres batches go through COPY FROM STDIN into staging tables and are merged with
+ON CONFLICT ON CONSTRAINT uq_source_id_source DO NOTHING, on SQLite they use the multi-row insert of the bulk API.
+the contents a batch inserted are then indexed for semantic search.
+
+    python -m scripts.backfill_contents history.ndjson --batch-size 50000
+    cat history.ndjson | python -m scripts.backfill_contents -
+"""
+import argparse
+import sys
+from pydantic import ValidationError
+from db import sql_engine, SessionLocal
+from schemas.schemas import BulkContentItem
+from repository.bulk_loader import get_bulk_loader, load_items, BulkLoadReport
+from services.embedding_service import EmbeddingService
+
+
+def read_items(stream, report: BulkLoadReport):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield BulkContentItem.model_validate_json(line)
+        except ValidationError as e:
+            report.read += 1
+            report.invalid += 1
+            print(f"Skipping line {line_number}: {e.errors()[0]['msg']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="NDJSON file, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=10000, help="records per transaction")
+    args = parser.parse_args(argv)
+
+    loader = get_bulk_loader(sql_engine, SessionLocal)
+    print(f"Loading with {type(loader).__name__} ({sql_engine.dialect.name})")
+    report = BulkLoadReport()
+    stream = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    try:
+        load_items(loader, read_items(stream, report), batch_size=args.batch_size, report=report,
+                   on_batch=lambda progress: print(progress), embedding_service=EmbeddingService())
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print(f"Done: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Backfill historical Gmail messages into the database (the poller only ever sees unread mail).
+
+messages matching the date range / search query are listed page by page, fetched with parallel batch requests
+and stored through EmailTextParser and MessageService like polled mail. progress is saved to a checkpoint file
+after every page, running the same command again resumes where it stopped. messages that still failed after the
+retries are kept in the checkpoint's failed_ids and are not retried by a resumed run, --retry-failed fetches just those.
+defaults for concurrency, batch size, rate limit, retries and checkpoint come from config.json "gmail_backfill".
+
+    python -m scripts.backfill_gmail --after 2024-01-01 --before 2025-01-01
+    python -m scripts.backfill_gmail --query "from:billing@example.com" --concurrency 8 --rps 40
+    python -m scripts.backfill_gmail --after 2024-01-01 --before 2025-01-01 --retry-failed
+    python -m scripts.backfill_gmail --after 2024-01-01 --fake-gmail recordings/   # recorded JSON, no Gmail account
+"""
+import argparse
+from datetime import date
+from config import config
+from db import SessionLocal
+from services.message_service import MessageService
+from sources.email.gmail_backfill import GmailBackfill, build_query, gmail_backfill_from_config
+
+
+def gmail_service_factory(message_service: MessageService, fake_gmail: str = None):
+    if fake_gmail:
+        from sources.email.fake_gmail import FakeGmailService
+        return lambda: FakeGmailService(fake_gmail)
+
+    from googleapiclient.discovery import build
+    from sources.email.email_poller import EmailPoller
+    creds = EmailPoller(message_service).authenticate_gmail()
+    return lambda: build('gmail', 'v1', credentials=creds, cache_discovery=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--after", type=date.fromisoformat, help="first day to import (YYYY-MM-DD)")
+    parser.add_argument("--before", type=date.fromisoformat, help="day to stop before (YYYY-MM-DD)")
+    parser.add_argument("--query", help="extra Gmail search terms, e.g. label:work")
+    parser.add_argument("--concurrency", type=int, help="batch requests in flight")
+    parser.add_argument("--batch-size", type=int, help="messages per batch request (max 100)")
+    parser.add_argument("--rps", type=float, help="message requests per second (0 = unlimited)")
+    parser.add_argument("--checkpoint", help="checkpoint file")
+    parser.add_argument("--max-pages", type=int, help="stop after this many list pages")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first page")
+    parser.add_argument("--retry-failed", action="store_true", help="only fetch the checkpoint's failed messages again")
+    parser.add_argument("--fake-gmail", help="directory of recorded messages (<id>.json) to serve instead of Gmail")
+    args = parser.parse_args(argv)
+
+    settings = gmail_backfill_from_config(config.config_json)
+    overrides = {"concurrency": args.concurrency, "batch_size": args.batch_size,
+                 "requests_per_second": args.rps, "checkpoint_path": args.checkpoint}
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+
+    query = build_query(args.after, args.before, args.query)
+    db = SessionLocal()
+    try:
+        message_service = MessageService(db)
+        backfill = GmailBackfill(gmail_service_factory(message_service, args.fake_gmail), message_service, settings)
+        if args.retry_failed:
+            report = backfill.retry_failed(query)
+        else:
+            if args.restart:
+                backfill.save_checkpoint(backfill.new_checkpoint(query))
+            print(f"Backfilling {query or 'all mail'!r} with {backfill.concurrency} parallel batches of {backfill.batch_size}")
+            report = backfill.run(query, max_pages=args.max_pages)
+    finally:
+        db.close()
+    print(f"Done: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
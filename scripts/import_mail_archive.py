@@ -0,0 +1,56 @@
+"""
+Import mbox / eml archives (mail that never went through Gmail) into the database.
+
+files are streamed message by message and parsed by EmailTextParser in a process pool (--workers, default
+one per core), the parsed messages go through the same bulk loader as backfill_contents (COPY on Postgres).
+the Message-ID is the source_id, messages already stored (or repeated across archives) are skipped
+and the ones inserted are indexed for semantic search.
+classification is off by default (category 'other', no entities). --classify skips the messages already stored and
+decides the others' category like MessageService (pre-classifier rules, local classifier, then the category agent),
+the agents run through the async OpenAI client, --classify-batch-size messages at a time (concurrency and rate limits:
+"openai_async").
+
+    python -m scripts.import_mail_archive ~/mail/archive.mbox ~/mail/exported/ --workers 8
+    python -m scripts.import_mail_archive inbox.mbox --classify --batch-size 500
+"""
+import argparse
+from db import sql_engine, SessionLocal
+from repository.bulk_loader import get_bulk_loader, load_items, BulkLoadReport
+from services.embedding_service import EmbeddingService
+from sources.email.mail_archive import MailArchiveImporter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help=".mbox / .eml files or directories containing them")
+    parser.add_argument("--workers", type=int, help="parser processes (default: number of cores)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="messages sent to a worker at a time")
+    parser.add_argument("--batch-size", type=int, default=10000, help="records per transaction")
+    parser.add_argument("--classify", action="store_true", help="run the category and entity agents on every message")
+    parser.add_argument("--classify-batch-size", type=int, default=32, help="messages classified concurrently")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    message_service, classification_service = None, None
+    if args.classify:
+        from services.async_classification_service import AsyncClassificationService
+        from services.message_service import MessageService
+        message_service = MessageService(db)
+        classification_service = AsyncClassificationService()
+
+    importer = MailArchiveImporter(args.workers, args.chunk_size, message_service, classification_service,
+                                   args.classify_batch_size)
+    loader = get_bulk_loader(sql_engine, SessionLocal)
+    print(f"Importing with {importer.workers} parser processes, loading with {type(loader).__name__} ({sql_engine.dialect.name})")
+    try:
+        report = load_items(loader, importer.iter_items(args.paths), batch_size=args.batch_size, report=BulkLoadReport(),
+                            on_batch=lambda progress: print(progress), embedding_service=EmbeddingService())
+    finally:
+        db.close()
+    report.invalid += importer.unparsable
+    print(f"Done: {report} | not classified (already stored) {importer.already_stored}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
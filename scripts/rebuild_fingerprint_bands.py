@@ -0,0 +1,30 @@
+"""
+Recompute the near-duplicate band columns of the stored contents for the band layout of config.json
+"near_duplicate.max_distance" (utils/simhash), run it after changing max_distance.
+
+only the bands change, they are derived from the stored fingerprints so no text is read or re-hashed.
+
+    python -m scripts.rebuild_fingerprint_bands --batch-size 5000
+"""
+import argparse
+from db import SessionLocal
+from repository.content_repository import ContentRepository
+from utils.simhash import fingerprint_band_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        updated = ContentRepository(db).rebuild_fingerprint_bands(args.batch_size)
+    finally:
+        db.close()
+    print(f"Rebuilt the fingerprint bands of {updated} contents ({fingerprint_band_count()} bands)")
+    return updated
+
+
+if __name__ == "__main__":
+    main()
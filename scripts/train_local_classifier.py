@@ -0,0 +1,96 @@
+"""
+Train the local category classifier on the categories the category agent assigned (content rows with
+category_provenance "llm" that are classified, or set by hand), evaluate it on held-out rows and save it for MessageService.
+rows decided by the rules, by the model itself or reused from a near-duplicate would only teach it its own answers.
+rows classified before the provenance was stored are marked "llm" by migration b5e7c3a1d824.
+
+the rows are shuffled and split, the model is trained on the training part only so the printed
+accuracy / coverage above the threshold / latency are what it will do on new messages.
+settings (model path, threshold, n_features, epochs...) come from config.json "local_classifier".
+
+    python -m scripts.train_local_classifier --test-fraction 0.2
+    python -m scripts.train_local_classifier --min-per-class 50 --dry-run
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timezone
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config import config
+from models import Content, ClassificationState
+from clients.local_classifier import LocalClassifier, evaluate, local_classifier_from_config
+
+
+# the category agent's decisions, and the corrections made through the API
+TRAINING_PROVENANCES = ("llm", "manual")
+
+
+def load_labeled_contents(db: Session) -> tuple[list[str], list[str]]:
+    """subject + text (what the embeddings use too) and category of every content the agent (or a person) classified"""
+    texts, labels = [], []
+    query = (
+        select(Content.subject, Content.content_data, Content.category)
+        .where(Content.category_provenance.in_(TRAINING_PROVENANCES))
+        .where(Content.classification_state == ClassificationState.CLASSIFIED)
+        .execution_options(yield_per=1000)
+    )
+    for subject, content_data, category in db.execute(query):
+        text = " ".join(part for part in (subject, content_data) if part)
+        if text and category is not None:
+            texts.append(text)
+            labels.append(getattr(category, 'value', category))
+    return texts, labels
+
+
+def train_and_evaluate(texts: list[str], labels: list[str], settings: dict, test_fraction: float = 0.2,
+                       min_per_class: int = 1, seed: int = 13) -> tuple[LocalClassifier, dict]:
+    counts = {label: labels.count(label) for label in set(labels)}
+    kept = [(text, label) for text, label in zip(texts, labels) if counts[label] >= min_per_class]
+    random.Random(seed).shuffle(kept)
+    split = int(len(kept) * (1 - test_fraction))
+    train, held_out = kept[:split], kept[split:]
+    if not train:
+        raise ValueError("No labeled contents to train on")
+
+    model = LocalClassifier(settings["n_features"]).fit(
+        [text for text, _ in train], [label for _, label in train],
+        epochs=settings["epochs"], learning_rate=settings["learning_rate"], l2=settings["l2"],
+    )
+    report = evaluate(model, [text for text, _ in held_out], [label for _, label in held_out], settings["threshold"])
+    model.metadata = {
+        'trained_at': datetime.now(timezone.utc).isoformat(),
+        'train_examples': len(train),
+        'class_counts': {label: count for label, count in sorted(counts.items()) if count >= min_per_class},
+        'held_out': report,
+    }
+    return model, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="share of rows held out for evaluation")
+    parser.add_argument("--min-per-class", type=int, default=20, help="categories with fewer rows are left out")
+    parser.add_argument("--output", help="model file (default: local_classifier.model_path)")
+    parser.add_argument("--dry-run", action="store_true", help="evaluate only, don't save the model")
+    args = parser.parse_args(argv)
+
+    from db import SessionLocal
+    settings = local_classifier_from_config(config.config_json)
+    db = SessionLocal()
+    try:
+        texts, labels = load_labeled_contents(db)
+    finally:
+        db.close()
+    print(f"Loaded {len(texts)} labeled contents")
+    model, report = train_and_evaluate(texts, labels, settings, args.test_fraction, args.min_per_class)
+    print(json.dumps(model.metadata, indent=2))
+    if not args.dry_run:
+        path = args.output or settings["model_path"]
+        model.save(path)
+        print(f"Saved model to {path}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
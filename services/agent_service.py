@@ -1,80 +1,267 @@
 from clients.openai_client import OpenAIClient
+from clients.async_openai_client import is_retryable
 import json
+import os
+import threading
+from contextlib import contextmanager
 from typing import Tuple
-from utils.text_utils import clean_text, safe_json_string
+from config import config
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.example_selector import ExampleSelector
+from datetime import date
+from enum import Enum
+from utils.text_normalization import clean_payload
+from utils.token_count import estimate_tokens, truncate_to_tokens
 
-class AgentService:
+
+class AgentUsageStats:
+    """
+        per agent input token counters shared by every AgentService in the process,
+        shows how big the inputs are, how often the budget truncation fires
+        and how many few-shot example tokens the relevance selection saves against sending every example
+    """
     def __init__(self):
-        self.openai_client = OpenAIClient()
+        self._lock = threading.Lock()
+        self._agents = {}
+
+    def _stats(self, agent_name: str) -> dict:
+        return self._agents.setdefault(agent_name, {
+            'calls': 0, 'truncated_calls': 0, 'input_tokens': 0, 'input_tokens_before_truncation': 0,
+            'max_input_tokens_seen': 0, 'example_tokens': 0, 'example_tokens_without_selection': 0,
+        })
+
+    def record(self, agent_name: str, tokens_before: int, tokens_after: int, truncated: bool):
+        with self._lock:
+            stats = self._stats(agent_name)
+            stats['calls'] += 1
+            stats['truncated_calls'] += int(truncated)
+            stats['input_tokens'] += tokens_after
+            stats['input_tokens_before_truncation'] += tokens_before
+            stats['max_input_tokens_seen'] = max(stats['max_input_tokens_seen'], tokens_before)
+
+    def record_examples(self, agent_name: str, all_examples_tokens: int, selected_tokens: int):
+        with self._lock:
+            stats = self._stats(agent_name)
+            stats['example_tokens'] += selected_tokens
+            stats['example_tokens_without_selection'] += all_examples_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                agent_name: {
+                    **stats,
+                    'truncation_rate': stats['truncated_calls'] / stats['calls'] if stats['calls'] else 0.0,
+                    'example_token_reduction': (
+                        1 - stats['example_tokens'] / stats['example_tokens_without_selection']
+                        if stats['example_tokens_without_selection'] else 0.0
+                    ),
+                }
+                for agent_name, stats in self._agents.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._agents.clear()
+
+
+agent_usage_stats = AgentUsageStats()
+
+
+def _json_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def stable_json(value) -> str:
+    """deterministic JSON for prompts: sorted keys, fixed separators, enums as their value and dates as ISO strings"""
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+DEFAULT_LLM_CIRCUIT_BREAKER = {
+    "failure_threshold": 5,
+    "reset_timeout_seconds": 60,
+}
+
+
+class LLMUnavailableError(Exception):
+    """the agent could not be asked: the circuit is open or the request failed like an outage (timeout, 429, 5xx)"""
+    pass
+
+
+_shared_llm_circuit_breaker = None
+
+
+def get_shared_llm_circuit_breaker(config_json: dict = None) -> CircuitBreaker:
+    """one breaker per process, every agent talks to the same OpenAI account"""
+    global _shared_llm_circuit_breaker
+    if _shared_llm_circuit_breaker is None:
+        settings = {**DEFAULT_LLM_CIRCUIT_BREAKER, **(config_json or config.config_json).get("llm_circuit_breaker", {})}
+        _shared_llm_circuit_breaker = CircuitBreaker(
+            settings["failure_threshold"], settings["reset_timeout_seconds"], is_failure=is_retryable,
+        )
+    return _shared_llm_circuit_breaker
+
+
+class AgentService:
+    def __init__(self, openai_client=None):
+        self.openai_client = openai_client or OpenAIClient()
+        self._budgets = {}
+        self._example_selectors = {}
+        self._agent_prompts = {}
+        self.circuit_breaker = get_shared_llm_circuit_breaker()
     
     def run_agent(self, agent_name: str, input_data: dict):
         
+        system_prompt, user_message , output_schema = self.prepare_agent_request(agent_name, input_data)
+        with self.llm_call(agent_name):
+            response = self.openai_client.request_agent(system_prompt, user_message, output_schema, agent_name=agent_name)
+        return self.parse_agent_response(response)
+
+    @contextmanager
+    def llm_call(self, agent_name: str):
+        """
+        the request inside under the shared circuit breaker (shared with AsyncAgentService),
+        an open circuit or an outage-like failure is raised as LLMUnavailableError so the message can be deferred
+        """
+        try:
+            with self.circuit_breaker.guard():
+                yield
+        except CircuitOpenError as e:
+            raise LLMUnavailableError(f"{agent_name} skipped, {e}") from e
+        except Exception as e:
+            if self.circuit_breaker.is_failure(e):
+                raise LLMUnavailableError(f"{agent_name} request failed: {e}") from e
+            raise
+
+    def prepare_agent_request(self, agent_name: str, input_data: dict) -> Tuple[str, str, dict]:
+        """cleaned, budgeted input -> system prompt, user message and output schema (shared with AsyncAgentService)"""
         cleaned_input_data = self._clean_input_data(input_data)
-        
-        system_prompt, user_message , output_schema = self.create_agent_prompt(agent_name, cleaned_input_data)
-        response = self.openai_client.request_agent(system_prompt, user_message, output_schema)
-        
+        cleaned_input_data = self.apply_input_budget(agent_name, cleaned_input_data)
+        return self.create_agent_prompt(agent_name, cleaned_input_data)
+
+    def parse_agent_response(self, response: str) -> dict:
         try:
             return json.loads(response)
         except json.JSONDecodeError as e:
             raise ValueError(f"Failed to parse agent response as JSON: {e}. Response: {response}")
     
+    def load_budget(self, agent_name: str) -> dict:
+        """ai_agents/<agent>/budget.json (max_input_tokens, truncate_field, strategy + its options), None without one"""
+        if agent_name not in self._budgets:
+            path = f"ai_agents/{agent_name}/budget.json"
+            budget = None
+            if os.path.exists(path):
+                with open(path, "r", encoding='utf-8') as f:
+                    budget = json.load(f)
+            self._budgets[agent_name] = budget
+        return self._budgets[agent_name]
+
+    def load_example_selector(self, agent_name: str) -> tuple[ExampleSelector, int]:
+        """
+        the agent's examples.json with their vectors, built once per agent, and the tokens of the whole set
+        top_k from ai_agents/<agent>/few_shot.json, every example is sent without one
+        """
+        if agent_name not in self._example_selectors:
+            with open(f"ai_agents/{agent_name}/examples.json", "r", encoding='utf-8') as f:
+                examples = json.load(f)
+            few_shot = {}
+            path = f"ai_agents/{agent_name}/few_shot.json"
+            if os.path.exists(path):
+                with open(path, "r", encoding='utf-8') as f:
+                    few_shot = json.load(f)
+            self._example_selectors[agent_name] = (ExampleSelector(examples, few_shot.get("top_k")), estimate_tokens(str(examples)))
+        return self._example_selectors[agent_name]
+
+    def select_examples(self, agent_name: str, input_data: dict) -> list[dict]:
+        selector, all_examples_tokens = self.load_example_selector(agent_name)
+        examples = selector.select(input_data)
+        agent_usage_stats.record_examples(agent_name, all_examples_tokens, estimate_tokens(str(examples)) if examples else 0)
+        return examples
+
+    def apply_input_budget(self, agent_name: str, input_data: dict) -> dict:
+        """
+        Cut the agent's truncate_field (the message text) so the whole input fits in max_input_tokens,
+        the other fields are small and always sent as they are
+        """
+        budget = self.load_budget(agent_name)
+        tokens_before = estimate_tokens(str(input_data))
+        field = budget.get("truncate_field", "content_data") if budget else None
+        if not budget or tokens_before <= budget["max_input_tokens"] or not isinstance(input_data.get(field), str):
+            agent_usage_stats.record(agent_name, tokens_before, tokens_before, truncated=False)
+            return input_data
+
+        options = {key: value for key, value in budget.items() if key not in ("max_input_tokens", "truncate_field", "strategy")}
+        other_tokens = estimate_tokens(str({**input_data, field: ""}))
+        field_budget = max(budget["max_input_tokens"] - other_tokens, 64)
+        truncated_data = {
+            **input_data,
+            field: truncate_to_tokens(input_data[field], field_budget, budget.get("strategy", "head_tail"), **options),
+        }
+        tokens_after = estimate_tokens(str(truncated_data))
+        agent_usage_stats.record(agent_name, tokens_before, tokens_after, truncated=True)
+        print(f"Truncated {agent_name} input from ~{tokens_before} to ~{tokens_after} tokens ({budget.get('strategy', 'head_tail')})")
+        return truncated_data
+
     def _clean_input_data(self, input_data: dict) -> dict:
-        """Clean input data to handle encoding issues."""
-        cleaned_data = {}
-        for key, value in input_data.items():
-            if isinstance(value, str):
-                cleaned_data[key] = clean_text(value)
-            elif isinstance(value, dict):
-                cleaned_data[key] = self._clean_input_data(value)
-            elif isinstance(value, list):
-                cleaned_data[key] = [clean_text(item) if isinstance(item, str) else item for item in value]
-            else:
-                cleaned_data[key] = value
-        return cleaned_data
+        """Clean input data to handle encoding issues (text cleaned by an earlier stage is skipped)."""
+        return clean_payload(input_data)
      
-    def create_agent_prompt(self, agent_name: str, input_data: dict) -> Tuple[str, str]:
+    def load_agent_prompt(self, agent_name: str) -> Tuple[str, dict]:
+        """
+        the agent's system prompt and output schema, rendered once per agent from the files in ai_agents/<agent>
+        the system prompt is the static prefix of every request: instructions, schemas and (when they are not selected
+        per message) the examples as sorted-key JSON, so it is byte for byte the same on every call and the provider's
+        prompt cache can match it
+        """
+        if agent_name not in self._agent_prompts:
+            try:
+                with open(f"ai_agents/{agent_name}/instruction.json", "r", encoding='utf-8') as f:
+                    instruction = json.load(f)
+                
+                with open(f"ai_agents/{agent_name}/input_schema.json", "r", encoding='utf-8') as f:
+                    input_schema = json.load(f)
+                
+                with open(f"ai_agents/{agent_name}/output_schema.json", "r", encoding='utf-8') as f:
+                    output_schema = json.load(f)
+                
+                selector, _ = self.load_example_selector(agent_name)
+            except FileNotFoundError as e:
+                raise FileNotFoundError(f"Agent configuration file not found: {e}")
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in agent configuration: {e}")
+            
+            static_examples = (
+                f"consider the following examples to know better about the task:\n{stable_json(selector.examples)}\n"
+                if selector.keeps_all and selector.examples else ""
+            )
+            system_prompt = (
+                f"you are {agent_name}\n"
+                f"follow the instruction below:\n{stable_json(instruction)}\n"
+                f"the input schema is:\n{stable_json(input_schema)}\n"
+                f"the output schema is:\n{stable_json(output_schema)}\n"
+                f"{static_examples}"
+                "IMPORTANT: You must respond with valid JSON format only. Do not include any other text."
+            )
+            self._agent_prompts[agent_name] = (system_prompt, output_schema)
+        return self._agent_prompts[agent_name]
+     
+    def create_agent_prompt(self, agent_name: str, input_data: dict) -> Tuple[str, str, dict]:
         """
         this function will create the system prompt , user message and output schema for the agent based
         on the files in the ai_agents folder and the specific agent name 
+        only the per message part is built here: the selected examples (if the agent selects them) and the input, last
         """
-        try:
-            with open(f"ai_agents/{agent_name}/instruction.json", "r", encoding='utf-8') as f:
-                instruction = json.load(f)
-            
-            with open(f"ai_agents/{agent_name}/input_schema.json", "r", encoding='utf-8') as f:
-                input_schema = json.load(f)
-            
-            with open(f"ai_agents/{agent_name}/output_schema.json", "r", encoding='utf-8') as f:
-                output_schema = json.load(f)
-            
-            with open(f"ai_agents/{agent_name}/examples.json", "r", encoding='utf-8') as f:
-                examples = json.load(f)
-            
-             
-            system_prompt = f"""
-            you are {agent_name}
-            fololow instruction below : 
-            {instruction}
-            the input schema is {input_schema}
-            the output schema you is {output_schema}
-            
-            IMPORTANT: You must respond with valid JSON format only. Do not include any other text.
-            """
-            
-            example_sentence=f"consider the following examples : {examples} to know better about the task . " if examples else ""
-            user_message = f"""
-            {example_sentence}
-            my inputis : 
-            {safe_json_string(str(input_data))}
-            """
-            
-            return system_prompt, user_message , output_schema
-            
-        except FileNotFoundError as e:
-            raise FileNotFoundError(f"Agent configuration file not found: {e}")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in agent configuration: {e}")
+        system_prompt, output_schema = self.load_agent_prompt(agent_name)
+        selector, _ = self.load_example_selector(agent_name)
+        examples = self.select_examples(agent_name, input_data)
+        example_sentence = (
+            f"consider the following examples to know better about the task:\n{stable_json(examples)}\n"
+            if examples and not selector.keeps_all else ""
+        )
+        user_message = f"{example_sentence}my input is:\n{stable_json(input_data)}"
+        return system_prompt, user_message, output_schema
 
     
 
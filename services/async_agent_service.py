@@ -0,0 +1,14 @@
+from clients.async_openai_client import AsyncOpenAIClient
+from services.agent_service import AgentService
+
+
+class AsyncAgentService(AgentService):
+    """AgentService on the AsyncOpenAIClient: same prompts, budgets, usage stats and circuit breaker, requests awaited"""
+    def __init__(self, openai_client: AsyncOpenAIClient = None):
+        super().__init__(openai_client or AsyncOpenAIClient())
+
+    async def run_agent(self, agent_name: str, input_data: dict):
+        system_prompt, user_message, output_schema = self.prepare_agent_request(agent_name, input_data)
+        with self.llm_call(agent_name):
+            response = await self.openai_client.request_agent(system_prompt, user_message, output_schema, agent_name=agent_name)
+        return self.parse_agent_response(response)
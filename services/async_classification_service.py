@@ -0,0 +1,45 @@
+import asyncio
+from models import Entity
+from services.async_agent_service import AsyncAgentService
+from services.agent_service import LLMUnavailableError
+from utils.text_normalization import clean_payload
+
+
+class AsyncClassificationService:
+    """
+        ClassificationService for parallel ingestion, many messages can be classified concurrently
+        (the AsyncOpenAIClient caps the requests in flight and keeps them under the rate limits)
+        the fallbacks are the same: 'other' and no entities for a bad answer, LLMUnavailableError when the model can't be reached
+    """
+    def __init__(self, agent_service: AsyncAgentService = None):
+        self.agent_service = agent_service or AsyncAgentService()
+
+    async def extract_category(self, **kwargs):
+        try:
+            response = await self.agent_service.run_agent("category_agent", kwargs)
+            category = response.get("category")
+            if not category:
+                raise ValueError("Agent response missing 'category' field")
+            return category
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            print(f"Classification failed ({type(e).__name__}): {e}. Using 'other' category.")
+            return "other"
+
+    async def extract_entities(self, **kwargs):
+        try:
+            response = await self.agent_service.run_agent("entity_agent", clean_payload(kwargs))
+            entities_json: list[dict] = response.get("entities")
+            if not entities_json:
+                return []
+            return [Entity(**entity) for entity in entities_json]
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            print(f"Entity extraction failed ({type(e).__name__}): {e}")
+            return []
+
+    async def classify(self, **kwargs) -> tuple[str, list[Entity]]:
+        """category and entities of one message, both agents called concurrently"""
+        return tuple(await asyncio.gather(self.extract_category(**kwargs), self.extract_entities(**kwargs)))
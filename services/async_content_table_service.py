@@ -0,0 +1,160 @@
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from repository.async_content_repository import AsyncContentRepository
+from repository.async_entity_repository import AsyncEntityRepository
+from services.content_table_service import to_content_response
+from services.embedding_service import EmbeddingService
+from schemas.schemas import ContentResponse, EntityResponse, SearchQuery, CreateContentRequest, CreateEntityRequest, SemanticSearchQuery
+from schemas.schemas import BulkCreateContentRequest, BulkCreateContentResponse, BulkItemStatus
+from repository.bulk_loader import bulk_item_rows
+from models import Content, Entity
+from config import config
+from typing import List
+from datetime import datetime
+from utils.http_cache import make_weak_etag
+from utils.simhash import fingerprint_columns
+
+
+class AsyncContentTableService:
+    """
+    Async version of ContentTableService used by the API routes.
+    the embedding calls are cpu (or network) bound and run in a worker thread so they don't block the event loop either
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.content_repository = AsyncContentRepository(db)
+        self.entity_repository = AsyncEntityRepository(db)
+        self.embedding_service = EmbeddingService()
+
+    async def get_cache_validators(self, content_id: str = None) -> tuple[str, datetime, int]:
+        """ETag, Last-Modified and number of contents for GET /contents/ (or one content), without loading any rows"""
+        version = await self.content_repository.get_data_version(content_id)
+        content_count, content_updated_at, _, _, _, entity_created_at = version
+        timestamps = [value for value in (content_updated_at, entity_created_at) if value is not None]
+        last_modified = max(timestamps) if timestamps else None
+        return make_weak_etag(content_id, *version), last_modified, content_count
+
+    async def get_public_summary(self, content_id: str = None) -> List[ContentResponse]:
+        contents = await self.content_repository.get_public_summary(content_id)
+        return [to_content_response(content) for content in contents]
+
+    async def search_contents(self, search_query: SearchQuery) -> List[ContentResponse]:
+        contents = await self.content_repository.search_contents(search_query)
+        return [to_content_response(content) for content in contents]
+
+    async def semantic_search(self, search_query: SemanticSearchQuery) -> List[ContentResponse]:
+        """Contents most similar to the query text, best match first"""
+        matches = await asyncio.to_thread(
+            self.embedding_service.semantic_search, search_query.query_text, search_query.top_k
+        )
+        contents = await self.content_repository.get_contents_by_ids([content_id for content_id, _ in matches])
+        return [to_content_response(content) for content in contents]
+
+    async def create_content_manually(self, content_request: CreateContentRequest) -> ContentResponse:
+        """Manually create a new content entry"""
+        content = Content(
+            source_id=content_request.source_id,
+            content_type=content_request.content_type,
+            content_data=content_request.content_data,
+            content_html=content_request.content_html,
+            source=content_request.source,
+            category=content_request.category,
+            category_provenance="manual",
+            subject=content_request.subject,
+            timestamp=content_request.timestamp,
+            **fingerprint_columns(content_request.content_data)
+        )
+
+        saved_content = await self.content_repository.create_content(content)
+
+        if not saved_content:
+            raise ValueError("Failed to create content. Possible duplicate source_id and source combination.")
+
+        # created_at/updated_at are generated by the database, load them now since lazy loads are not allowed here
+        await self.db.refresh(saved_content, attribute_names=['created_at', 'updated_at', 'entities'])
+
+        try:
+            await asyncio.to_thread(self.embedding_service.index_content, saved_content)
+        except Exception as e:
+            print(f"Failed to index content {saved_content.id} for semantic search: {e}")
+
+        return to_content_response(saved_content)
+
+    async def bulk_create_contents(self, bulk_request: BulkCreateContentRequest) -> BulkCreateContentResponse:
+        """
+        Create many contents (with nested entities) at once.
+        items are validated, de-duplicated inside the request and written in chunks, one transaction per chunk,
+        so a failing chunk only marks its own items as errors
+        """
+        max_items = config.config_json.get("bulk_insert_max_items", 10000)
+        if len(bulk_request.items) > max_items:
+            raise ValueError(f"Too many items in one bulk request: {len(bulk_request.items)} > {max_items}")
+        chunk_size = config.config_json.get("bulk_insert_chunk_size", 500)
+        
+        statuses: list[BulkItemStatus] = []
+        pending = []  # (status, content_row, entity_rows)
+        seen_keys = set()
+        for index, item in enumerate(bulk_request.items):
+            status = BulkItemStatus(index=index, source_id=item.source_id, source=item.source, status="created")
+            statuses.append(status)
+            try:
+                content_row, entity_rows = bulk_item_rows(item)
+            except ValueError as e:
+                status.status, status.detail = "error", str(e)
+                continue
+            key = (content_row['source_id'], content_row['source'])
+            if key in seen_keys:
+                status.status, status.detail = "duplicate", "Repeated in the same request"
+                continue
+            seen_keys.add(key)
+            pending.append((status, content_row, entity_rows))
+        
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            content_rows = [content_row for _, content_row, _ in chunk]
+            entity_rows = [row for _, _, rows in chunk for row in rows]
+            try:
+                inserted_ids = await self.content_repository.bulk_create_contents(content_rows, entity_rows)
+            except Exception as e:
+                for status, _, _ in chunk:
+                    status.status, status.detail = "error", f"Database error: {e}"
+                continue
+            for status, content_row, _ in chunk:
+                if content_row['id'] in inserted_ids:
+                    status.id = content_row['id']
+                else:
+                    status.status, status.detail = "duplicate", "Content with this source_id and source already exists"
+            created_rows = [content_row for _, content_row, _ in chunk if content_row['id'] in inserted_ids]
+            try:
+                await asyncio.to_thread(self.embedding_service.index_rows, created_rows)
+            except Exception as e:
+                print(f"Failed to index bulk contents for semantic search: {e}")
+        
+        return BulkCreateContentResponse(
+            created=sum(1 for status in statuses if status.status == "created"),
+            duplicates=sum(1 for status in statuses if status.status == "duplicate"),
+            errors=sum(1 for status in statuses if status.status == "error"),
+            items=statuses,
+        )
+
+    async def create_entity_manually(self, entity_request: CreateEntityRequest) -> EntityResponse:
+        """Manually create a new entity entry"""
+        content = await self.content_repository.get_content_by_id(entity_request.content_id)
+        if not content:
+            raise ValueError(f"Content with id {entity_request.content_id} not found")
+
+        entity = Entity(
+            content_id=entity_request.content_id,
+            entity_type=entity_request.entity_type,
+            entity_value=entity_request.entity_value
+        )
+
+        saved_entity = await self.entity_repository.create_entity(entity)
+
+        return EntityResponse(
+            id=saved_entity.id,
+            content_id=saved_entity.content_id,
+            entity_type=saved_entity.entity_type.value if hasattr(saved_entity.entity_type, 'value') else str(saved_entity.entity_type),
+            entity_value=saved_entity.entity_value,
+            created_at=saved_entity.created_at
+        )
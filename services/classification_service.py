@@ -1,6 +1,6 @@
-from services.agent_service import AgentService
+from services.agent_service import AgentService, LLMUnavailableError
 from models import Entity
-from utils.text_utils import clean_text
+from utils.text_normalization import clean_payload
 
 class ClassificationService:
     def __init__(self):
@@ -14,6 +14,9 @@ class ClassificationService:
             if not category:
                 raise ValueError("Agent response missing 'category' field")
             return category
+        except LLMUnavailableError:
+            # an outage is not a classification, the caller defers the message instead of storing 'other'
+            raise
         except Exception as e:
             print(f"Classification failed: {e}. Using 'other' category.") # Fallback to 'other' category if classification fails
             return "other"
@@ -29,6 +32,8 @@ class ClassificationService:
                 return []
             entities = [Entity(**entity) for entity in entities_json]
             return entities
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             print(f"Entity extraction failed: {e}")
             # Return empty list instead of raising error to prevent pipeline failure
@@ -36,20 +41,4 @@ class ClassificationService:
     
     def _clean_kwargs(self, kwargs: dict) -> dict:
         """Clean keyword arguments to handle encoding issues."""
-        cleaned_kwargs = {}
-        for key, value in kwargs.items():
-            if isinstance(value, str):
-                cleaned_kwargs[key] = clean_text(value)
-            elif isinstance(value, dict):
-                cleaned_kwargs[key] = self._clean_kwargs(value)
-            elif isinstance(value, list):
-                cleaned_kwargs[key] = [clean_text(item) if isinstance(item, str) else item for item in value]
-            else:
-                cleaned_kwargs[key] = value
-        return cleaned_kwargs
-    
-    
-    
-    
-    
-    
\ No newline at end of file
+        return clean_payload(kwargs)
@@ -0,0 +1,54 @@
+from config import config
+from models import Content
+from clients.embedding_client import get_embedding_client
+from repository.vector_index import VectorIndex
+
+_shared_embedding_client = None
+_shared_vector_index = None
+
+
+def get_shared_embedding_client():
+    global _shared_embedding_client
+    if _shared_embedding_client is None:
+        _shared_embedding_client = get_embedding_client(
+            config.config_json.get("embedding_backend", "hashing"),
+            config.config_json.get("embedding_dimension", 256),
+        )
+    return _shared_embedding_client
+
+
+def get_shared_vector_index() -> VectorIndex:
+    """one index per process so the pollers and the API append to and search the same memmap"""
+    global _shared_vector_index
+    if _shared_vector_index is None:
+        _shared_vector_index = VectorIndex(
+            config.config_json.get("embedding_index_path", "data/embeddings"),
+            config.config_json.get("embedding_dimension", 256),
+        )
+    return _shared_vector_index
+
+
+class EmbeddingService:
+    """
+        computes a vector for every stored content and keeps it in the vector index
+        the text embedded is the subject (for emails) followed by the content data
+    """
+    def __init__(self, embedding_client=None, vector_index: VectorIndex = None):
+        self.embedding_client = embedding_client if embedding_client is not None else get_shared_embedding_client()
+        self.vector_index = vector_index if vector_index is not None else get_shared_vector_index()
+
+    def content_text(self, content: Content) -> str:
+        return " ".join(part for part in (content.subject, content.content_data) if part)
+
+    def index_content(self, content: Content):
+        vector = self.embedding_client.embed(self.content_text(content))
+        self.vector_index.add(content.id, vector)
+
+    def index_rows(self, content_rows: list[dict]):
+        """index contents inserted as plain rows (bulk inserts), each row needs its id, subject and content_data"""
+        for row in content_rows:
+            self.index_content(Content(id=row['id'], subject=row['subject'], content_data=row['content_data']))
+
+    def semantic_search(self, query_text: str, top_k: int = 10) -> list[tuple[str, float]]:
+        query_vector = self.embedding_client.embed(query_text)
+        return self.vector_index.search(query_vector, top_k)
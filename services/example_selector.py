@@ -0,0 +1,46 @@
+import numpy as np
+from clients.embedding_client import HashingEmbeddingClient
+
+# the fields of an example input (and of the agent input) that say what the message is about
+EXAMPLE_TEXT_FIELDS = ("subject", "content_data")
+
+
+def example_input(example: dict) -> dict:
+    """the input half of an example, examples.json files use "input"/"output" or "user"/"assistant" """
+    return example.get("input") or example.get("user") or {}
+
+
+def input_text(input_data: dict) -> str:
+    return " ".join(str(input_data[field]) for field in EXAMPLE_TEXT_FIELDS if input_data.get(field))
+
+
+class ExampleSelector:
+    """
+        picks the few-shot examples of an agent that are closest to the message instead of sending all of them
+        every example is embedded once when the agent is loaded (hashing trick vectors, no network, microseconds),
+        per message one embedding and one matrix-vector product give the cosine similarities, the `top_k`
+        best examples are kept, most similar first. top_k None (or >= the number of examples) keeps them all
+    """
+    def __init__(self, examples: list[dict], top_k: int = None, embedding_client=None):
+        self.examples = examples or []
+        self.top_k = top_k
+        self.embedding_client = embedding_client or HashingEmbeddingClient()
+        self.vectors = (
+            np.stack([self.embedding_client.embed(input_text(example_input(example))) for example in self.examples])
+            if self.examples else None
+        )
+
+    @property
+    def keeps_all(self) -> bool:
+        """True when every example is always sent (they can then be part of the static prompt prefix)"""
+        return self.top_k is None or self.top_k >= len(self.examples)
+
+    def select(self, input_data: dict) -> list[dict]:
+        if self.keeps_all:
+            return self.examples
+        if self.top_k <= 0:
+            return []
+        similarities = self.vectors @ self.embedding_client.embed(input_text(input_data))
+        # stable sort, equally similar examples keep their file order
+        best = np.argsort(-similarities, kind="stable")[:self.top_k]
+        return [self.examples[index] for index in best]
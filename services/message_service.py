@@ -1,10 +1,24 @@
 from message_parsers.parser_factory import ParserFactory
 from sqlalchemy.orm import Session
-from models import Content, Source, Category
+from models import Content, Source, Category, ClassificationState, Entity, ContentDuplicate
 from repository.content_repository import ContentRepository
 from repository.entity_repository import EntityRepository
+from repository.content_duplicate_repository import ContentDuplicateRepository
 from services.telegram_voice_service import TelegramVoiceService
 from services.classification_service import ClassificationService
+from services.agent_service import LLMUnavailableError
+from services.embedding_service import EmbeddingService
+from repository.batch_writer import BatchWriter
+from utils.simhash import fingerprint_columns, fingerprint_band_count, DEFAULT_MAX_DISTANCE, FINGERPRINT_BANDS
+from utils.text_normalization import clean_payload
+from services.pre_classifier import RuleClassifier, CategoryDecision
+from clients.local_classifier import get_shared_local_classifier
+from utils.llm_metrics import message_usage
+from config import config
+from datetime import datetime, timedelta
+
+NEAR_DUPLICATE_MODES = ("off", "link", "reuse")
+
 class MessageService:
     """
         this function is the core of the message processing pipeline 
@@ -12,19 +26,53 @@ class MessageService:
         1- get first polled message from sources 
         2-passing the message to parser factory to get the parsed data
         3-passing the parsed data to telegram voice service if its a voice message response from telegram 
-        4- passing to classification service to extract category and entities
-        5- saving the content and entities to the database
+        4- skipping it if it is already stored, otherwise passing to classification service to extract category and entities
+           (in "reuse" near-duplicate mode a near-duplicate's category and entities are reused instead of calling the agents)
+        5- saving the content, its category and its entities to the database in one transaction (one commit)
+        when the LLM is unavailable (circuit breaker open, timeouts) the message is saved right away as classification
+        pending and reclassify_pending() classifies it later, so ingestion never waits on the LLM
        
+        near_duplicate_mode: "off" no lookup, "link" only link cross-source near-duplicates, "reuse" link + reuse classification
     """
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, batch_writer: BatchWriter = None, near_duplicate_mode: str = None):
         self.db = db
         self.parser_factory = ParserFactory()
         self.content_repository = ContentRepository(self.db)
         self.entity_repository = EntityRepository(self.db)
+        self.content_duplicate_repository = ContentDuplicateRepository(self.db)
         self.telegram_voice_service = TelegramVoiceService()
         self.classification_service = ClassificationService()
+        self.embedding_service = EmbeddingService()
+        # cheap deterministic rules that decide obvious categories without the category agent
+        self.pre_classifier = RuleClassifier.from_config(config.config_json)
+        # local model trained on stored categories (scripts/train_local_classifier.py), loaded on first use
+        self.local_classifier = get_shared_local_classifier(config.config_json)
+        # optional write-behind buffer, when set messages are stored in batches instead of one transaction each
+        self.batch_writer = batch_writer
+        if self.batch_writer is not None and self.batch_writer.on_flushed is None:
+            self.batch_writer.on_flushed = self._index_contents
+        near_duplicate_config = config.config_json.get("near_duplicate", {})
+        self.near_duplicate_mode = near_duplicate_mode or near_duplicate_config.get("mode", "link")
+        if self.near_duplicate_mode not in NEAR_DUPLICATE_MODES:
+            raise ValueError(f"Unknown near_duplicate mode: {self.near_duplicate_mode}")
+        self.near_duplicate_max_distance = near_duplicate_config.get("max_distance", DEFAULT_MAX_DISTANCE)
+        # the band lookup only finds fingerprints less than the number of bands apart (utils/simhash)
+        if self.near_duplicate_max_distance >= fingerprint_band_count():
+            raise ValueError(
+                f"near_duplicate max_distance {self.near_duplicate_max_distance} needs more than the "
+                f"{fingerprint_band_count()} fingerprint bands of the current layout (at most {FINGERPRINT_BANDS - 1})"
+            )
+        self.near_duplicate_min_tokens = near_duplicate_config.get("min_tokens", 5)
+        self.near_duplicate_window_days = near_duplicate_config.get("window_days", 30)
+        # store the message's LLM tokens, latency and cost on its content row
+        self.store_llm_usage = config.config_json.get("llm_usage_per_content", False)
 
     def process_message(self, source: str, raw_data: dict):
+        # every LLM call made for the message (transcription, agents) is attributed to its source in utils.llm_metrics
+        with message_usage(source) as usage:
+            return self._process_message(source, raw_data, usage)
+
+    def _process_message(self, source: str, raw_data: dict, usage):
         parser = self.parser_factory.get_parser(source, raw_data)
         
         if not parser:
@@ -36,42 +84,214 @@ class MessageService:
         elif parsed_data['type'] != 'text':
             raise ValueError(f"Unsupported message type: {parsed_data['type']}")
         
-        content = self.create_content_message(parsed_data)
+        content_data = parsed_data['content_data']
+        if self._is_duplicate(content_data['source_id'], content_data['source']):
+            print(f"Skipping duplicate message from {source}")
+            return None
+        
+        fingerprint = fingerprint_columns(content_data['content_data'], self.near_duplicate_min_tokens)
+        near_duplicate = self._find_near_duplicate(fingerprint['fingerprint'], content_data['timestamp'])
+        
+        if near_duplicate is not None and self.near_duplicate_mode == "reuse" \
+                and near_duplicate[0].classification_state != ClassificationState.PENDING:
+            original, distance = near_duplicate
+            print(f"Reusing classification of near-duplicate {original.id} (distance {distance}) for message from {source}")
+            category = original.category
+            entities = [Entity(entity_type=entity.entity_type, entity_value=entity.entity_value) for entity in original.entities]
+            content_data.update(CategoryDecision(category, "near_duplicate").content_columns())
+        else:
+            # classify before touching the database so the content, category and entities are written together
+            # Pass the parsed content data directly to avoid issues with SQLAlchemy object serialization
+            # content_html is left out, content_data already holds its text (reduced for html only emails)
+            # cleaned once here, the classification and agent stages skip the already cleaned text
+            classification_input = clean_payload({key: value for key, value in content_data.items() if key != 'content_html'})
+            try:
+                decision = self.decide_category(parsed_data, classification_input)
+                category = decision.category
+                entities = self.classification_service.extract_entities(**classification_input)
+                content_data.update(decision.content_columns())
+            except LLMUnavailableError as e:
+                print(f"LLM unavailable ({e}), storing message from {source} as classification pending")
+                category, entities = Category.OTHER, []
+                content_data['classification_state'] = ClassificationState.PENDING
+        
+        if self.store_llm_usage:
+            content_data.update(usage.content_columns())
+        content = self.create_content_message(parsed_data, category, entities, fingerprint, near_duplicate)
         if content is None:
             print(f"Skipping duplicate message from {source}")
             return None
         
-        # Pass the parsed content data directly to avoid issues with SQLAlchemy object serialization
-        category = self.classification_service.extract_category(**parsed_data['content_data'])
-        content = self.update_content(content, {'category': category})
-        entities = self.classification_service.extract_entities(**parsed_data['content_data'])
-        if entities:
-            for entity in entities: 
-                entity.content_id = content.id
-            self.entity_repository.create_entities(entities)
+        if self.batch_writer is None:
+            # with the write-behind buffer the content is indexed once its batch is flushed
+            self._index_contents([content])
         
         return content
 
-    def create_content_message(self, parsed_data: dict):
-        content = Content(**parsed_data['content_data'])
-        return self.content_repository.create_content(content) 
+    def decide_category(self, parsed_data: dict, classification_input: dict) -> CategoryDecision:
+        """
+        the pre-classifier rules first, then the local classifier trained on past agent decisions,
+        the category agent only when neither is confident enough
+        """
+        decision = self.decide_category_locally(parsed_data)
+        if decision is not None:
+            return decision
+        return CategoryDecision(self.classification_service.extract_category(**classification_input), "llm")
+
+    def decide_category_locally(self, parsed_data: dict) -> CategoryDecision:
+        """the rules and local classifier steps of decide_category, None when the category agent is needed"""
+        content_data = parsed_data['content_data']
+        sender = parsed_data.get('sender') or parsed_data.get('sender_data', {}).get('username') or ''
+        decision = self.pre_classifier.classify({
+            'source': getattr(content_data['source'], 'value', content_data['source']),
+            'sender': sender,
+            'subject': content_data.get('subject') or '',
+            'content': content_data.get('content_data') or '',
+            'headers': parsed_data.get('headers', {}),
+            'mime_types': parsed_data.get('mime_types', []),
+        })
+        if decision is not None:
+            print(f"Pre-classified {content_data['source_id']} as {decision.category} "
+                  f"(rules {', '.join(decision.rules)}, confidence {decision.confidence})")
+            return decision
+        local_prediction = self.local_classifier.classify(
+            " ".join(part for part in (content_data.get('subject'), content_data.get('content_data')) if part)
+        )
+        if local_prediction is not None:
+            category, probability = local_prediction
+            return CategoryDecision(category, "local_model", round(probability, 4))
+        return None
+
+    def reclassify_pending(self, batch_size: int = 20) -> int:
+        """
+        Classify up to `batch_size` contents stored as classification pending, oldest first, each committed on its own,
+        stops at the first LLMUnavailableError (still down). Returns how many were classified
+        the headers and mime types are not stored, so only the content based pre-classifier rules can fire here
+        """
+        classified = 0
+        for content in self.content_repository.get_pending_contents(batch_size):
+            content_data = {
+                'source_id': content.source_id, 'content_type': content.content_type, 'content_data': content.content_data,
+                'source': content.source, 'timestamp': content.timestamp, 'subject': content.subject,
+            }
+            classification_input = clean_payload(content_data)
+            with message_usage(getattr(content.source, 'value', content.source)) as usage:
+                try:
+                    decision = self.decide_category({'content_data': content_data}, classification_input)
+                    entities = self.classification_service.extract_entities(**classification_input)
+                except LLMUnavailableError as e:
+                    print(f"LLM still unavailable ({e}), {content.id} stays pending")
+                    break
+            try:
+                content.category = self._to_category(decision.category)
+                content.classification_state = ClassificationState.CLASSIFIED
+                for key, value in decision.content_columns().items():
+                    setattr(content, key, value)
+                if self.store_llm_usage:
+                    for key, value in usage.content_columns().items():
+                        setattr(content, key, value)
+                for entity in entities:
+                    entity.content_id = content.id
+                if entities:
+                    self.entity_repository.create_entities(entities, commit=False)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            classified += 1
+        return classified
+
+    def flush_pending(self):
+        """
+        Make every processed message durable, the pollers call this before moving their checkpoint
+        no-op without write-behind since each message is already committed by process_message
+        """
+        if self.batch_writer is not None:
+            self.batch_writer.flush()
+
+    def _is_duplicate(self, source_id: str, source: Source) -> bool:
+        if self.batch_writer is not None and self.batch_writer.is_pending(source_id, source):
+            return True
+        return self.content_repository.content_exists(source_id, source)
+
+    def _find_near_duplicate(self, fingerprint: int, timestamp: datetime):
+        """(content, distance) of the closest stored near-duplicate within the time window, None if off or nothing close"""
+        if self.near_duplicate_mode == "off" or fingerprint is None:
+            return None
+        since = timestamp - timedelta(days=self.near_duplicate_window_days) if timestamp else None
+        try:
+            return self.content_repository.find_near_duplicate(fingerprint, self.near_duplicate_max_distance, since)
+        except Exception as e:
+            # the lookup only saves work, a failure means the message is classified as usual
+            print(f"Near-duplicate lookup failed: {e}")
+            return None
+
+    def _index_contents(self, contents: list[Content]):
+        for content in contents:
+            try:
+                self.embedding_service.index_content(content)
+            except Exception as e:
+                # semantic search is best effort, it should never stop the message from being stored
+                print(f"Failed to index content {content.id} for semantic search: {e}")
+
+    def create_content_message(self, parsed_data: dict, category=None, entities: list = None,
+                               fingerprint: dict = None, near_duplicate: tuple = None):
+        """
+        Persist the content with its category and entities as a single unit of work,
+        with its fingerprint columns and a link to `near_duplicate` (content, distance) when that came from another source
+        """
+        content = Content(**parsed_data['content_data'], **(fingerprint or {}))
+        if category is not None:
+            content.category = self._to_category(category)
+        duplicate_links = []
+        if near_duplicate is not None and near_duplicate[0].source != content.source:
+            original, distance = near_duplicate
+            duplicate_links.append(ContentDuplicate(duplicate_of_id=original.id, hamming_distance=distance))
+        if self.batch_writer is not None:
+            return self.batch_writer.submit(content, entities, duplicate_links)
+        try:
+            saved_content = self.content_repository.create_content(content, commit=False)
+            if saved_content is None:
+                return None
+            if entities:
+                for entity in entities:
+                    entity.content_id = saved_content.id
+                self.entity_repository.create_entities(entities, commit=False)
+            if duplicate_links:
+                for link in duplicate_links:
+                    link.content_id = saved_content.id
+                self.content_duplicate_repository.create_links(duplicate_links, commit=False)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return saved_content
 
     def update_content(self, content: Content, data: dict):
         try : 
             for key, value in data.items():
                 if key == 'category' and isinstance(value, str):
-                    # Convert string category to Category enum
-                    try:
-                        value = Category(value)
-                    except ValueError:
-                        # If the category string is invalid, use OTHER as fallback
-                        value = Category.OTHER
+                    value = self._to_category(value)
                 setattr(content, key, value)
+            if 'category' in data:
+                # a category set by hand replaces whatever decided it before
+                for key, value in CategoryDecision(content.category, "manual").content_columns().items():
+                    setattr(content, key, value)
             self.content_repository.update_content(content)
         except Exception as e:
             raise ValueError(f"Error updating content: {e}")
         return content
 
+    def _to_category(self, value):
+        # Convert string category to Category enum
+        if isinstance(value, Category):
+            return value
+        try:
+            return Category(value)
+        except ValueError:
+            # If the category string is invalid, use OTHER as fallback
+            return Category.OTHER
+
     def get_first_unread_source_id_telegram(self):
         """
         Get the next offset for Telegram by adding 1 to the last processed source_id
@@ -0,0 +1,50 @@
+import time
+from services.message_service import MessageService
+
+DEFAULT_DEFERRED_CLASSIFICATION = {
+    "enabled": True,
+    "batch_size": 20,
+    "sleep_time": 30,
+}
+
+
+def deferred_classification_from_config(config_json: dict) -> dict:
+    return {**DEFAULT_DEFERRED_CLASSIFICATION, **config_json.get("deferred_classification", {})}
+
+
+class PendingReclassifier:
+    """
+        background drain of the contents stored as classification pending during an LLM outage
+        waits while the shared circuit breaker is open, then classifies `batch_size` pending contents at a time,
+        full batches back to back until the backlog is empty, then sleeps `sleep_time` seconds
+        runs in its own thread with its own MessageService (and session), the pollers never wait on it
+    """
+    def __init__(self, message_service: MessageService, batch_size: int = 20, sleep_time: float = 30):
+        self.message_service = message_service
+        self.batch_size = batch_size
+        self.sleep_time = sleep_time
+        self.is_running = False
+        self.classified = 0
+
+    def run_once(self) -> int:
+        """one batch, 0 without calling anything while the circuit is open"""
+        if self.message_service.classification_service.agent_service.circuit_breaker.is_open():
+            return 0
+        classified = self.message_service.reclassify_pending(self.batch_size)
+        self.classified += classified
+        if classified:
+            print(f"Reclassified {classified} pending contents")
+        return classified
+
+    def start_polling(self):
+        print("Starting pending classification drain...")
+        self.is_running = True
+        while self.is_running:
+            try:
+                classified = self.run_once()
+            except Exception as e:
+                print(f"Error reclassifying pending contents: {e}")
+                self.message_service.db.rollback()
+                classified = 0
+            if classified < self.batch_size:
+                time.sleep(self.sleep_time)
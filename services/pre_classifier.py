@@ -0,0 +1,124 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from models import Category
+
+RULE_KINDS = ("sender", "subject", "content", "header", "mime_type")
+DEFAULT_MIN_CONFIDENCE = 0.9
+
+
+@dataclass
+class Rule:
+    name: str
+    kind: str
+    pattern: str
+    category: str
+    confidence: float
+    header: str = None    # header name, for kind "header"
+    source: str = None    # only messages from this source ("email", "telegram"), any when None
+
+    def __post_init__(self):
+        if self.kind not in RULE_KINDS:
+            raise ValueError(f"Rule {self.name}: unknown kind {self.kind}, expected one of {RULE_KINDS}")
+        if self.kind == "header" and not self.header:
+            raise ValueError(f"Rule {self.name}: header rules need a header name")
+        self.category = Category(self.category).value
+        self.regex = re.compile(self.pattern, re.IGNORECASE)
+
+    def matches(self, message: dict) -> bool:
+        if self.source and message.get('source') != self.source:
+            return False
+        if self.kind == "header":
+            return bool(self.regex.search(message.get('headers', {}).get(self.header.lower(), '') or ''))
+        if self.kind == "mime_type":
+            return any(self.regex.fullmatch(mime_type) for mime_type in message.get('mime_types', []))
+        return bool(self.regex.search(message.get(self.kind) or ''))
+
+
+@dataclass
+class CategoryDecision:
+    """
+    a category with where it came from: "rules" (+ the rules that fired), "local_model", "llm", "near_duplicate"
+    (reused from a stored near-duplicate) or "manual" (set through the API)
+    """
+    category: str
+    provenance: str
+    confidence: float = None
+    rules: list[str] = field(default_factory=list)
+
+    def content_columns(self) -> dict:
+        return {
+            'category_provenance': self.provenance,
+            'category_confidence': self.confidence,
+            'category_rules': self.rules or None,
+        }
+
+
+class PreClassifierStats:
+    """process wide counters: messages evaluated, decided by the rules (= category agent calls avoided), hits per rule"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, fired: list[str], decided: bool):
+        with self._lock:
+            self.evaluated += 1
+            self.decided += int(decided)
+            for name in fired:
+                self.rule_hits[name] = self.rule_hits.get(name, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'evaluated': self.evaluated,
+                'llm_calls_avoided': self.decided,
+                'avoided_rate': self.decided / self.evaluated if self.evaluated else 0.0,
+                'rule_hits': dict(self.rule_hits),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.evaluated = 0
+            self.decided = 0
+            self.rule_hits = {}
+
+
+pre_classifier_stats = PreClassifierStats()
+
+
+class RuleClassifier:
+    """
+        cascade of cheap deterministic rules run before the category agent
+        rules are evaluated in config order, every rule that fires adds its confidence to its category
+        (independent evidence: 1 - (1 - a)(1 - b)), as soon as a category reaches min_confidence it is the decision
+        and the LLM is skipped, otherwise None and the agent decides (the rules that fired are still counted)
+    """
+    def __init__(self, rules: list[Rule], min_confidence: float = DEFAULT_MIN_CONFIDENCE, enabled: bool = True):
+        self.rules = rules
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, config_json: dict) -> "RuleClassifier":
+        settings = config_json.get("pre_classifier", {})
+        rules = [Rule(**rule) for rule in settings.get("rules", [])]
+        return cls(rules, settings.get("min_confidence", DEFAULT_MIN_CONFIDENCE), settings.get("enabled", True))
+
+    def classify(self, message: dict) -> CategoryDecision:
+        """
+        message: source, sender, subject, content, headers (lowercase names) and mime_types of one message
+        """
+        if not self.enabled or not self.rules:
+            return None
+        confidences, fired = {}, {}
+        for rule in self.rules:
+            if not rule.matches(message):
+                continue
+            fired.setdefault(rule.category, []).append(rule.name)
+            confidence = 1 - (1 - confidences.get(rule.category, 0.0)) * (1 - rule.confidence)
+            confidences[rule.category] = confidence
+            if confidence >= self.min_confidence:
+                pre_classifier_stats.record(sum(fired.values(), []), decided=True)
+                return CategoryDecision(rule.category, "rules", round(confidence, 4), fired[rule.category])
+        pre_classifier_stats.record(sum(fired.values(), []), decided=False)
+        return None
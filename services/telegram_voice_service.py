@@ -32,7 +32,7 @@ class TelegramVoiceService:
         if not voice_message:
             raise ValueError(f"Voice message not found: {parsed_data['voice_file_id']}")
         formated_voice_message = self.convert_ogg_to_mp3_bytes(voice_message)
-        voice_message_text = self.openai_client.transcribe_audio(formated_voice_message)
+        voice_message_text = self.openai_client.transcribe_audio(formated_voice_message, parsed_data.get('voice_duration'))
 
         parsed_data['content_data']['content_data'] = voice_message_text
         return parsed_data
@@ -17,6 +17,8 @@ class EmailPoller:
         self.is_running = False
         self.message_service = message_service
         self.sleep_time = config.config_json["email_poller_sleep_time"]
+        # messages bigger than this (Gmail sizeEstimate, bytes) are fetched as raw and stream parsed
+        self.raw_fetch_threshold = config.config_json.get("email_raw_fetch_threshold_bytes", 262144)
 
     def authenticate_gmail(self):
         creds = None
@@ -54,29 +56,12 @@ class EmailPoller:
 
         message_ids = [msg['id'] for msg in messages]
         
-        batch = self.service.new_batch_http_request()
-        
-        for msg_id in message_ids:
-            batch.add(
-                self.service.users().messages().get(
-                    userId='me',
-                    id=msg_id,
-                    format='metadata',
-                    metadataHeaders=['Subject', 'From']
-                )
-            )
-        
-        batch.execute()
+        size_estimates = self.fetch_size_estimates(message_ids)
  
         for msg in messages:
             try:
                 msg_id = msg['id']
-                msg_data = self.service.users().messages().get(
-                    userId='me',
-                    id=msg_id,
-                    format='metadata',
-                    metadataHeaders=['Subject', 'From']
-                ).execute()
+                msg_data = self.fetch_message(msg_id, size_estimates.get(msg_id))
                 
                 if self.message_service:
                     self.message_service.process_message(source='email', raw_data=msg_data)
@@ -87,6 +72,14 @@ class EmailPoller:
                 print(f"Error processing message {msg_id}: {e}")
                 continue
         
+        try:
+            # marking as read is our checkpoint, it must not happen before the messages are stored
+            if self.message_service:
+                self.message_service.flush_pending()
+        except Exception as e:
+            print(f"Error flushing processed emails, leaving them unread: {e}")
+            return
+        
         if message_ids:
             try:
                 self.service.users().messages().batchModify(
@@ -100,6 +93,38 @@ class EmailPoller:
             except Exception as e:
                 print(f"Error marking emails as read: {e}")
 
+    def fetch_size_estimates(self, message_ids: list[str]) -> dict:
+        """sizeEstimate of every message with one batched format='minimal' request (no headers, no body)"""
+        size_estimates = {}
+
+        def collect(request_id, response, exception):
+            if exception is None and response:
+                size_estimates[request_id] = response.get('sizeEstimate')
+
+        batch = self.service.new_batch_http_request(callback=collect)
+        for msg_id in message_ids:
+            batch.add(
+                self.service.users().messages().get(userId='me', id=msg_id, format='minimal'),
+                request_id=msg_id
+            )
+        try:
+            batch.execute()
+        except Exception as e:
+            print(f"Error fetching message sizes, fetching all as full: {e}")
+        return size_estimates
+
+    def fetch_message(self, msg_id: str, size_estimate: int = None) -> dict:
+        """
+        small messages come as format='full' (decoded MIME tree, attachments only referenced by id),
+        above the threshold as format='raw' which EmailTextParser reads with the streaming MIME parser
+        """
+        message_format = 'raw' if size_estimate and size_estimate > self.raw_fetch_threshold else 'full'
+        return self.service.users().messages().get(
+            userId='me',
+            id=msg_id,
+            format=message_format
+        ).execute()
+
     def start_polling(self):
         self.is_running = True
         creds = self.authenticate_gmail()
@@ -0,0 +1,197 @@
+"""
+in-process stand-in for the Gmail API client (googleapiclient's `build('gmail', 'v1')`) serving recorded
+users.messages.get responses, one JSON file per message (<message id>.json, format 'full'),
+so the backfill and the pollers can run end to end without a Gmail account (scripts/backfill_gmail.py --fake-gmail),
+and the helpers that turn .eml files into the dicts the Gmail API returns, for the tests and the benchmarks
+
+supports users().messages().list (q with after:/before:, newest first, pageToken/maxResults paging),
+users().messages().get and new_batch_http_request, and can fail chosen messages with an HTTP error
+"""
+import base64
+import email
+import email.policy
+import json
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from pathlib import Path
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+# the .eml corpus the tests and the benchmarks run on
+EML_FIXTURES_DIR = Path(__file__).resolve().parents[2] / "test" / "fixtures" / "eml"
+
+
+def load_eml_fixtures(directory=EML_FIXTURES_DIR) -> dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(Path(directory).glob("*.eml"))}
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def _gmail_part(part, part_id: str) -> dict:
+    headers = [{'name': name, 'value': str(make_header(decode_header(value)))} for name, value in part.items()]
+    gmail_part = {
+        'partId': part_id,
+        'mimeType': part.get_content_type(),
+        'filename': part.get_filename() or '',
+        'headers': headers,
+    }
+    if part.is_multipart():
+        gmail_part['body'] = {'size': 0}
+        gmail_part['parts'] = [
+            _gmail_part(child, f"{part_id}.{index}" if part_id else str(index))
+            for index, child in enumerate(part.get_payload())
+        ]
+    else:
+        # Gmail returns the transfer-decoded bytes, still in the part's own charset
+        data = part.get_payload(decode=True) or b""
+        gmail_part['body'] = {'size': len(data), 'data': _b64url(data)}
+    return gmail_part
+
+
+def eml_to_gmail_message(eml: bytes, message_id: str, message_format: str = "full", internal_date: str = "1750604461000") -> dict:
+    """Gmail users.messages.get response for `eml`, format 'full' or 'raw'"""
+    message = email.message_from_bytes(eml, policy=email.policy.compat32)
+    response = {
+        'id': message_id,
+        'threadId': message_id,
+        'labelIds': ['UNREAD', 'INBOX'],
+        'snippet': '',
+        'internalDate': internal_date,
+        'sizeEstimate': len(eml),
+    }
+    if message_format == "raw":
+        response['raw'] = _b64url(eml)
+    else:
+        response['payload'] = _gmail_part(message, '')
+    return response
+
+
+def write_mbox(path, emls: list[bytes]):
+    """mboxrd file holding `emls`, body lines starting with (>)*"From " quoted with one more '>'"""
+    with open(path, "wb") as f:
+        for eml in emls:
+            f.write(b"From MAILER-DAEMON Mon Jun  2 16:15:00 2025\n")
+            for line in eml.replace(b"\r\n", b"\n").split(b"\n"):
+                if line.lstrip(b">").startswith(b"From "):
+                    line = b">" + line
+                f.write(line + b"\n")
+            f.write(b"\n")
+
+
+def record_fixture_messages(directory, count: int, start: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc),
+                            step_hours: int = 6) -> list[str]:
+    """Write `count` recordings built from the .eml fixtures, one every `step_hours`, returns their ids"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    emls = list(load_eml_fixtures().values())
+    message_ids = []
+    for index in range(count):
+        message_id = f"msg{index:06d}"
+        internal_date = int(start.timestamp() * 1000) + index * step_hours * 3600 * 1000
+        message = eml_to_gmail_message(emls[index % len(emls)], message_id, "full", str(internal_date))
+        (directory / f"{message_id}.json").write_text(json.dumps(message), encoding="utf-8")
+        message_ids.append(message_id)
+    return message_ids
+
+
+def http_error(status: int, reason: str = "error") -> HttpError:
+    return HttpError(httplib2.Response({'status': status}), json.dumps({'error': {'message': reason}}).encode())
+
+
+class _Request:
+    def __init__(self, service, function):
+        self.service = service
+        self.function = function
+
+    def execute(self):
+        return self.function()
+
+
+class _Batch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request))
+
+    def execute(self):
+        self.service.batch_calls += 1
+        for request_id, request in self.requests:
+            try:
+                response, exception = request.execute(), None
+            except HttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
+class FakeGmailService:
+    def __init__(self, recordings_dir, failures: dict = None):
+        self.recorded = {}
+        for path in Path(recordings_dir).glob("*.json"):
+            message = json.loads(path.read_text(encoding="utf-8"))
+            self.recorded[message['id']] = message
+        # message id -> number of times its get still fails with a 429 (or an HttpError to raise for ever)
+        self.failures = dict(failures or {})
+        self.list_calls = 0
+        self.get_calls = 0
+        self.batch_calls = 0
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def get(self, userId='me', id=None, format='full'):
+        def execute():
+            self.get_calls += 1
+            failure = self.failures.get(id)
+            if isinstance(failure, HttpError):
+                raise failure
+            if failure:
+                self.failures[id] -= 1
+                raise http_error(429, "rateLimitExceeded")
+            if id not in self.recorded:
+                raise http_error(404, "Requested entity was not found.")
+            message = self.recorded[id]
+            if format == 'minimal':
+                return {key: message[key] for key in ('id', 'threadId', 'labelIds', 'sizeEstimate', 'internalDate')}
+            return message
+        return _Request(self, execute)
+
+    def list(self, userId='me', q=None, pageToken=None, maxResults=100, labelIds=None):
+        def execute():
+            self.list_calls += 1
+            matching = sorted(
+                (message for message in self.recorded.values() if self._matches(message, q or "")),
+                key=lambda message: int(message['internalDate']), reverse=True,
+            )
+            start = int(pageToken or 0)
+            page = matching[start:start + maxResults]
+            response = {
+                'messages': [{'id': message['id'], 'threadId': message['threadId']} for message in page],
+                'resultSizeEstimate': len(page),
+            }
+            if start + maxResults < len(matching):
+                response['nextPageToken'] = str(start + maxResults)
+            return response
+        return _Request(self, execute)
+
+    @staticmethod
+    def _matches(message: dict, query: str) -> bool:
+        received = datetime.fromtimestamp(int(message['internalDate']) / 1000, tz=timezone.utc)
+        for term in query.split():
+            name, _, value = term.partition(':')
+            if name in ('after', 'before'):
+                bound = datetime.strptime(value, "%Y/%m/%d").replace(tzinfo=timezone.utc)
+                if (name == 'after' and received < bound) or (name == 'before' and received >= bound):
+                    return False
+        return True
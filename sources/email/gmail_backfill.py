@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import httplib2
+from services.message_service import MessageService
+from config import config
+
+DEFAULT_GMAIL_BACKFILL = {
+    "concurrency": 4,
+    "batch_size": 50,
+    "page_size": 500,
+    "requests_per_second": 20,
+    "max_retries": 5,
+    "retry_delay_seconds": 1.0,
+    "checkpoint_path": "data/gmail_backfill_checkpoint.json",
+}
+# status codes of Gmail's "slow down" and transient server errors, worth another try after a backoff
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def gmail_backfill_from_config(config_json: dict) -> dict:
+    return {**DEFAULT_GMAIL_BACKFILL, **config_json.get("gmail_backfill", {})}
+
+
+def build_query(after: date = None, before: date = None, query: str = None) -> str:
+    """Gmail search query for the date range (after is inclusive, before exclusive) plus any extra search terms"""
+    terms = []
+    if after:
+        terms.append(f"after:{after:%Y/%m/%d}")
+    if before:
+        terms.append(f"before:{before:%Y/%m/%d}")
+    if query:
+        terms.append(query)
+    return " ".join(terms)
+
+
+def _is_retryable(exception: Exception) -> bool:
+    status = getattr(getattr(exception, 'resp', None), 'status', None)
+    if status is None:
+        # no http response at all: connection reset, timeout, dns
+        return isinstance(exception, (OSError, httplib2.HttpLib2Error))
+    if int(status) == 403:
+        # Gmail answers quota errors with 403 too, other 403s (no permission) won't go away
+        return 'ratelimitexceeded' in str(exception).lower()
+    return int(status) in RETRYABLE_STATUSES
+
+
+class RateLimiter:
+    """token bucket shared by the fetch threads, every message get takes one token"""
+    def __init__(self, requests_per_second: float):
+        self.rate = requests_per_second
+        self.capacity = max(requests_per_second, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # a batch bigger than the bucket goes into debt and the next callers wait it off
+            self.tokens -= count
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class BackfillReport:
+    def __init__(self):
+        self.pages = 0
+        self.listed = 0
+        self.stored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def messages_per_sec(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.listed / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"pages {self.pages} | listed {self.listed} | stored {self.stored} | "
+                f"skipped (duplicates) {self.skipped} | failed {self.failed} | {self.messages_per_sec:.1f} msg/s")
+
+
+class GmailBackfill:
+    """
+        historical import of a Gmail mailbox (the poller only ever sees unread mail)
+        1- pages users.messages.list for the search query
+        2- fetches each page's messages as batch requests of batch_size gets, `concurrency` batches at a time,
+           every thread with its own api client (the google client isn't thread safe), all under one rate limit
+        3- feeds them, in list order, through MessageService (EmailTextParser, classification, storage)
+        4- after the page is flushed saves the next page token to the checkpoint file, so a stopped run resumes
+           at the first page that wasn't completely stored (messages stored twice are skipped as duplicates)
+        messages still failing after max_retries are recorded in the checkpoint's failed_ids, run() never goes back
+        to them, retry_failed() fetches and stores them again once the cause (quota, outage, a bug) is gone
+    """
+    def __init__(self, service_factory, message_service: MessageService, settings: dict = None):
+        settings = settings or gmail_backfill_from_config(config.config_json)
+        self.service_factory = service_factory
+        self.message_service = message_service
+        self.concurrency = settings["concurrency"]
+        self.batch_size = min(settings["batch_size"], 100)   # Gmail's limit for one batch request
+        self.page_size = min(settings["page_size"], 500)     # and for one list page
+        self.max_retries = settings["max_retries"]
+        self.checkpoint_path = settings["checkpoint_path"]
+        self.rate_limiter = RateLimiter(settings["requests_per_second"])
+        self.retry_delay = settings["retry_delay_seconds"]
+        self._local = threading.local()
+
+    def _service(self):
+        if not hasattr(self._local, 'service'):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    @staticmethod
+    def new_checkpoint(query: str) -> dict:
+        return {"query": query, "page_token": None, "completed": False, "processed": 0, "failed_ids": []}
+
+    def load_checkpoint(self, query: str) -> dict:
+        fresh = self.new_checkpoint(query)
+        if not os.path.exists(self.checkpoint_path):
+            return fresh
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("query") != query:
+            print(f"Checkpoint {self.checkpoint_path} is for query {checkpoint.get('query')!r}, starting over")
+            return fresh
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint: dict):
+        # written to a temporary file and renamed, a crash never leaves a half written checkpoint
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        temporary_path = self.checkpoint_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def run(self, query: str, max_pages: int = None) -> BackfillReport:
+        report = BackfillReport()
+        checkpoint = self.load_checkpoint(query)
+        if checkpoint["completed"]:
+            print(f"Backfill of {query!r} already completed ({checkpoint['processed']} messages)")
+            return report
+        if checkpoint["page_token"]:
+            print(f"Resuming backfill of {query!r} after {checkpoint['processed']} messages")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while not checkpoint["completed"] and (max_pages is None or report.pages < max_pages):
+                page = self._list_page(query, checkpoint["page_token"])
+                message_ids = [message['id'] for message in page.get('messages', [])]
+                failed_ids = self._process_page(pool, message_ids, report)
+
+                self.message_service.flush_pending()
+                report.pages += 1
+                checkpoint["page_token"] = page.get('nextPageToken')
+                checkpoint["completed"] = checkpoint["page_token"] is None
+                checkpoint["processed"] += len(message_ids)
+                checkpoint["failed_ids"] += failed_ids
+                self.save_checkpoint(checkpoint)
+                print(report)
+        return report
+
+    def retry_failed(self, query: str) -> BackfillReport:
+        """Fetch and store the checkpoint's failed_ids again, the ones that still fail stay in the checkpoint"""
+        report = BackfillReport()
+        checkpoint = self.load_checkpoint(query)
+        if not checkpoint["failed_ids"]:
+            print(f"No failed messages to retry for {query!r}")
+            return report
+        print(f"Retrying {len(checkpoint['failed_ids'])} failed messages of {query!r}")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            failed_ids = self._process_page(pool, checkpoint["failed_ids"], report)
+        self.message_service.flush_pending()
+        checkpoint["failed_ids"] = failed_ids
+        self.save_checkpoint(checkpoint)
+        return report
+
+    def _list_page(self, query: str, page_token: str = None) -> dict:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self._service().users().messages().list(
+                    userId='me', q=query, pageToken=page_token, maxResults=self.page_size
+                ).execute()
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    raise
+                print(f"Error listing messages, retrying: {e}")
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _process_page(self, pool: ThreadPoolExecutor, message_ids: list[str], report: BackfillReport) -> list[str]:
+        report.listed += len(message_ids)
+        chunks = [message_ids[start:start + self.batch_size] for start in range(0, len(message_ids), self.batch_size)]
+        failed_ids = []
+        # map keeps the chunks in order, the database work stays on this thread
+        for messages, chunk_failed_ids in pool.map(self.fetch_batch, chunks):
+            failed_ids += chunk_failed_ids
+            for message in messages:
+                try:
+                    content = self.message_service.process_message(source='email', raw_data=message)
+                except Exception as e:
+                    print(f"Error processing message {message.get('id')}: {e}")
+                    failed_ids.append(message.get('id'))
+                    continue
+                if content is None:
+                    report.skipped += 1
+                else:
+                    report.stored += 1
+        report.failed += len(failed_ids)
+        return failed_ids
+
+    def fetch_batch(self, message_ids: list[str]) -> tuple[list[dict], list[str]]:
+        """format='full' messages of one batch request (in `message_ids` order) and the ids that kept failing"""
+        service = self._service()
+        messages = {}
+        pending = list(message_ids)
+        failed_ids = []
+        for attempt in range(self.max_retries + 1):
+            retry = []
+
+            def collect(request_id, response, exception):
+                if exception is None:
+                    messages[request_id] = response
+                elif _is_retryable(exception) and attempt < self.max_retries:
+                    retry.append(request_id)
+                else:
+                    print(f"Error fetching message {request_id}: {exception}")
+                    failed_ids.append(request_id)
+
+            self.rate_limiter.acquire(len(pending))
+            batch = service.new_batch_http_request(callback=collect)
+            for msg_id in pending:
+                batch.add(service.users().messages().get(userId='me', id=msg_id, format='full'), request_id=msg_id)
+            try:
+                batch.execute()
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Error executing batch of {len(pending)} messages: {e}")
+                    failed_ids += [msg_id for msg_id in pending if msg_id not in messages and msg_id not in failed_ids]
+                    break
+                retry = [msg_id for msg_id in pending if msg_id not in messages and msg_id not in failed_ids]
+            if not retry:
+                break
+            pending = retry
+            time.sleep(self.retry_delay * 2 ** attempt)
+        return [messages[msg_id] for msg_id in message_ids if msg_id in messages], failed_ids
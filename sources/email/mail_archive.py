@@ -0,0 +1,242 @@
+import asyncio
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from message_parsers.email.email_text_parser import EmailTextParser
+from models import Category, ClassificationState
+from schemas.schemas import ArchiveContentItem, BulkEntityRequest
+from services.agent_service import LLMUnavailableError
+from services.async_classification_service import AsyncClassificationService
+from services.pre_classifier import CategoryDecision
+
+ARCHIVE_SUFFIXES = ('.mbox', '.eml')
+READ_CHUNK_SIZE = 1024 * 1024
+# mboxrd quoting: a body line starting with "From " is stored as ">From ", every further '>' is one more level
+_QUOTED_FROM_RE = re.compile(rb"^>(>*From )")
+
+
+def iter_mbox_messages(path: str):
+    """
+    Messages of an mbox file as bytes, one at a time: the file is read line by line and only the current
+    message is held in memory. ">From " quoting (mboxrd / mboxo) is undone
+    """
+    lines = []
+    with open(path, "rb", buffering=READ_CHUNK_SIZE) as f:
+        previous_blank = True
+        for line in f:
+            if line.startswith(b"From ") and previous_blank:
+                if lines:
+                    yield b"".join(lines)
+                lines = []
+            elif lines or line.strip():
+                lines.append(_QUOTED_FROM_RE.sub(rb"\1", line))
+            previous_blank = not line.strip()
+    if lines:
+        yield b"".join(lines)
+
+
+def iter_archive_files(paths: list[str]):
+    """.mbox and .eml files among `paths`, directories are walked (sorted, so runs are repeatable)"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, files in os.walk(path):
+                directories.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(ARCHIVE_SUFFIXES):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_archive_messages(paths: list[str]):
+    for path in iter_archive_files(paths):
+        if path.lower().endswith('.eml'):
+            with open(path, "rb") as f:
+                yield f.read()
+        else:
+            yield from iter_mbox_messages(path)
+
+
+_parser = None
+
+
+def parse_archive_message(eml: bytes) -> dict:
+    """
+    Runs in the pool's worker processes: one message to the kwargs of an ArchiveContentItem ("item") and the
+    sender, headers and MIME types the pre-classifier rules read (plain dicts pickle cheaply back to the parent),
+    None when it can't be parsed
+    """
+    global _parser
+    if _parser is None:
+        _parser = EmailTextParser()
+    try:
+        parsed_data = _parser.parse_eml(eml)
+    except Exception as e:
+        print(f"Error parsing archived message: {e}")
+        return None
+    content_data = parsed_data['content_data']
+    return {
+        'item': {
+            'source_id': content_data['source_id'],
+            'content_type': content_data['content_type'].value,
+            'content_data': content_data['content_data'] or '',
+            'content_html': content_data['content_html'] or None,
+            'source': content_data['source'].value,
+            'category': 'other',
+            'subject': (content_data['subject'] or '')[:255] or None,
+            'timestamp': content_data['timestamp'],
+        },
+        'sender': parsed_data.get('sender', ''),
+        'headers': parsed_data.get('headers', {}),
+        'mime_types': parsed_data.get('mime_types', []),
+    }
+
+
+class MailArchiveImporter:
+    """
+        offline import of mbox / eml archives that never went through Gmail
+        messages are streamed from the files, parsed by EmailTextParser in a pool of `workers` processes
+        (a window of messages at a time so memory stays flat however big the archive is) and yielded
+        in archive order as ArchiveContentItems for repository.bulk_loader, which skips Message-IDs already stored.
+        classification is optional: without a message service everything is stored as 'other'.
+        with one, every batch of `classify_batch_size` messages is first checked against the stored Message-IDs
+        (those are yielded unclassified for the loader to skip) and the rest go through MessageService.decide_category,
+        the pre-classifier rules and local classifier before the category agent.
+        the agents are MessageService's ClassificationService, one message at a time, unless an AsyncClassificationService
+        is given: then a batch is classified concurrently on one event loop (the AsyncOpenAIClient keeps the requests
+        under the rate limits)
+    """
+    def __init__(self, workers: int = None, chunk_size: int = 64, message_service=None,
+                 classification_service: AsyncClassificationService = None, classify_batch_size: int = 32):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.message_service = message_service
+        self.classification_service = classification_service
+        self.classify_batch_size = classify_batch_size
+        self.unparsable = 0
+        self.already_stored = 0
+        self._loop = None
+
+    def iter_items(self, paths: list[str]):
+        try:
+            yield from self._iter_items(paths)
+        finally:
+            self._close_loop()
+
+    def _iter_items(self, paths: list[str]):
+        messages = iter_archive_messages(paths)
+        if self.workers == 1:
+            yield from self._to_items(map(parse_archive_message, messages))
+            return
+        window = self.workers * self.chunk_size * 4
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # the next window is submitted before the current one is drained, so the workers keep busy
+            # while the parent loads the results into the database
+            in_flight = None
+            while True:
+                batch = list(islice(messages, window))
+                submitted = pool.map(parse_archive_message, batch, chunksize=self.chunk_size) if batch else None
+                if in_flight is not None:
+                    yield from self._to_items(in_flight)
+                if submitted is None:
+                    break
+                in_flight = submitted
+
+    def _to_items(self, parsed_messages):
+        parsed_messages = self._parsed_messages(parsed_messages)
+        if self.message_service is None:
+            yield from (ArchiveContentItem(**parsed['item']) for parsed in parsed_messages)
+            return
+        while batch := list(islice(parsed_messages, self.classify_batch_size)):
+            items = [ArchiveContentItem(**parsed['item']) for parsed in batch]
+            # a re-run import would pay for the agents again on every message the loader then skips
+            stored = self.message_service.content_repository.get_existing_source_keys(
+                [{'source_id': item.source_id, 'source': item.source} for item in items]
+            )
+            self.already_stored += len(stored)
+            to_classify = [(item, parsed) for item, parsed in zip(items, batch) if (item.source_id, item.source) not in stored]
+            if isinstance(self.classification_service, AsyncClassificationService):
+                self._run(self._classify_batch(to_classify))
+            else:
+                for item, parsed in to_classify:
+                    self._classify(item, parsed)
+            yield from items
+
+    def _parsed_messages(self, parsed_messages):
+        for parsed in parsed_messages:
+            if parsed is None:
+                self.unparsable += 1
+                continue
+            yield parsed
+
+    def _classify(self, item: ArchiveContentItem, parsed: dict):
+        classification_input = self._classification_input(item)
+        try:
+            decision = self.message_service.decide_category(self._decision_input(item, parsed), classification_input)
+            entities = self.message_service.classification_service.extract_entities(**classification_input)
+        except LLMUnavailableError as e:
+            self._leave_pending(item, e)
+            return
+        self._apply_classification(item, decision, entities)
+
+    async def _classify_batch(self, batch: list[tuple[ArchiveContentItem, dict]]):
+        await asyncio.gather(*[self._classify_async(item, parsed) for item, parsed in batch])
+
+    async def _classify_async(self, item: ArchiveContentItem, parsed: dict):
+        classification_input = self._classification_input(item)
+        try:
+            decision = self.message_service.decide_category_locally(self._decision_input(item, parsed))
+            if decision is None:
+                category, entities = await self.classification_service.classify(**classification_input)
+                decision = CategoryDecision(category, "llm")
+            else:
+                entities = await self.classification_service.extract_entities(**classification_input)
+        except LLMUnavailableError as e:
+            self._leave_pending(item, e)
+            return
+        self._apply_classification(item, decision, entities)
+
+    def _classification_input(self, item: ArchiveContentItem) -> dict:
+        return {'content_data': item.content_data, 'subject': item.subject, 'source': item.source}
+
+    def _decision_input(self, item: ArchiveContentItem, parsed: dict) -> dict:
+        """the parsed_data shape MessageService.decide_category reads"""
+        return {
+            'content_data': {'source_id': item.source_id, 'source': item.source, 'subject': item.subject,
+                             'content_data': item.content_data},
+            'sender': parsed['sender'],
+            'headers': parsed['headers'],
+            'mime_types': parsed['mime_types'],
+        }
+
+    def _leave_pending(self, item: ArchiveContentItem, error: Exception):
+        # imported as 'other' anyway, the reclassifier picks it up once the LLM is back
+        print(f"LLM unavailable, {item.source_id} left pending: {error}")
+        item.classification_state = ClassificationState.PENDING.value
+
+    def _apply_classification(self, item: ArchiveContentItem, decision: CategoryDecision, entities: list):
+        # same fallback as MessageService, an unknown category from the agent is stored as 'other'
+        category = getattr(decision.category, 'value', decision.category)
+        item.category = category if category in {known.value for known in Category} else Category.OTHER.value
+        for key, value in decision.content_columns().items():
+            setattr(item, key, value)
+        item.entities = [
+            BulkEntityRequest(entity_type=getattr(entity.entity_type, 'value', entity.entity_type), entity_value=entity.entity_value)
+            for entity in entities
+        ]
+
+    def _run(self, coroutine):
+        # one loop for the whole import, the async client's connections belong to it
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    def _close_loop(self):
+        if self._loop is None:
+            return
+        try:
+            self._loop.run_until_complete(self.classification_service.agent_service.openai_client.aclose())
+        finally:
+            self._loop.close()
+            self._loop = None
@@ -34,17 +34,24 @@ class TelegramPoller:
         while True:
             try:
                 updates = self.get_updates(self.offset)
+                next_offset = self.offset
                 
-                for update in updates:
-                    # Only process updates that contain actual messages
-                    if 'message' in update:
-                        self.message_service.process_message(source='telegram', raw_data=update)
-                    else:
-                        # Skip non-message updates (like my_chat_member, channel_post, etc.)
-                        print(f"Skipping non-message update: {list(update.keys())}")
-                    
-                    # Always update the offset to avoid processing the same update again
-                    self.offset = update["update_id"] + 1
+                try:
+                    for update in updates:
+                        # Only process updates that contain actual messages
+                        if 'message' in update:
+                            self.message_service.process_message(source='telegram', raw_data=update)
+                        else:
+                            # Skip non-message updates (like my_chat_member, channel_post, etc.)
+                            print(f"Skipping non-message update: {list(update.keys())}")
+                        
+                        # Always update the offset to avoid processing the same update again
+                        next_offset = update["update_id"] + 1
+                finally:
+                    # the next getUpdates call with this offset acknowledges the updates to telegram,
+                    # so only move it once the processed messages are flushed to the database
+                    self.message_service.flush_pending()
+                    self.offset = next_offset
                 
                 time.sleep(self.sleep_time)
                 
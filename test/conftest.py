@@ -0,0 +1,10 @@
+import pytest
+from config import config
+from services import embedding_service
+
+
+@pytest.fixture(autouse=True)
+def isolated_vector_index(tmp_path, monkeypatch):
+    """every service built in a test embeds into a throwaway index instead of data/embeddings"""
+    monkeypatch.setitem(config.config_json, "embedding_index_path", str(tmp_path / "embeddings"))
+    monkeypatch.setattr(embedding_service, "_shared_vector_index", None)
@@ -0,0 +1,75 @@
+import json
+import pytest
+from unittest.mock import patch
+from services.agent_service import AgentService, agent_usage_stats
+from utils.token_count import estimate_tokens, truncate_to_tokens, TRUNCATION_STRATEGIES
+
+
+LONG_TEXT = " ".join(
+    f"Sentence number {index} of the weekly update talks about the project status and the next steps."
+    for index in range(400)
+) + " Please reply before Friday."
+
+
+class TestTruncation:
+    """Test the token budget truncation strategies."""
+
+    def test_short_text_is_returned_unchanged(self):
+        for strategy in TRUNCATION_STRATEGIES:
+            assert truncate_to_tokens("short message", 100, strategy) == "short message"
+
+    @pytest.mark.parametrize("strategy", list(TRUNCATION_STRATEGIES))
+    def test_every_strategy_fits_the_budget(self, strategy):
+        truncated = truncate_to_tokens(LONG_TEXT, 200, strategy)
+        assert estimate_tokens(truncated) <= 200
+        assert truncated.startswith("Sentence number 0")
+
+    def test_head_tail_keeps_the_end_of_the_message(self):
+        assert truncate_to_tokens(LONG_TEXT, 200, "head_tail").endswith("Please reply before Friday.")
+
+    def test_first_sentences_keeps_whole_sentences(self):
+        truncated = truncate_to_tokens(LONG_TEXT, 200, "first_sentences")
+        assert truncated.endswith("next steps. [...]")
+
+    def test_unknown_strategy_raises(self):
+        with pytest.raises(ValueError):
+            truncate_to_tokens(LONG_TEXT, 200, "middle")
+
+
+class TestAgentInputBudget:
+    """Test that AgentService applies the per agent budgets before calling the model."""
+
+    @pytest.fixture
+    def agent_service(self):
+        agent_usage_stats.reset()
+        with patch('services.agent_service.OpenAIClient') as client_class:
+            client_class.return_value.request_agent.return_value = json.dumps({"category": "work"})
+            yield AgentService()
+        agent_usage_stats.reset()
+
+    def test_long_input_is_truncated_before_request(self, agent_service):
+        budget = agent_service.load_budget("entity_agent")
+        result = agent_service.run_agent("entity_agent", {"content_data": LONG_TEXT, "category": "work"})
+
+        assert result == {"category": "work"}
+        _, user_message, _ = agent_service.openai_client.request_agent.call_args[0]
+        assert estimate_tokens(user_message) < estimate_tokens(LONG_TEXT)
+        assert "Please reply before Friday." in user_message
+
+        stats = agent_usage_stats.snapshot()["entity_agent"]
+        assert stats["calls"] == 1 and stats["truncated_calls"] == 1
+        assert stats["input_tokens"] <= budget["max_input_tokens"] < stats["input_tokens_before_truncation"]
+
+    def test_short_input_is_sent_as_is(self, agent_service):
+        agent_service.run_agent("category_agent", {"content_data": "Lunch at noon?"})
+        agent_service.run_agent("category_agent", {"content_data": LONG_TEXT})
+
+        _, user_message, _ = agent_service.openai_client.request_agent.call_args_list[0][0]
+        assert "Lunch at noon?" in user_message
+        stats = agent_usage_stats.snapshot()["category_agent"]
+        assert stats["calls"] == 2 and stats["truncated_calls"] == 1
+        assert stats["truncation_rate"] == 0.5
+
+    def test_agent_without_budget_file_is_not_truncated(self, agent_service):
+        assert agent_service.apply_input_budget("unknown_agent", {"content_data": LONG_TEXT}) == {"content_data": LONG_TEXT}
+        assert agent_usage_stats.snapshot()["unknown_agent"]["truncated_calls"] == 0
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import httpx
+import openai
+import pytest
+from clients.async_openai_client import (
+    AsyncOpenAIClient, AdaptiveRateLimiter, DEFAULT_OPENAI_ASYNC, parse_reset_duration,
+)
+from services.async_agent_service import AsyncAgentService
+from services.async_classification_service import AsyncClassificationService
+
+
+def completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    }
+
+
+RATE_LIMIT_HEADERS = {
+    "x-ratelimit-limit-requests": "600", "x-ratelimit-remaining-requests": "599", "x-ratelimit-reset-requests": "100ms",
+    "x-ratelimit-limit-tokens": "60000", "x-ratelimit-remaining-tokens": "59000", "x-ratelimit-reset-tokens": "1s",
+}
+
+
+class TestAsyncOpenAIClient:
+    """Test the async OpenAI client against a mocked transport."""
+
+    @pytest.fixture
+    def settings(self):
+        return {**DEFAULT_OPENAI_ASYNC, "concurrency": 3, "retry_base_delay_seconds": 0.001, "retry_max_delay_seconds": 0.01}
+
+    def make_client(self, settings, handler) -> AsyncOpenAIClient:
+        return AsyncOpenAIClient(settings, http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    def test_parse_reset_duration(self):
+        assert parse_reset_duration("20ms") == 0.02
+        assert parse_reset_duration("6m0s") == 360
+        assert parse_reset_duration("1m30.5s") == 90.5
+        assert parse_reset_duration(None) == 0
+
+    def test_retries_rate_limited_and_server_errors(self, settings):
+        statuses = [429, 503]
+
+        def handler(request):
+            if statuses:
+                return httpx.Response(statuses.pop(0), json={"error": {"message": "slow down"}}, headers={"retry-after-ms": "1"})
+            return httpx.Response(200, json=completion('{"category": "work"}'), headers=RATE_LIMIT_HEADERS)
+
+        async def run():
+            client = self.make_client(settings, handler)
+            try:
+                return await client.request_agent("system", "user", {}), client
+            finally:
+                await client.aclose()
+
+        content, client = asyncio.run(run())
+        assert json.loads(content) == {"category": "work"}
+        assert client.retries == 2
+        assert client.rate_limiter.tokens.capacity == 60000 and client.rate_limiter.requests.rate == 10
+
+    def test_client_errors_are_not_retried(self, settings):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(400, json={"error": {"message": "bad request"}})
+
+        async def run():
+            client = self.make_client(settings, handler)
+            try:
+                await client.request_agent("system", "user", {})
+            finally:
+                await client.aclose()
+
+        with pytest.raises(openai.BadRequestError):
+            asyncio.run(run())
+        assert len(calls) == 1
+
+    def test_concurrency_is_capped(self, settings):
+        in_flight = {"now": 0, "max": 0}
+
+        async def handler(request):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return httpx.Response(200, json=completion('{"category": "work"}'))
+
+        async def run():
+            client = self.make_client(settings, handler)
+            try:
+                return await asyncio.gather(*(client.request_agent("system", f"message {i}", {}) for i in range(12)))
+            finally:
+                await client.aclose()
+
+        assert len(asyncio.run(run())) == 12
+        assert in_flight["max"] == 3
+
+    def test_rate_limiter_waits_when_quota_is_exhausted(self):
+        async def run():
+            limiter = AdaptiveRateLimiter()
+            limiter.update_from_headers({
+                "x-ratelimit-limit-requests": "6000", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "50ms",
+            })
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await limiter.acquire(10)
+            return loop.time() - start
+
+        assert asyncio.run(run()) >= 0.04
+
+    def test_async_classification_service(self, settings):
+        def handler(request):
+            body = json.loads(request.content)
+            if "category_agent" in body["messages"][0]["content"]:
+                return httpx.Response(200, json=completion('{"category": "meeting"}'))
+            return httpx.Response(200, json=completion('{"entities": [{"entity_type": "PROJECT", "entity_value": "Alpha"}]}'))
+
+        async def run():
+            client = self.make_client(settings, handler)
+            try:
+                service = AsyncClassificationService(AsyncAgentService(client))
+                return await service.classify(content_data="Alpha sync on Friday", subject="Sync")
+            finally:
+                await client.aclose()
+
+        category, entities = asyncio.run(run())
+        assert category == "meeting"
+        assert [entity.entity_value for entity in entities] == ["Alpha"]
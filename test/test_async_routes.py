@@ -0,0 +1,193 @@
+import pytest
+from datetime import datetime
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from models import Base, Content, ContentType, Source, Category, Entity, EntityType
+from deps import get_async_db
+from routes.content_table_router import router as content_table_router
+
+
+class TestAsyncContentRoutes:
+    """Test the content routes running on the async session."""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        path = tmp_path / "routes.db"
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        content = Content(
+            id='content-1', source_id='email_001', content_type=ContentType.TEXT,
+            content_data='Meeting about project Alpha', source=Source.EMAIL,
+            category=Category.MEETING, subject='Alpha', timestamp=datetime(2025, 6, 1, 12, 0)
+        )
+        session.add(content)
+        session.commit()
+        session.add(Entity(content_id='content-1', entity_type=EntityType.PROJECT, entity_value='Alpha'))
+        session.commit()
+        session.close()
+        engine.dispose()
+        return path
+
+    @pytest.fixture
+    def client(self, db_path):
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def override_get_async_db():
+            async with AsyncSessionLocal() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(content_table_router)
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        return TestClient(app)
+
+    def test_get_public_summary(self, client):
+        response = client.get("/contents/")
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body) == 1
+        assert body[0]['entities'][0]['entity_value'] == 'Alpha'
+
+    def test_get_content_by_id(self, client):
+        response = client.get("/contents/content-1")
+        assert response.status_code == 200
+        assert response.json()['source_id'] == 'email_001'
+
+    def test_get_content_by_id_not_found(self, client):
+        response = client.get("/contents/missing")
+        assert response.status_code == 404
+
+    def test_search_query(self, client):
+        response = client.post("/contents/search_query", json={"keywords": ["alpha"], "source": "email"})
+        assert response.status_code == 200
+        assert [item['id'] for item in response.json()] == ['content-1']
+
+        response = client.post("/contents/search_query", json={"source": "telegram"})
+        assert response.json() == []
+
+    def test_create_content_and_duplicate(self, client):
+        payload = {
+            "source_id": "manual_1",
+            "content_type": "text",
+            "content_data": "Write the quarterly report",
+            "source": "email",
+            "category": "task",
+            "subject": "Report",
+            "timestamp": "2025-06-02T09:00:00"
+        }
+        response = client.post("/contents/create", json=payload)
+        assert response.status_code == 200
+        assert response.json()['created_at'] is not None
+
+        duplicate = client.post("/contents/create", json=payload)
+        assert duplicate.status_code == 400
+
+    def test_create_entity(self, client):
+        response = client.post(
+            "/contents/entities/create",
+            json={"content_id": "content-1", "entity_type": "KEYWORD", "entity_value": "budget"}
+        )
+        assert response.status_code == 200
+        assert response.json()['entity_type'] == 'KEYWORD'
+
+        missing = client.post(
+            "/contents/entities/create",
+            json={"content_id": "missing", "entity_type": "KEYWORD", "entity_value": "budget"}
+        )
+        assert missing.status_code == 404
+
+    def test_get_public_summary_conditional_get(self, client):
+        first = client.get("/contents/")
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')
+        assert "last-modified" in first.headers
+
+        not_modified = client.get("/contents/", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+
+        by_date = client.get("/contents/", headers={"If-Modified-Since": first.headers["last-modified"]})
+        assert by_date.status_code == 304
+
+    def test_etag_changes_when_entities_change(self, client):
+        etag = client.get("/contents/").headers["etag"]
+        item_etag = client.get("/contents/content-1").headers["etag"]
+
+        client.post(
+            "/contents/entities/create",
+            json={"content_id": "content-1", "entity_type": "KEYWORD", "entity_value": "budget"}
+        )
+
+        refreshed = client.get("/contents/", headers={"If-None-Match": etag})
+        assert refreshed.status_code == 200
+        assert refreshed.headers["etag"] != etag
+        item = client.get("/contents/content-1", headers={"If-None-Match": item_etag})
+        assert item.status_code == 200
+        assert len(item.json()['entities']) == 2
+
+    def test_etag_changes_when_a_content_is_updated_within_the_same_second(self, client, db_path):
+        etag = client.get("/contents/").headers["etag"]
+        engine = create_engine(f"sqlite:///{db_path}")
+        session = sessionmaker(bind=engine)()
+        content = session.get(Content, 'content-1')
+        for category in (Category.TASK, Category.MEETING):
+            # back to the same category, usually within the second the row was written in: only the revision moves
+            content.category = category
+            session.commit()
+        assert content.revision == 3
+        session.close()
+        engine.dispose()
+
+        refreshed = client.get("/contents/", headers={"If-None-Match": etag})
+        assert refreshed.status_code == 200 and refreshed.headers["etag"] != etag
+
+    def test_get_content_by_id_conditional_get(self, client):
+        etag = client.get("/contents/content-1").headers["etag"]
+        response = client.get("/contents/content-1", headers={"If-None-Match": f'"other", {etag}'})
+        assert response.status_code == 304
+
+    def test_bulk_create_contents(self, client):
+        def item(source_id, source="email", **extra):
+            return {
+                "source_id": source_id, "content_type": "text", "content_data": f"message {source_id}",
+                "source": source, "category": "task", "timestamp": "2025-06-02T09:00:00", **extra
+            }
+        payload = {"items": [
+            item("bulk_1", entities=[{"entity_type": "project", "entity_value": "Migration"}]),
+            item("email_001"),
+            item("bulk_2", source="fax"),
+            item("bulk_1"),
+            # a client can't claim its categories came from the agent
+            item("bulk_3", source="telegram", category_provenance="llm" * 10),
+        ]}
+
+        response = client.post("/contents/bulk", json=payload)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert (body['created'], body['duplicates'], body['errors']) == (2, 2, 1)
+        assert [entry['status'] for entry in body['items']] == ['created', 'duplicate', 'error', 'duplicate', 'created']
+        created_id = body['items'][0]['id']
+        content = client.get(f"/contents/{created_id}").json()
+        assert content['entities'][0]['entity_value'] == 'Migration'
+        assert len(client.get("/contents/").json()) == 3
+        assert client.get(f"/contents/{body['items'][4]['id']}").json()['category_provenance'] is None
+
+    def test_bulk_create_contents_is_idempotent(self, client):
+        payload = {"items": [{
+            "source_id": "again", "content_type": "text", "content_data": "same", "source": "email",
+            "category": "other", "timestamp": "2025-06-02T09:00:00"
+        }]}
+        assert client.post("/contents/bulk", json=payload).json()['created'] == 1
+        assert client.post("/contents/bulk", json=payload).json()['duplicates'] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,116 @@
+import time
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, Content, ContentType, Source, Category, Entity, EntityType
+from repository.batch_writer import BatchWriter
+from services.message_service import MessageService
+
+
+def make_content(source_id: str) -> Content:
+    return Content(
+        source_id=source_id,
+        content_type=ContentType.TEXT,
+        content_data=f'message {source_id}',
+        source=Source.TELEGRAM,
+        category=Category.TASK,
+        timestamp=datetime.now()
+    )
+
+
+class TestBatchWriter:
+    """Test the write-behind batch writer."""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        return sessionmaker(bind=engine, expire_on_commit=False)
+
+    def count(self, session_factory, model) -> int:
+        session = session_factory()
+        try:
+            return session.query(model).count()
+        finally:
+            session.close()
+
+    def test_flush_when_max_rows_reached(self, session_factory):
+        writer = BatchWriter(session_factory, max_rows=3, max_delay_ms=60000)
+        writer.submit(make_content('1'), [Entity(entity_type=EntityType.KEYWORD, entity_value='a')])
+        writer.submit(make_content('2'))
+        assert self.count(session_factory, Content) == 0
+        assert writer.is_pending('1', Source.TELEGRAM)
+
+        writer.submit(make_content('3'))
+
+        assert self.count(session_factory, Content) == 3
+        assert self.count(session_factory, Entity) == 1
+        assert writer.pending_count() == 0
+        assert not writer.is_pending('1', Source.TELEGRAM)
+        writer.close()
+
+    def test_flush_after_max_delay(self, session_factory):
+        writer = BatchWriter(session_factory, max_rows=100, max_delay_ms=50)
+        writer.submit(make_content('1'))
+
+        deadline = time.monotonic() + 5
+        while self.count(session_factory, Content) == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        assert self.count(session_factory, Content) == 1
+        writer.close()
+
+    def test_close_flushes_remaining_rows(self, session_factory):
+        writer = BatchWriter(session_factory, max_rows=100, max_delay_ms=60000)
+        writer.submit(make_content('1'))
+        writer.close()
+
+        assert self.count(session_factory, Content) == 1
+        with pytest.raises(RuntimeError):
+            writer.submit(make_content('2'))
+
+    def test_duplicates_are_skipped_and_reported(self, session_factory):
+        flushed = []
+        writer = BatchWriter(session_factory, max_rows=100, max_delay_ms=60000, on_flushed=flushed.extend)
+        writer.submit(make_content('1'))
+        assert writer.flush() == 1
+
+        writer.submit(make_content('1'), [Entity(entity_type=EntityType.KEYWORD, entity_value='dup')])
+        writer.submit(make_content('2'))
+        assert writer.flush() == 1
+
+        assert [content.source_id for content in flushed] == ['1', '2']
+        assert self.count(session_factory, Content) == 2
+        assert self.count(session_factory, Entity) == 0
+        writer.close()
+
+    def test_message_service_uses_writer(self, session_factory):
+        writer = BatchWriter(session_factory, max_rows=100, max_delay_ms=60000)
+        message_service = MessageService(session_factory(), batch_writer=writer)
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'meeting'
+        message_service.classification_service.extract_entities.return_value = []
+        message_service.embedding_service = Mock()
+        update = {
+            "update_id": 1,
+            "message": {"message_id": 42, "from": {"id": 1}, "chat": {"id": 1}, "date": 1750635741, "text": "hi"}
+        }
+
+        content = message_service.process_message('telegram', update)
+        assert content.id is not None
+        assert message_service.process_message('telegram', update) is None
+        assert self.count(session_factory, Content) == 0
+        message_service.embedding_service.index_content.assert_not_called()
+
+        message_service.flush_pending()
+
+        assert self.count(session_factory, Content) == 1
+        message_service.embedding_service.index_content.assert_called_once()
+        assert message_service.classification_service.extract_category.call_count == 1
+        writer.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,94 @@
+import io
+import json
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from models import Base, Content, ContentType, Source, Category, Entity
+from repository.bulk_loader import _CsvStream, ExecutemanyLoader, get_bulk_loader, load_items, BulkLoadReport
+from schemas.schemas import BulkContentItem
+from clients.embedding_client import HashingEmbeddingClient
+from repository.vector_index import VectorIndex
+from services.embedding_service import EmbeddingService
+from scripts.backfill_contents import read_items
+
+
+def make_item(source_id, source="email", **extra):
+    return BulkContentItem(
+        source_id=source_id, content_type="text", content_data=f"message {source_id}",
+        source=source, category="task", timestamp=datetime(2025, 6, 2, 9, 0), **extra
+    )
+
+
+class TestBulkLoader:
+    """Test the backfill bulk loader (SQLite executemany path and the COPY CSV stream)."""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        session.add(Content(
+            source_id='email_001', content_type=ContentType.TEXT, content_data='already stored',
+            source=Source.EMAIL, category=Category.OTHER, timestamp=datetime(2025, 6, 1)
+        ))
+        session.commit()
+        session.close()
+        return sessionmaker(bind=engine)
+
+    def test_sqlite_uses_executemany_loader(self, session_factory):
+        engine = session_factory.kw['bind']
+        assert isinstance(get_bulk_loader(engine, session_factory), ExecutemanyLoader)
+
+    def test_load_items_skips_duplicates_and_invalid(self, session_factory):
+        items = [
+            make_item("bulk_1", entities=[{"entity_type": "project", "entity_value": "Migration"}]),
+            make_item("email_001"),
+            make_item("bulk_2", source="fax"),
+            make_item("bulk_1"),
+            make_item("bulk_3", source="telegram"),
+        ]
+        batches = []
+
+        report = load_items(ExecutemanyLoader(session_factory), items, batch_size=2,
+                            on_batch=lambda progress: batches.append(progress.inserted))
+
+        assert (report.read, report.inserted, report.skipped, report.invalid, report.entities) == (5, 2, 2, 1, 1)
+        assert batches == [1, 2]
+        session = session_factory()
+        assert session.scalar(select(func.count()).select_from(Content)) == 3
+        assert session.scalar(select(Entity.entity_value)) == 'Migration'
+        session.close()
+
+    def test_load_items_indexes_the_inserted_contents(self, session_factory, tmp_path):
+        embedding_service = EmbeddingService(HashingEmbeddingClient(dimension=64), VectorIndex(str(tmp_path / "index"), 64))
+        items = [make_item("bulk_1"), make_item("email_001"), make_item("bulk_2")]
+
+        load_items(ExecutemanyLoader(session_factory), items, batch_size=2, embedding_service=embedding_service)
+
+        session = session_factory()
+        stored = dict(session.execute(select(Content.source_id, Content.id)).all())
+        session.close()
+        assert len(embedding_service.vector_index) == 2
+        assert embedding_service.semantic_search("message bulk_2", top_k=1)[0][0] == stored["bulk_2"]
+
+    def test_read_items_counts_bad_lines(self):
+        report = BulkLoadReport()
+        lines = io.StringIO(
+            json.dumps({"source_id": "a", "content_type": "text", "content_data": "x", "source": "email",
+                        "category": "task", "timestamp": "2025-06-02T09:00:00", "id": "ignored", "entities": []})
+            + "\n\n{\"source_id\": \"b\"}\n"
+        )
+        items = list(read_items(lines, report))
+        assert [item.source_id for item in items] == ['a']
+        assert report.invalid == 1
+
+    def test_csv_stream_keeps_nulls_and_empty_strings_apart(self):
+        rows = [{'id': 'a', 'content_data': '', 'content_html': None, 'subject': 'x, "y"\nz',
+                 'timestamp': datetime(2025, 1, 1)}]
+        stream = io.BufferedReader(_CsvStream(rows, ['id', 'content_data', 'content_html', 'subject', 'timestamp']))
+        assert stream.read() == b'"a","",,"x, ""y""\nz","2025-01-01T00:00:00"\n'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
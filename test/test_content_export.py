@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import Base, Content, ContentType, Source, Category, Entity, EntityType
+from repository.content_repository import ContentRepository
+from routes.content_table_router import router as content_table_router
+from schemas.schemas import SearchQuery
+
+
+class TestContentExport:
+    """Test the streaming NDJSON/CSV export."""
+
+    @pytest.fixture
+    def session_factory(self):
+        engine = create_engine(
+            "sqlite:///:memory:",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+        session = SessionLocal()
+        meeting = Content(
+            source_id='email_001', content_type=ContentType.TEXT, content_data='Meeting about project Alpha',
+            source=Source.EMAIL, category=Category.MEETING, subject='Alpha, "kickoff"',
+            timestamp=datetime.now() - timedelta(days=2)
+        )
+        spam = Content(
+            source_id='telegram_001', content_type=ContentType.TEXT, content_data='Win the lottery\nnow',
+            source=Source.TELEGRAM, category=Category.SPAM, timestamp=datetime.now() - timedelta(days=1)
+        )
+        session.add_all([meeting, spam])
+        session.commit()
+        session.add(Entity(content_id=meeting.id, entity_type=EntityType.PROJECT, entity_value='Alpha'))
+        session.commit()
+        session.close()
+        return SessionLocal
+
+    @pytest.fixture
+    def client(self, session_factory):
+        app = FastAPI()
+        app.include_router(content_table_router)
+        with patch('routes.content_table_router.SessionLocal', session_factory):
+            yield TestClient(app)
+
+    def test_iter_contents_streams_in_timestamp_order(self, session_factory):
+        session = session_factory()
+        contents = list(ContentRepository(session).iter_contents(batch_size=1))
+        assert [content.source_id for content in contents] == ['email_001', 'telegram_001']
+        assert contents[0].entities[0].entity_value == 'Alpha'
+        session.close()
+
+    def test_iter_contents_applies_search_query(self, session_factory):
+        session = session_factory()
+        contents = list(ContentRepository(session).iter_contents(SearchQuery(source='telegram')))
+        assert [content.source_id for content in contents] == ['telegram_001']
+        session.close()
+
+    def test_export_ndjson(self, client):
+        response = client.get("/contents/export")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row['source_id'] for row in rows] == ['email_001', 'telegram_001']
+        assert rows[0]['entities'][0]['entity_value'] == 'Alpha'
+        assert rows[1]['content_data'] == 'Win the lottery\nnow'
+
+    def test_export_csv_with_filters(self, client):
+        response = client.get("/contents/export", params={"format": "csv", "keywords": ["Alpha"]})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 1
+        assert rows[0]['subject'] == 'Alpha, "kickoff"'
+        assert json.loads(rows[0]['entities']) == [{'entity_type': 'PROJECT', 'entity_value': 'Alpha'}]
+
+    def test_export_rejects_unknown_format(self, client):
+        response = client.get("/contents/export", params={"format": "xml"})
+        assert response.status_code == 422
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -7,6 +7,10 @@ from sqlalchemy.orm import sessionmaker
 os.environ["SQL_URI"] = "sqlite:///./test.db"
 
 from db import Base
+from utils.sqlite_profile import apply_sqlite_profile, optimize_sqlite, sqlite_profile_from_config, DEFAULT_SQLITE_PROFILE
+from utils.text_compression import compress_text, decompress_text, is_compressed, DEFAULT_TEXT_COMPRESSION
+from models import Content, ContentType, Source, Category
+from datetime import datetime
 
 @pytest.fixture
 def db_session():
@@ -43,5 +47,115 @@ def test_database_connection_flow(db_session):
     except Exception as e:
         pytest.fail(f"Database connection flow failed: {e}")
 
+def test_sqlite_profile_applied_on_every_connection(tmp_path):
+    """Test that the SQLite profile PRAGMAs are set by the connect event"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    apply_sqlite_profile(engine, DEFAULT_SQLITE_PROFILE)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert connection.execute(text("PRAGMA cache_size")).scalar() == -65536
+        assert connection.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+    optimize_sqlite(engine)
+
+
+def test_sqlite_profile_can_be_disabled(tmp_path):
+    """Test that a disabled profile leaves SQLite defaults untouched"""
+    profile = sqlite_profile_from_config({"sqlite_profile": {"enabled": False}})
+    engine = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+    apply_sqlite_profile(engine, profile)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar().lower() == "delete"
+
+def _large_html():
+    return "<html><body>" + "<p>Quarterly report for project Alpha, see the attached numbers.</p>" * 200 + "</body></html>"
+
+
+def test_compressed_text_round_trip_and_legacy_rows(db_session):
+    """Test that big text columns are stored compressed and plain (legacy) rows still read"""
+    html = _large_html()
+    db_session.add(Content(
+        id='big', source_id='email_big', content_type=ContentType.TEXT, content_data='short body',
+        content_html=html, source=Source.EMAIL, category=Category.OTHER, timestamp=datetime(2025, 6, 1)
+    ))
+    db_session.commit()
+    db_session.execute(text(
+        "INSERT INTO content (id, source_id, content_type, category, content_data, content_html, source, timestamp) "
+        "VALUES ('legacy', 'email_legacy', 'text', 'other', 'plain legacy body', :html, 'email', '2025-06-01 00:00:00')"
+    ), {"html": html})
+    db_session.commit()
+
+    stored_html, stored_data = db_session.execute(
+        text("SELECT content_html, content_data FROM content WHERE id = 'big'")
+    ).one()
+    assert is_compressed(stored_html) and len(stored_html) < len(html) / 5
+    assert stored_data == 'short body'  # below the threshold
+
+    db_session.expire_all()
+    assert db_session.get(Content, 'big').content_html == html
+    assert db_session.get(Content, 'legacy').content_html == html
+    assert db_session.get(Content, 'legacy').content_data == 'plain legacy body'
+
+
+def test_compress_text_keeps_small_and_incompressible_values():
+    """Test the threshold and that compression never makes a value bigger"""
+    settings = {**DEFAULT_TEXT_COMPRESSION, "threshold_bytes": 16}
+    assert compress_text("tiny", settings) == "tiny"
+    random_text = os.urandom(600).hex()[:40]
+    assert compress_text(random_text, settings) == random_text
+    assert compress_text(_large_html(), {**settings, "enabled": False}) == _large_html()
+    assert decompress_text(compress_text(_large_html(), settings)) == _large_html()
+
+
+def test_marker_prefixed_text_round_trips(db_session):
+    """Test that plain text starting with the compression marker is escaped, and an undecodable value still reads"""
+    for value in ("\x1fZz:hello", "\x1fZp:hi", "\x1fZ" + _large_html()):
+        assert decompress_text(compress_text(value)) == value
+        assert decompress_text(compress_text(value, {**DEFAULT_TEXT_COMPRESSION, "enabled": False})) == value
+
+    db_session.add(Content(
+        id='marker', source_id='email_marker', content_type=ContentType.TEXT, content_data='\x1fZz:hello',
+        source=Source.EMAIL, category=Category.OTHER, timestamp=datetime(2025, 6, 1)
+    ))
+    db_session.execute(text(
+        "INSERT INTO content (id, source_id, content_type, category, content_data, source, timestamp) "
+        "VALUES ('raw', 'email_raw', 'text', 'other', :data, 'email', '2025-06-01 00:00:00')"
+    ), {"data": "\x1fZz:not compressed"})
+    db_session.commit()
+    db_session.expire_all()
+    assert db_session.get(Content, 'marker').content_data == '\x1fZz:hello'
+    assert {content.content_data for content in db_session.query(Content).all()} == {'\x1fZz:hello', '\x1fZz:not compressed'}
+
+
+def test_compression_migration_rewrites_rows_in_batches(db_session, monkeypatch):
+    """Test the migration compresses existing rows on upgrade and restores them on downgrade"""
+    import importlib.util
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions", "3f1c7a9d2e45_compress_large_text_columns.py")
+    spec = importlib.util.spec_from_file_location("compress_large_text_columns", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    monkeypatch.setattr(migration, "BATCH_SIZE", 2)
+
+    html = _large_html()
+    for index in range(5):
+        db_session.execute(text(
+            "INSERT INTO content (id, source_id, content_type, category, content_data, content_html, source, timestamp) "
+            "VALUES (:id, :id, 'text', 'other', 'body', :html, 'email', '2025-06-01 00:00:00')"
+        ), {"id": f"row-{index}", "html": html})
+    db_session.commit()
+
+    connection = db_session.connection()
+    with Operations.context(MigrationContext.configure(connection)):
+        migration.upgrade()
+        stored = connection.execute(text("SELECT content_html FROM content")).scalars().all()
+        assert len(stored) == 5 and all(is_compressed(value) for value in stored)
+        migration.downgrade()
+        stored = connection.execute(text("SELECT content_html FROM content")).scalars().all()
+        assert stored == [html] * 5
+
+
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"]) 
\ No newline at end of file
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,195 @@
+import json
+import os
+import httpx
+import openai
+import pytest
+from unittest.mock import Mock, patch
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from clients.async_openai_client import is_retryable
+from models import Base, Category, ClassificationState, Content, Entity
+from services.agent_service import LLMUnavailableError
+from services.classification_service import ClassificationService
+from services.message_service import MessageService
+from services.pending_reclassifier import PendingReclassifier
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from sources.email.fake_gmail import load_eml_fixtures, eml_to_gmail_message
+
+
+def connection_error() -> openai.APIConnectionError:
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    """Test the closed / open / half open transitions."""
+
+    def test_opens_after_consecutive_failures_and_probes_after_timeout(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=10, clock=clock)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                with breaker.guard():
+                    raise RuntimeError("timeout")
+        assert breaker.state == "open" and breaker.is_open()
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                pass
+
+        clock.now = 10
+        assert not breaker.is_open()
+        assert breaker.allow_request() and not breaker.allow_request()  # a single probe
+        breaker.record_failure()
+        assert breaker.state == "open" and breaker.opens == 2
+
+        clock.now = 20
+        with breaker.guard():
+            pass
+        assert breaker.snapshot() == {'state': 'closed', 'consecutive_failures': 0, 'opens': 2, 'rejected_calls': 2}
+
+    def test_only_outage_errors_count(self):
+        breaker = CircuitBreaker(failure_threshold=1, is_failure=is_retryable)
+        with pytest.raises(ValueError):
+            with breaker.guard():
+                raise ValueError("bad json")
+        assert breaker.state == "closed"
+        with pytest.raises(openai.APIConnectionError):
+            with breaker.guard():
+                raise connection_error()
+        assert breaker.state == "open"
+
+    def test_sync_client_does_not_retry_behind_the_breaker(self):
+        from clients.openai_client import OpenAIClient
+        with patch('clients.openai_client.OpenAI') as openai_class:
+            OpenAIClient()
+        assert openai_class.call_args.kwargs["max_retries"] == 0
+
+
+class TestDeferredClassification:
+    """Test that messages are stored as pending while the LLM is down and classified once it is back."""
+
+    @pytest.fixture
+    def message_service(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        with patch('services.agent_service.OpenAIClient'):
+            message_service = MessageService(sessionmaker(bind=engine)(), near_duplicate_mode="off")
+            message_service.classification_service = ClassificationService()
+        agent_service = message_service.classification_service.agent_service
+        agent_service.circuit_breaker = CircuitBreaker(1, 60, is_failure=is_retryable)
+        agent_service.openai_client.request_agent.side_effect = connection_error()
+        message_service.pre_classifier.enabled = False
+        message_service.embedding_service = Mock()
+        with patch.object(message_service.local_classifier, 'classify', return_value=None):
+            yield message_service
+
+    def answer(self, message_service):
+        def request_agent(system_prompt, user_message, output_schema, agent_name):
+            if agent_name == "category_agent":
+                return json.dumps({"category": "task"})
+            return json.dumps({"entities": [{"entity_type": "PERSON", "entity_value": "Alice"}]})
+        message_service.classification_service.agent_service.openai_client.request_agent.side_effect = request_agent
+
+    def test_outage_stores_pending_without_waiting(self, message_service):
+        fixtures = load_eml_fixtures()
+        agent_service = message_service.classification_service.agent_service
+        first = message_service.process_message('email', eml_to_gmail_message(fixtures["01_plain_ascii.eml"], "outage-1"))
+        assert first.classification_state == ClassificationState.PENDING and first.category == Category.OTHER
+        assert first.category_provenance is None
+        assert agent_service.circuit_breaker.state == "open"
+
+        calls = agent_service.openai_client.request_agent.call_count
+        second = message_service.process_message('email', eml_to_gmail_message(fixtures["04_html_only_newsletter.eml"], "outage-2"))
+        assert second.classification_state == ClassificationState.PENDING
+        assert agent_service.openai_client.request_agent.call_count == calls  # rejected by the open circuit
+
+    def test_reclassifier_drains_pending_once_the_circuit_closes(self, message_service):
+        fixtures = load_eml_fixtures()
+        for index, name in enumerate(["01_plain_ascii.eml", "04_html_only_newsletter.eml", "05_windows1252_reply.eml"]):
+            message_service.process_message('email', eml_to_gmail_message(fixtures[name], f"pending-{index}"))
+        reclassifier = PendingReclassifier(message_service, batch_size=2, sleep_time=0)
+        assert reclassifier.run_once() == 0  # circuit still open, nothing is tried
+
+        self.answer(message_service)
+        message_service.classification_service.agent_service.circuit_breaker.reset()
+        assert reclassifier.run_once() == 2
+        assert reclassifier.run_once() == 1
+        assert message_service.content_repository.get_pending_contents(10) == []
+
+        db = message_service.db
+        assert {(content.category, content.category_provenance) for content in db.query(Content)} == {(Category.TASK, "llm")}
+        assert db.query(Entity).filter(Entity.entity_value == "Alice").count() == 3
+
+    def test_reclassifier_stops_when_the_llm_fails_again(self, message_service):
+        fixtures = load_eml_fixtures()
+        message_service.process_message('email', eml_to_gmail_message(fixtures["01_plain_ascii.eml"], "still-down"))
+        message_service.classification_service.agent_service.circuit_breaker.reset()
+        assert message_service.reclassify_pending(10) == 0
+        assert len(message_service.content_repository.get_pending_contents(10)) == 1
+
+    def test_bad_answer_still_falls_back_to_other(self, message_service):
+        message_service.classification_service.agent_service.openai_client.request_agent.side_effect = ValueError("bad request")
+        content = message_service.process_message(
+            'email', eml_to_gmail_message(load_eml_fixtures()["01_plain_ascii.eml"], "bad-answer")
+        )
+        assert content.classification_state == ClassificationState.CLASSIFIED and content.category == Category.OTHER
+
+    def test_agent_service_raises_llm_unavailable(self, message_service):
+        agent_service = message_service.classification_service.agent_service
+        with pytest.raises(LLMUnavailableError):
+            agent_service.run_agent("category_agent", {"content_data": "hello"})
+
+    def test_async_classification_raises_llm_unavailable(self):
+        import asyncio
+        from services.async_agent_service import AsyncAgentService
+        from services.async_classification_service import AsyncClassificationService
+        client = Mock()
+        client.request_agent.side_effect = connection_error()
+        agent_service = AsyncAgentService(client)
+        agent_service.circuit_breaker = CircuitBreaker(1, 60, is_failure=is_retryable)
+        service = AsyncClassificationService(agent_service)
+        for extract in (service.extract_category, service.extract_entities):
+            with pytest.raises(LLMUnavailableError):
+                asyncio.run(extract(content_data="hello"))
+        assert agent_service.circuit_breaker.state == "open"
+
+    def test_migration_adds_classification_state(self):
+        import importlib.util
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+        path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions", "d7f3b5a91c28_add_content_classification_state.py")
+        spec = importlib.util.spec_from_file_location("add_content_classification_state", path)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE content (id VARCHAR(36) PRIMARY KEY, content_data TEXT NOT NULL)"))
+            connection.execute(text("INSERT INTO content (id, content_data) VALUES ('old', 'body')"))
+            with Operations.context(MigrationContext.configure(connection)):
+                migration.upgrade()
+                assert connection.execute(text("SELECT classification_state FROM content")).scalar() == "classified"
+                migration.downgrade()
+                columns = [row[1] for row in connection.execute(text("PRAGMA table_info(content)"))]
+                assert 'classification_state' not in columns
+
+    def test_archive_import_marks_items_pending(self):
+        from datetime import datetime
+        from repository.bulk_loader import bulk_item_rows
+        from schemas.schemas import ArchiveContentItem
+        from sources.email.mail_archive import MailArchiveImporter
+        message_service = Mock()
+        message_service.decide_category.side_effect = LLMUnavailableError("circuit open")
+        item = ArchiveContentItem(source_id="archived-1", content_type="text", content_data="body", source="email",
+                               category="other", timestamp=datetime(2025, 6, 1))
+        parsed = {'sender': 'ana@example.com', 'headers': {}, 'mime_types': ['text/plain']}
+        MailArchiveImporter(workers=1, message_service=message_service)._classify(item, parsed)
+        content_row, entity_rows = bulk_item_rows(item)
+        assert (content_row['classification_state'], content_row['category'], entity_rows) == ("pending", "other", [])
@@ -212,5 +212,45 @@ class TestEmailPoller(unittest.TestCase):
         poller_without_service = EmailPoller(Mock())
         self.assertIsInstance(poller_without_service, EmailPoller)
 
+    @patch('sources.email.email_poller.config')
+    def test_fetch_message_format_depends_on_size(self, mock_config):
+        """Small messages are fetched as full, big ones as raw."""
+        mock_config.config_json = {**self.mock_config.config_json, "email_raw_fetch_threshold_bytes": 1000}
+        mock_service = Mock()
+        get = mock_service.users.return_value.messages.return_value.get
+        poller = EmailPoller(self.mock_message_service)
+        poller.service = mock_service
+
+        poller.fetch_message("small", 500)
+        self.assertEqual(get.call_args[1]['format'], 'full')
+        poller.fetch_message("unknown", None)
+        self.assertEqual(get.call_args[1]['format'], 'full')
+        poller.fetch_message("big", 5000)
+        self.assertEqual(get.call_args[1]['format'], 'raw')
+
+    @patch('sources.email.email_poller.config')
+    def test_fetch_size_estimates_uses_one_minimal_batch(self, mock_config):
+        """Sizes come from one batched format='minimal' request."""
+        mock_config.config_json = self.mock_config.config_json
+        mock_service = Mock()
+        get = mock_service.users.return_value.messages.return_value.get
+        mock_batch = Mock()
+
+        def new_batch(callback):
+            mock_batch.execute.side_effect = lambda: [
+                callback("msg1", {"id": "msg1", "sizeEstimate": 1200}, None),
+                callback("msg2", None, Exception("not found")),
+            ]
+            return mock_batch
+        mock_service.new_batch_http_request.side_effect = new_batch
+        poller = EmailPoller(self.mock_message_service)
+        poller.service = mock_service
+
+        sizes = poller.fetch_size_estimates(["msg1", "msg2"])
+
+        self.assertEqual(sizes, {"msg1": 1200})
+        self.assertEqual(mock_batch.add.call_count, 2)
+        self.assertEqual(get.call_args[1]['format'], 'minimal')
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
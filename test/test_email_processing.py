@@ -1,10 +1,16 @@
+import base64
 import pytest
+from email.message import EmailMessage
 from unittest.mock import Mock, patch
 from datetime import datetime
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from models import Base, Content, ContentType, Source
+from models import Base, Content, ContentType, Source, Category, Entity, EntityType
 from message_parsers.email.email_text_parser import EmailTextParser
+from message_parsers.email.streaming_mime_parser import StreamingMimeParser
+from sources.email.fake_gmail import load_eml_fixtures, eml_to_gmail_message
+from message_parsers.email.html_reducer import html_to_text
+from utils.token_count import estimate_tokens
 from services.message_service import MessageService
 from repository.content_repository import ContentRepository
 
@@ -191,6 +197,153 @@ class TestEmailProcessing:
         assert parsed_data['content_data']['content_data'] == 'Empty email content'
         assert parsed_data['content_data']['content_html'] == ''
     
+    def test_parser_handles_raw_format_with_attachment(self):
+        """Test that a format='raw' message is stream parsed: nested text part found, attachment skipped."""
+        message = EmailMessage()
+        message['Subject'] = 'Héllo quarterly report'
+        message['From'] = 'boss@example.com'
+        message.set_content('Please review the attached report ünïcode')
+        message.add_alternative('<p>Please review the attached report</p>', subtype='html')
+        message.add_attachment(b'\x00' * 200000, maintype='application', subtype='octet-stream', filename='report.bin')
+        raw_email = {
+            'id': 'raw123',
+            'internalDate': '1750604461000',
+            'snippet': 'Please review',
+            'sizeEstimate': 300000,
+            'raw': base64.urlsafe_b64encode(message.as_bytes()).decode(),
+        }
+        
+        parsed_data = EmailTextParser().parse(raw_email)
+        
+        assert parsed_data['content_data']['subject'] == 'Héllo quarterly report'
+        assert parsed_data['content_data']['content_data'] == 'Please review the attached report ünïcode\n'
+        # stopped after the first text part, the html alternative after it was never read
+        assert parsed_data['content_data']['content_html'] == ''
+    
+    def test_streaming_parser_keeps_html_fallback(self):
+        """Test that an html-only raw message still yields its html part."""
+        message = EmailMessage()
+        message['Subject'] = 'Newsletter'
+        message.set_content('<h1>Caf\xe9 news</h1>', subtype='html', charset='iso-8859-1')
+        
+        mime = StreamingMimeParser().parse(base64.urlsafe_b64encode(message.as_bytes()).decode())
+        
+        assert mime.plain is None
+        assert mime.html.text.strip() == '<h1>Café news</h1>'
+        assert mime.html.charset == 'iso-8859-1'
+    
+    @pytest.mark.parametrize("fixture_name", sorted(load_eml_fixtures()))
+    def test_full_and_raw_formats_agree_on_eml_fixtures(self, fixture_name):
+        """Test that the MIME walker (full) and the streaming parser (raw) pick the same text part."""
+        eml = load_eml_fixtures()[fixture_name]
+        parser = EmailTextParser()
+        
+        full = parser.parse(eml_to_gmail_message(eml, fixture_name, "full"))['content_data']
+        raw = parser.parse(eml_to_gmail_message(eml, fixture_name, "raw"))['content_data']
+        
+        assert full['subject'] == raw['subject']
+        assert full['content_data'] == raw['content_data']
+    
+    def test_walker_finds_nested_text_part_and_honours_charset(self):
+        """Test multipart/mixed -> multipart/alternative nesting and a windows-1252 part."""
+        fixtures = load_eml_fixtures()
+        parser = EmailTextParser()
+        
+        nested = parser.parse(eml_to_gmail_message(fixtures['03_mixed_nested_attachment.eml'], 'n1'))['content_data']
+        assert nested['content_data'].startswith('Please find attached the Q2 invoice for project Alpha.')
+        assert nested['content_html'].startswith('<div>Please find attached')
+        
+        reply = parser.parse(eml_to_gmail_message(fixtures['05_windows1252_reply.eml'], 'n2'))['content_data']
+        assert reply['content_data'].startswith('Works for me \u2013 I\u2019ll dial in from the \u201cblue\u201d room.')
+        
+        latin1 = parser.parse(eml_to_gmail_message(fixtures['02_alternative_qp_latin1.eml'], 'n3'))['content_data']
+        assert 'La réunion sur le budget' in latin1['content_data']
+    
+    def test_decoded_bytes_are_capped(self):
+        """Test that a huge body is cut at the cap without a broken trailing character."""
+        body = ('é' * 5000).encode('utf-8')
+        big_email = {
+            'id': 'big123',
+            'internalDate': '1750604461000',
+            'snippet': '',
+            'payload': {
+                'mimeType': 'text/plain',
+                'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="utf-8"'}],
+                'body': {'size': len(body), 'data': base64.urlsafe_b64encode(body).decode()},
+            }
+        }
+        
+        content_data = EmailTextParser(max_decoded_bytes=1001).parse(big_email)['content_data']['content_data']
+        
+        assert content_data == 'é' * 500
+
+    def test_raw_format_streaming_parser_gets_the_cap(self):
+        """Test that a format='raw' body is decoded only up to the configured cap."""
+        message = EmailMessage()
+        message['Subject'] = 'Big'
+        message.set_content('é' * 5000)
+        raw_email = {'id': 'bigraw', 'internalDate': '1750604461000', 'snippet': '',
+                     'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
+        with patch('message_parsers.email.email_text_parser.StreamingMimeParser', wraps=StreamingMimeParser) as parser_class:
+            content_data = EmailTextParser(max_decoded_bytes=1001).parse(raw_email)['content_data']['content_data']
+
+        assert parser_class.call_args.kwargs['max_decoded_bytes'] == 1001
+        assert content_data == 'é' * 500
+    
+    def test_html_only_email_is_reduced_to_text(self):
+        """Test that an html-only email stores reduced text in content_data and keeps the original html."""
+        eml = load_eml_fixtures()['04_html_only_newsletter.eml']
+        
+        content_data = EmailTextParser().parse(eml_to_gmail_message(eml, 'nl1'))['content_data']
+        
+        assert content_data['content_data'] == (
+            'Release notes\n\nVersion 2.4 ships semantic search and faster exports.\n\n'
+            'Roadmap: bulk imports land in July.\nRead more'
+        )
+        assert content_data['content_html'].startswith('<!DOCTYPE html>')
+        assert estimate_tokens(content_data['content_data']) < estimate_tokens(content_data['content_html']) / 3
+    
+    def test_html_reduction_drops_quotes_signatures_and_pixels(self):
+        """Test the reduction of a Gmail style reply."""
+        html = (
+            '<html><head><style>p{color:red}</style></head><body><div dir="ltr">Sounds good, see you <b>Thursday</b>.'
+            '<br><br><div class="gmail_signature">Bob<br>CTO, Example</div></div>'
+            '<div class="gmail_quote"><div>On Mon, Jun 2 Alice wrote:</div><blockquote>Old text <div>nested</div>'
+            '</blockquote></div><img src="https://t.example/p.gif" width="1" height="1"><p>P.S. bring &amp; share</p>'
+            '</body></html>'
+        )
+        
+        assert html_to_text(html) == 'Sounds good, see you Thursday.\n\nP.S. bring & share'
+        assert html_to_text('<p>Thanks!</p><div id="divRplyFwdMsg">From: Alice</div><div>old thread</div>') == 'Thanks!'
+        assert html_to_text('<p>Done.</p><p>On Mon, 2 Jun 2025 Alice wrote:</p><p>old</p>') == 'Done.'
+
+    def test_html_reduction_resumes_after_unclosed_tags_in_a_quote(self):
+        """Test that an unclosed tag inside a skipped region doesn't hide the rest of the email."""
+        html = '<div>hello<blockquote><p>quoted</blockquote><p>after reply</p></div>'
+        assert html_to_text(html) == 'hello\nafter reply'
+        assert html_to_text('<div class="gmail_quote"><div><p>old<div>x</div></div></div><p>new') == 'new'
+
+    def test_html_reduction_separates_table_cells(self):
+        """Test that the cells of a table row don't run together."""
+        html = '<table><tr><th>Item</th><th>Price</th></tr><tr><td>Price</td><td>10</td></tr></table>'
+        assert html_to_text(html) == 'Item Price\n\nPrice 10'
+    
+    def test_classification_input_leaves_out_html(self, db_session, sample_gmail_data):
+        """Test that the agents get content_data but not the html copy of it."""
+        message_service = MessageService(db_session, near_duplicate_mode="off")
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'other'
+        message_service.classification_service.extract_entities.return_value = []
+        message_service.embedding_service = Mock()
+        
+        message_service.process_message('email', sample_gmail_data)
+        
+        classification_input = message_service.classification_service.extract_category.call_args[1]
+        assert 'content_html' not in classification_input
+        # cleaned once by the message service, the later stages skip it
+        assert classification_input['content_data'] == 'Test for the whole Json'
+    
     def test_database_uuid_generation(self, db_session):
         """Test that Content objects get UUID IDs generated by database."""
         repo = ContentRepository(db_session)
@@ -212,4 +365,36 @@ class TestEmailProcessing:
         # After saving, id should be a UUID
         assert saved_content.id is not None
         assert isinstance(saved_content.id, str)
-        assert len(saved_content.id) > 0 
\ No newline at end of file
+        assert len(saved_content.id) > 0
+    
+    def test_message_is_persisted_in_one_commit(self, db_session, sample_gmail_data):
+        """Content, category and entities are written by a single commit after classification."""
+        message_service = MessageService(db_session)
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'meeting'
+        message_service.classification_service.extract_entities.return_value = [
+            Entity(entity_type=EntityType.PROJECT, entity_value='Json')
+        ]
+        commits = []
+        event.listen(db_session, 'after_commit', lambda session: commits.append(session))
+        
+        result = message_service.process_message('email', sample_gmail_data)
+        
+        assert len(commits) == 1
+        db_content = db_session.query(Content).filter_by(source_id='197982890e12e974').first()
+        assert db_content.id == result.id
+        assert db_content.category == Category.MEETING
+        assert [entity.entity_value for entity in db_content.entities] == ['Json']
+    
+    def test_duplicate_message_skips_classification(self, db_session, sample_gmail_data):
+        """An already stored message is skipped before any agent call."""
+        message_service = MessageService(db_session)
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'task'
+        message_service.classification_service.extract_entities.return_value = []
+        
+        assert message_service.process_message('email', sample_gmail_data) is not None
+        assert message_service.process_message('email', sample_gmail_data) is None
+        
+        assert message_service.classification_service.extract_category.call_count == 1
+        assert db_session.query(Content).count() == 1
@@ -0,0 +1,87 @@
+import json
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from models import ContentType, Source
+from services.agent_service import AgentService, agent_usage_stats
+from services.example_selector import ExampleSelector
+
+EXAMPLES = [
+    {"input": {"content_data": "Meeting tomorrow at 3 PM to discuss the project", "subject": None}, "output": {"category": "meeting"}},
+    {"input": {"content_data": "Please complete the report by Friday", "subject": "Task Assignment"}, "output": {"category": "task"}},
+    {"input": {"content_data": "You won a free cruise, click here to claim your prize"}, "output": {"category": "spam"}},
+    {"user": {"content_data": "Idea: a mobile app that reminds you to water plants"}, "assistant": {"category": "idea"}},
+]
+
+
+class TestExampleSelector:
+    """Test the relevance based few-shot example selection."""
+
+    def test_most_similar_examples_first(self):
+        selector = ExampleSelector(EXAMPLES, top_k=2)
+        selected = selector.select({"content_data": "Claim your free prize now, click here", "subject": "You won"})
+        assert selected[0]["output"]["category"] == "spam"
+        assert len(selected) == 2
+        assert selector.select({"content_data": "app idea: remind me to water the plants"})[0]["assistant"]["category"] == "idea"
+
+    def test_without_top_k_every_example_is_kept(self):
+        assert ExampleSelector(EXAMPLES).select({"content_data": "anything"}) == EXAMPLES
+        assert ExampleSelector(EXAMPLES, top_k=10).select({"content_data": "anything"}) == EXAMPLES
+        assert ExampleSelector(EXAMPLES, top_k=0).select({"content_data": "anything"}) == []
+        assert ExampleSelector([], top_k=2).select({"content_data": "anything"}) == []
+
+
+class TestAgentPromptExamples:
+    """Test that the agent prompts only carry the selected examples and the saving is counted."""
+
+    @pytest.fixture
+    def agent_service(self):
+        agent_usage_stats.reset()
+        with patch('services.agent_service.OpenAIClient') as client_class:
+            client_class.return_value.request_agent.return_value = json.dumps({"category": "meeting"})
+            yield AgentService()
+        agent_usage_stats.reset()
+
+    def test_prompt_carries_top_k_examples(self, agent_service):
+        selector, all_examples_tokens = agent_service.load_example_selector("category_agent")
+        with open("ai_agents/category_agent/few_shot.json", encoding="utf-8") as f:
+            assert selector.top_k == json.load(f)["top_k"] < len(selector.examples)
+
+        agent_service.run_agent("category_agent", {"content_data": "Meeting tomorrow to discuss the project", "source": "email"})
+        _, user_message, _ = agent_service.openai_client.request_agent.call_args[0]
+        assert "Meeting tomorrow at 3 PM to discuss the project" in user_message
+        included = [example for example in selector.examples if example["input"]["content_data"] in user_message]
+        assert len(included) == selector.top_k
+
+        stats = agent_usage_stats.snapshot()["category_agent"]
+        assert stats["example_tokens_without_selection"] == all_examples_tokens
+        assert 0 < stats["example_tokens"] < all_examples_tokens
+        assert stats["example_token_reduction"] == pytest.approx(1 - stats["example_tokens"] / all_examples_tokens)
+
+    def test_selector_is_built_once_per_agent(self, agent_service):
+        first = agent_service.load_example_selector("entity_agent")
+        agent_service.create_agent_prompt("entity_agent", {"content_data": "call Bob tomorrow"})
+        assert agent_service.load_example_selector("entity_agent") is first
+
+    def test_system_prompt_is_a_byte_stable_prefix(self, agent_service):
+        first_input = {"content_data": "Meeting tomorrow", "subject": "Sync", "source": Source.EMAIL,
+                       "content_type": ContentType.TEXT, "timestamp": datetime(2025, 6, 1, 9, 30)}
+        system_prompt, user_message, _ = agent_service.create_agent_prompt("category_agent", first_input)
+        other_prompt, _, _ = agent_service.create_agent_prompt("category_agent", {"content_data": "Buy cheap watches", "source": "telegram"})
+        assert system_prompt == other_prompt
+        assert agent_service.load_agent_prompt("category_agent")[0] is system_prompt  # rendered once
+
+        # the dynamic input is last and serialized deterministically whatever the key order
+        reordered = dict(reversed(list(first_input.items())))
+        assert agent_service.create_agent_prompt("category_agent", reordered)[1] == user_message
+        assert user_message.endswith(
+            '{"content_data":"Meeting tomorrow","content_type":"text","source":"email",'
+            '"subject":"Sync","timestamp":"2025-06-01T09:30:00"}'
+        )
+
+    def test_examples_sent_in_full_move_into_the_static_prefix(self, agent_service):
+        selector, _ = agent_service.load_example_selector("entity_agent")
+        selector.top_k = None
+        system_prompt, user_message, _ = agent_service.create_agent_prompt("entity_agent", {"content_data": "call Bob"})
+        assert "jane.doe@example.com" in system_prompt and "+447700900123" in system_prompt
+        assert user_message.startswith("my input is:")
@@ -0,0 +1,97 @@
+import json
+import pytest
+from datetime import date
+from unittest.mock import Mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, Content, Source
+from services.message_service import MessageService
+from sources.email.gmail_backfill import GmailBackfill, build_query, DEFAULT_GMAIL_BACKFILL
+from sources.email.fake_gmail import FakeGmailService, record_fixture_messages, http_error
+
+
+class TestGmailBackfill:
+    """Test the historical Gmail import against the fake Gmail API."""
+
+    @pytest.fixture
+    def db_session(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+
+    @pytest.fixture
+    def message_service(self, db_session):
+        message_service = MessageService(db_session, near_duplicate_mode="off")
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'other'
+        message_service.classification_service.extract_entities.return_value = []
+        message_service.embedding_service = Mock()
+        return message_service
+
+    @pytest.fixture
+    def recordings(self, tmp_path):
+        # 40 messages, one every 6 hours from 2024-01-01: 2024-01-01 .. 2024-01-10
+        record_fixture_messages(tmp_path / "recordings", 40)
+        return tmp_path / "recordings"
+
+    @pytest.fixture
+    def settings(self, tmp_path):
+        return {**DEFAULT_GMAIL_BACKFILL, "page_size": 10, "batch_size": 4, "concurrency": 3,
+                "requests_per_second": 0, "retry_delay_seconds": 0, "checkpoint_path": str(tmp_path / "checkpoint.json")}
+
+    def stored_ids(self, db_session) -> set:
+        return {content.source_id for content in db_session.query(Content).filter(Content.source == Source.EMAIL)}
+
+    def test_build_query(self):
+        assert build_query(date(2024, 1, 1), date(2024, 2, 1), "label:work") == "after:2024/01/01 before:2024/02/01 label:work"
+        assert build_query() == ""
+
+    def test_backfills_date_range_in_parallel_batches(self, recordings, settings, message_service, db_session):
+        services = []
+        def factory():
+            services.append(FakeGmailService(recordings))
+            return services[-1]
+        backfill = GmailBackfill(factory, message_service, settings)
+
+        report = backfill.run(build_query(date(2024, 1, 3), date(2024, 1, 8)))
+
+        # 5 days, 4 messages a day
+        assert report.listed == report.stored == 20 and report.pages == 2 and report.failed == 0
+        assert self.stored_ids(db_session) == {f"msg{index:06d}" for index in range(8, 28)}
+        assert sum(service.batch_calls for service in services) == 6   # ceil(10 / 4) per page
+        assert len(services) > 1   # list thread plus the fetch threads, each with its own client
+        with open(settings["checkpoint_path"]) as f:
+            checkpoint = json.load(f)
+        assert checkpoint["completed"] and checkpoint["processed"] == 20 and checkpoint["failed_ids"] == []
+
+    def test_resumes_from_checkpoint(self, recordings, settings, message_service, db_session):
+        factory = lambda: FakeGmailService(recordings)
+        first = GmailBackfill(factory, message_service, settings).run("", max_pages=2)
+        assert first.stored == 20
+
+        second = GmailBackfill(factory, message_service, settings).run("")
+        assert second.pages == 2 and second.stored == 20 and second.skipped == 0
+        assert len(self.stored_ids(db_session)) == 40
+
+        # completed checkpoint, nothing to do
+        assert GmailBackfill(factory, message_service, settings).run("").listed == 0
+
+    def test_retries_rate_limited_messages_and_records_failures(self, recordings, settings, message_service, db_session):
+        service = FakeGmailService(recordings, failures={"msg000039": 2, "msg000038": http_error(404)})
+        backfill = GmailBackfill(lambda: service, message_service, {**settings, "concurrency": 1})
+
+        report = backfill.run("", max_pages=1)
+
+        assert report.stored == 9 and report.failed == 1
+        assert "msg000039" in self.stored_ids(db_session)
+        assert backfill.load_checkpoint("")["failed_ids"] == ["msg000038"]
+
+        # a resumed run doesn't go back to it, --retry-failed does
+        service.failures.clear()
+        retried = backfill.retry_failed("")
+        assert retried.stored == 1 and retried.failed == 0
+        assert "msg000038" in self.stored_ids(db_session)
+        assert backfill.load_checkpoint("")["failed_ids"] == []
+        assert backfill.retry_failed("").listed == 0
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import httpx
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from clients.async_openai_client import AsyncOpenAIClient, DEFAULT_OPENAI_ASYNC
+from clients.openai_client import OpenAIClient
+from models import Base
+from routes.metrics_router import router as metrics_router
+from services.message_service import MessageService
+from utils.llm_metrics import LLMMetrics, llm_metrics, message_usage
+from sources.email.fake_gmail import load_eml_fixtures, eml_to_gmail_message
+
+USAGE = {"prompt_tokens": 1200, "completion_tokens": 40, "total_tokens": 1240, "prompt_tokens_details": {"cached_tokens": 1000}}
+
+
+def completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini", "usage": USAGE,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    }
+
+
+class TestLLMMetrics:
+    """Test the per agent and per source LLM call accounting."""
+
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self):
+        llm_metrics.reset()
+        yield
+        llm_metrics.reset()
+
+    def test_cost_uses_cached_input_and_audio_prices(self):
+        metrics = LLMMetrics()
+        assert metrics.estimate_cost("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+        assert metrics.estimate_cost("gpt-4o-mini", 1_000_000, cached_prompt_tokens=1_000_000) == pytest.approx(0.075)
+        assert metrics.estimate_cost("whisper-1", audio_seconds=90) == pytest.approx(0.009)
+        assert metrics.estimate_cost("unknown-model", 1000, 1000) == 0.0
+        assert LLMMetrics({"gpt-4o-mini": {"input": 1.0}}).estimate_cost("gpt-4o-mini", 1_000_000, 1_000_000) == 1.0
+
+    def test_histogram_errors_and_sources(self):
+        metrics = LLMMetrics()
+        with message_usage("email") as usage:
+            metrics.record("category_agent", "gpt-4o-mini", 0.05, prompt_tokens=100, completion_tokens=10)
+            metrics.record("category_agent", "gpt-4o-mini", 1.5, prompt_tokens=300, completion_tokens=30)
+            with pytest.raises(RuntimeError):
+                with metrics.track("entity_agent", "gpt-4o-mini"):
+                    raise RuntimeError("timeout")
+        metrics.record("category_agent", "gpt-4o-mini", 45, source="telegram")
+
+        snapshot = metrics.snapshot()
+        email = snapshot["category_agent"]["email"]
+        assert (email["calls"], email["errors"], email["prompt_tokens"], email["completion_tokens"]) == (2, 0, 400, 40)
+        assert email["latency_ms_mean"] == pytest.approx(775)
+        assert email["latency_ms_histogram"]["le_100"] == 1 and email["latency_ms_histogram"]["le_2000"] == 1
+        assert snapshot["category_agent"]["telegram"]["latency_ms_histogram"]["le_inf"] == 1
+        assert snapshot["entity_agent"]["email"]["errors"] == 1
+        assert (usage.calls, usage.prompt_tokens, usage.completion_tokens) == (3, 400, 40)
+        assert usage.cost_usd == pytest.approx(metrics.estimate_cost("gpt-4o-mini", 400, 40))
+
+    def test_prompt_cache_hits_are_accounted(self):
+        metrics = LLMMetrics()
+        metrics.record("category_agent", "gpt-4o-mini", 0.4, prompt_tokens=2000, completion_tokens=10, source="email")
+        metrics.record("category_agent", "gpt-4o-mini", 0.2, prompt_tokens=2000, completion_tokens=10,
+                       cached_prompt_tokens=1536, source="email")
+        metrics.record("category_agent", "gpt-4o-mini", 5, error=True, source="email")
+
+        stats = metrics.snapshot()["category_agent"]["email"]
+        assert (stats["cache_hit_calls"], stats["cache_miss_calls"]) == (1, 1)
+        assert stats["cached_prompt_ratio"] == pytest.approx(1536 / 4000)
+        assert stats["latency_ms_mean_cache_hit"] == pytest.approx(200)
+        assert stats["latency_ms_mean_cache_miss"] == pytest.approx(400)
+        assert stats["cache_savings_usd"] == pytest.approx(1536 * (0.15 - 0.075) / 1_000_000)
+
+    def test_sync_client_records_usage(self):
+        with patch('clients.openai_client.OpenAI') as openai_class:
+            openai_class.return_value.chat.completions.create.return_value = SimpleNamespace(
+                usage=SimpleNamespace(prompt_tokens=500, completion_tokens=20, prompt_tokens_details=None),
+                choices=[SimpleNamespace(message=SimpleNamespace(content='{"category": "task"}'))],
+            )
+            openai_class.return_value.audio.transcriptions.create.return_value = "hello"
+            client = OpenAIClient()
+            with message_usage("telegram"):
+                assert client.request_agent("system", "user", {}, agent_name="category_agent") == '{"category": "task"}'
+                assert client.transcribe_audio(b"mp3", audio_seconds=30) == "hello"
+
+        snapshot = llm_metrics.snapshot()
+        assert snapshot["category_agent"]["telegram"]["prompt_tokens"] == 500
+        assert snapshot["transcription"]["telegram"]["cost_usd"] == pytest.approx(0.003)
+
+    def test_async_client_records_cached_tokens(self):
+        def handler(request):
+            return httpx.Response(200, json=completion('{"category": "work"}'))
+
+        async def run():
+            client = AsyncOpenAIClient(DEFAULT_OPENAI_ASYNC, http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            try:
+                with message_usage("email"):
+                    await client.request_agent("system", "user", {}, agent_name="entity_agent")
+            finally:
+                await client.aclose()
+
+        asyncio.run(run())
+        stats = llm_metrics.snapshot()["entity_agent"]["email"]
+        assert (stats["prompt_tokens"], stats["cached_prompt_tokens"], stats["completion_tokens"]) == (1200, 1000, 40)
+        assert stats["cache_hit_calls"] == 1
+        assert stats["cost_usd"] == pytest.approx((200 * 0.15 + 1000 * 0.075 + 40 * 0.6) / 1_000_000)
+
+    def test_usage_is_stored_per_content_row(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        message_service = MessageService(sessionmaker(bind=engine)(), near_duplicate_mode="off")
+        message_service.store_llm_usage = True
+        message_service.pre_classifier.enabled = False
+        message_service.embedding_service = Mock()
+        message_service.classification_service = Mock()
+
+        def extract_category(**kwargs):
+            llm_metrics.record("category_agent", "gpt-4o-mini", 0.2, prompt_tokens=800, completion_tokens=5)
+            return 'information'
+
+        message_service.classification_service.extract_category.side_effect = extract_category
+        message_service.classification_service.extract_entities.return_value = []
+        with patch.object(message_service.local_classifier, 'classify', return_value=None):
+            content = message_service.process_message("email", eml_to_gmail_message(load_eml_fixtures()["01_plain_ascii.eml"], "usage-1"))
+
+        assert (content.llm_prompt_tokens, content.llm_completion_tokens, content.llm_latency_ms) == (800, 5, 200)
+        assert content.llm_cost_usd == pytest.approx(llm_metrics.estimate_cost("gpt-4o-mini", 800, 5))
+        assert llm_metrics.snapshot()["category_agent"]["email"]["calls"] == 1
+
+    def test_metrics_endpoint(self):
+        llm_metrics.record("category_agent", "gpt-4o-mini", 0.3, prompt_tokens=10, source="email")
+        app = FastAPI()
+        app.include_router(metrics_router)
+        body = TestClient(app).get("/metrics").json()
+        assert body["llm"]["category_agent"]["email"]["calls"] == 1
+        assert {"agent_input_tokens", "pre_classifier", "local_classifier"} <= set(body)
+
+    def test_migration_adds_and_drops_usage_columns(self):
+        import importlib.util
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+        path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions", "c4e8a2f19b63_add_content_llm_usage.py")
+        spec = importlib.util.spec_from_file_location("add_content_llm_usage", path)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE content (id VARCHAR(36) PRIMARY KEY, content_data TEXT NOT NULL)"))
+            with Operations.context(MigrationContext.configure(connection)):
+                migration.upgrade()
+                columns = [row[1] for row in connection.execute(text("PRAGMA table_info(content)"))]
+                assert {'llm_prompt_tokens', 'llm_cost_usd'} <= set(columns)
+                migration.downgrade()
+                columns = [row[1] for row in connection.execute(text("PRAGMA table_info(content)"))]
+                assert not any(column.startswith('llm_') for column in columns)
@@ -0,0 +1,138 @@
+import os
+import random
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from models import Base, Content, ContentType, Source, Category, ClassificationState
+from clients.local_classifier import LocalClassifier, LazyLocalClassifier, evaluate, DEFAULT_LOCAL_CLASSIFIER
+from scripts.train_local_classifier import load_labeled_contents, train_and_evaluate
+from services.message_service import MessageService
+
+VOCABULARY = {
+    "meeting": ["meeting", "call", "sync", "agenda", "room", "calendar", "standup", "tomorrow", "schedule", "attend"],
+    "task": ["please", "deadline", "review", "fix", "send", "finish", "todo", "assign", "complete", "report"],
+    "spam": ["sale", "discount", "offer", "free", "winner", "click", "unsubscribe", "deal", "prize", "buy"],
+    "information": ["update", "news", "released", "announcement", "fyi", "notes", "status", "published", "version", "info"],
+}
+COMMON_WORDS = ["the", "a", "we", "to", "and", "for", "on", "team", "project", "this", "is", "of", "you", "our"]
+SETTINGS = {**DEFAULT_LOCAL_CLASSIFIER, "n_features": 4096, "epochs": 80}
+
+
+def synthetic_dataset(count: int, seed: int = 3) -> tuple[list[str], list[str]]:
+    """texts of 5-25 words, half of them from their category's vocabulary and half common words"""
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for _ in range(count):
+        label = rng.choice(sorted(VOCABULARY))
+        words = [rng.choice(VOCABULARY[label] if rng.random() < 0.5 else COMMON_WORDS) for _ in range(rng.randint(5, 25))]
+        texts.append(" ".join(words))
+        labels.append(label)
+    return texts, labels
+
+
+@pytest.fixture(scope="module")
+def trained():
+    """a model trained once for the module, with its held-out texts and labels"""
+    texts, labels = synthetic_dataset(1200)
+    model = LocalClassifier(SETTINGS["n_features"]).fit(texts[:1000], labels[:1000], epochs=SETTINGS["epochs"])
+    return model, texts[1000:], labels[1000:]
+
+
+class TestLocalClassifier:
+    """Test the local NumPy classifier, its persistence and its place in front of the category agent."""
+
+    def test_held_out_accuracy(self, trained):
+        model, texts, labels = trained
+        report = evaluate(model, texts, labels, threshold=0.85)
+        assert report['accuracy'] > 0.95
+        assert report['coverage'] > 0.5 and report['accuracy_above_threshold'] > 0.97
+        assert report['latency_ms_p95'] < 50
+
+    def test_save_and_load_round_trip(self, trained, tmp_path):
+        model, texts, _ = trained
+        model.metadata = {'train_examples': 1000}
+        model.save(str(tmp_path / "model.npz"))
+        loaded = LocalClassifier.load(str(tmp_path / "model.npz"))
+        assert loaded.classes == model.classes and loaded.metadata == {'train_examples': 1000}
+        assert [loaded.predict(text)[0] for text in texts[:50]] == [model.predict(text)[0] for text in texts[:50]]
+
+    def test_lazy_loading_and_threshold(self, trained, tmp_path):
+        model, _, _ = trained
+        path = str(tmp_path / "lazy.npz")
+        lazy = LazyLocalClassifier(path, threshold=0.85)
+        assert lazy.classify("standup meeting tomorrow in room 4") is None
+        assert lazy.snapshot()['model_loaded'] is False
+
+        model.save(path)
+        category, probability = lazy.classify("standup meeting tomorrow agenda call schedule")
+        assert category == "meeting" and probability >= 0.85
+        assert lazy.classify("the team and you") is None
+        assert lazy.snapshot() == {'model_loaded': True, 'predictions': 2, 'llm_calls_avoided': 1, 'avoided_rate': 0.5}
+
+    def test_trains_from_stored_categories(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        texts, labels = synthetic_dataset(400, seed=5)
+        for index, (text, label) in enumerate(zip(texts, labels)):
+            db.add(Content(source_id=str(index), content_type=ContentType.TEXT, content_data=text, source=Source.TELEGRAM,
+                           category=Category(label), category_provenance="llm", timestamp=datetime(2025, 6, 1)))
+        # not the agent's decisions: left out of the training set
+        for index, (provenance, state) in enumerate([("rules", "classified"), ("local_model", "classified"),
+                                                     ("near_duplicate", "classified"), (None, "classified"), ("llm", "pending")]):
+            db.add(Content(source_id=f"excluded-{index}", content_type=ContentType.TEXT, content_data="free prize meeting",
+                           source=Source.TELEGRAM, category=Category.IDEA, category_provenance=provenance,
+                           classification_state=ClassificationState(state), timestamp=datetime(2025, 6, 1)))
+        db.commit()
+
+        stored_texts, stored_labels = load_labeled_contents(db)
+        assert len(stored_texts) == 400 and "idea" not in stored_labels
+        model, report = train_and_evaluate(stored_texts, stored_labels, SETTINGS, test_fraction=0.25)
+        assert report['examples'] == 100 and report['accuracy'] > 0.9
+        assert model.metadata['train_examples'] == 300
+        db.close()
+
+    def test_migration_backfills_the_agent_provenance_of_older_rows(self):
+        import importlib.util
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+        path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions", "b5e7c3a1d824_backfill_category_provenance.py")
+        spec = importlib.util.spec_from_file_location("backfill_category_provenance", path)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE content (id VARCHAR(36) PRIMARY KEY, category VARCHAR, "
+                                    "classification_state VARCHAR, category_provenance VARCHAR(20))"))
+            connection.execute(text("INSERT INTO content VALUES ('old', 'task', 'classified', NULL), "
+                                    "('pending', 'other', 'pending', NULL), ('rules', 'spam', 'classified', 'rules')"))
+            with Operations.context(MigrationContext.configure(connection)):
+                migration.upgrade()
+            provenances = dict(connection.execute(text("SELECT id, category_provenance FROM content")).all())
+        assert provenances == {'old': 'llm', 'pending': None, 'rules': 'rules'}
+
+    def test_message_service_skips_agent_when_model_is_confident(self, trained, tmp_path):
+        model, _, _ = trained
+        model.save(str(tmp_path / "model.npz"))
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        message_service = MessageService(sessionmaker(bind=engine)(), near_duplicate_mode="off")
+        message_service.local_classifier = LazyLocalClassifier(str(tmp_path / "model.npz"), threshold=0.85)
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'other'
+        message_service.classification_service.extract_entities.return_value = []
+        message_service.embedding_service = Mock()
+
+        confident = {'message': {'message_id': 1, 'text': 'big sale free offer click buy now discount deal',
+                                 'from': {'id': 7, 'username': 'shop'}, 'date': 1750604461}}
+        unsure = {'message': {'message_id': 2, 'text': 'the team and you on this project',
+                              'from': {'id': 7, 'username': 'shop'}, 'date': 1750604461}}
+        decided = message_service.process_message('telegram', confident)
+        assert decided.category == Category.SPAM and decided.category_provenance == "local_model"
+        assert decided.category_confidence >= 0.85
+        message_service.classification_service.extract_category.assert_not_called()
+        assert message_service.process_message('telegram', unsure).category == Category.OTHER
+        message_service.classification_service.extract_category.assert_called_once()
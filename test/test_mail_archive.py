@@ -0,0 +1,139 @@
+import asyncio
+import json
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import Mock
+from models import Base, Content, Source, Entity, EntityType
+from message_parsers.email.email_text_parser import EmailTextParser
+from repository.bulk_loader import ExecutemanyLoader, load_items
+from clients.async_openai_client import AsyncOpenAIClient, DEFAULT_OPENAI_ASYNC
+from services.async_agent_service import AsyncAgentService
+from services.async_classification_service import AsyncClassificationService
+from services.message_service import MessageService
+from sources.email.mail_archive import MailArchiveImporter, iter_mbox_messages
+from sources.email.fake_gmail import load_eml_fixtures, eml_to_gmail_message, write_mbox
+
+QUOTED_FROM_EML = (
+    b"From: Ana <ana@example.com>\nSubject: Quoting\nMessage-ID: <quote-1@example.com>\n"
+    b"Date: Tue, 10 Jun 2025 09:00:00 +0000\n\n"
+    b"First line\n\nFrom the archive: this line starts with From\n>From a quote\n"
+)
+
+
+class TestMailArchive:
+    """Test the offline mbox / eml importer."""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+        Base.metadata.create_all(engine)
+        return sessionmaker(bind=engine)
+
+    @pytest.fixture
+    def archive(self, tmp_path):
+        emls = list(load_eml_fixtures().values())
+        write_mbox(tmp_path / "archive.mbox", emls + [QUOTED_FROM_EML])
+        exported = tmp_path / "exported"
+        exported.mkdir()
+        # the same message exported next to the mbox, stored once
+        (exported / "copy.eml").write_bytes(emls[0])
+        return [str(tmp_path / "archive.mbox"), str(exported)]
+
+    def test_mbox_is_split_and_unquoted(self, archive):
+        messages = list(iter_mbox_messages(archive[0]))
+        assert len(messages) == len(load_eml_fixtures()) + 1
+        assert b"\nFrom the archive: this line starts with From\n>From a quote\n" in messages[-1]
+
+    def test_eml_parses_like_gmail_message(self):
+        parser = EmailTextParser()
+        for name, eml in load_eml_fixtures().items():
+            from_eml = parser.parse_eml(eml)['content_data']
+            from_gmail = parser.parse(eml_to_gmail_message(eml, name))['content_data']
+            assert from_eml['content_data'] == from_gmail['content_data']
+            assert from_eml['subject'] == from_gmail['subject']
+        assert parser.parse_eml(QUOTED_FROM_EML)['source_id'] == "quote-1@example.com"
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_import_dedups_on_message_id(self, archive, session_factory, workers):
+        loader = ExecutemanyLoader(session_factory)
+        first = load_items(loader, MailArchiveImporter(workers=workers, chunk_size=2).iter_items(archive), batch_size=3)
+        assert first.read == 8 and first.inserted == 7 and first.skipped == 1
+
+        second = load_items(loader, MailArchiveImporter(workers=workers, chunk_size=2).iter_items(archive), batch_size=3)
+        assert second.inserted == 0 and second.skipped == 8
+
+        db = session_factory()
+        stored = db.query(Content).filter(Content.source == Source.EMAIL).all()
+        assert len(stored) == 7 and {content.category.value for content in stored} == {"other"}
+        assert any(content.source_id == "quote-1@example.com" for content in stored)
+        db.close()
+
+    @pytest.fixture
+    def message_service(self, session_factory):
+        db = session_factory()
+        message_service = MessageService(db)
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = "not-a-category"
+        message_service.classification_service.extract_entities.return_value = [
+            Entity(entity_type=EntityType.PROJECT, entity_value="Alpha")
+        ]
+        yield message_service
+        db.close()
+
+    def test_optional_classification(self, archive, session_factory, message_service):
+        items = list(MailArchiveImporter(workers=1, message_service=message_service).iter_items(archive[:1]))
+
+        report = load_items(ExecutemanyLoader(session_factory), items)
+        assert report.inserted == 7 and report.entities == 7
+        decisions = {item.subject: (item.category, item.category_provenance) for item in items}
+        # the calendar invite is decided by the pre-classifier rules, the category agent does the rest
+        assert decisions.pop("Invitation: Project Beta kickoff @ Fri Jun 6, 2025 2pm - 3pm") == ("meeting", "rules")
+        assert set(decisions.values()) == {("other", "llm")}
+        assert message_service.classification_service.extract_category.call_count == 6
+        db = session_factory()
+        invite = db.query(Content).filter(Content.category_provenance == "rules").one()
+        assert (invite.category_confidence, invite.category_rules) == (0.9, ["calendar_invite_subject"])
+        db.close()
+
+    def test_reimport_skips_classifying_stored_messages(self, archive, session_factory, message_service):
+        load_items(ExecutemanyLoader(session_factory), MailArchiveImporter(workers=1).iter_items(archive[:1]))
+
+        importer = MailArchiveImporter(workers=1, message_service=message_service, classify_batch_size=3)
+        report = load_items(ExecutemanyLoader(session_factory), importer.iter_items(archive))
+        assert report.inserted == 0 and report.skipped == 8
+        # the copy exported next to the mbox too
+        assert importer.already_stored == 8
+        message_service.classification_service.extract_category.assert_not_called()
+
+    def test_async_classification_in_batches(self, archive, message_service):
+        in_flight, peak = 0, 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if "category_agent" in json.loads(request.content)["messages"][0]["content"]:
+                content = '{"category": "meeting"}'
+            else:
+                content = '{"entities": [{"entity_type": "PROJECT", "entity_value": "Alpha"}]}'
+            return httpx.Response(200, json={
+                "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            })
+
+        client = AsyncOpenAIClient({**DEFAULT_OPENAI_ASYNC, "concurrency": 8},
+                                   http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        service = AsyncClassificationService(AsyncAgentService(client))
+        importer = MailArchiveImporter(workers=1, message_service=message_service, classification_service=service,
+                                       classify_batch_size=4)
+        items = list(importer.iter_items(archive[:1]))
+
+        assert len(items) == 7
+        assert {(item.category, item.category_provenance) for item in items} == {("meeting", "llm"), ("meeting", "rules")}
+        assert all([entity.entity_value for entity in item.entities] == ["Alpha"] for item in items)
+        assert peak > 2  # several messages and both agents in flight at once
+        assert importer._loop is None and client.http_client.is_closed
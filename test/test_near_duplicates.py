@@ -0,0 +1,229 @@
+import base64
+import os
+import random
+import pytest
+from datetime import datetime
+from unittest.mock import Mock, patch
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from models import Base, Content, ContentDuplicate, ContentType, Source, Category, Entity, EntityType
+from repository.batch_writer import BatchWriter
+from repository.content_repository import ContentRepository
+from config import config
+from services.message_service import MessageService
+from utils.simhash import (
+    simhash, hamming_distance, fingerprint_columns, to_signed, to_unsigned,
+    band_layout, band_columns, fingerprint_bands, configure_fingerprint_bands, DEFAULT_MAX_DISTANCE, FINGERPRINT_BANDS,
+)
+
+ANNOUNCEMENT = "Team meeting about project Alpha moved to Thursday at 10am in room 4, please bring the quarterly numbers"
+FORWARDED = "Fwd: Team meeting about project Alpha moved to Thursday at 10am in room 4, please bring the quarterly numbers!"
+UNRELATED = "Lunch order for tomorrow: pizza or sushi, vote in the channel before noon"
+
+
+def telegram_update(message_id, text):
+    return {
+        "update_id": message_id,
+        "message": {"message_id": message_id, "from": {"id": 1}, "chat": {"id": 1}, "date": 1750635741, "text": text}
+    }
+
+
+def gmail_message(gmail_id, text):
+    return {
+        'id': gmail_id,
+        'internalDate': '1750635800000',
+        'snippet': text[:20],
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [{'name': 'Subject', 'value': 'Alpha'}],
+            'body': {'data': base64.urlsafe_b64encode(text.encode()).decode()},
+        },
+    }
+
+
+class TestSimHash:
+    """Test the fingerprint helpers."""
+
+    def test_near_texts_are_close_and_unrelated_far(self):
+        assert hamming_distance(simhash(ANNOUNCEMENT), simhash(FORWARDED)) <= 6
+        assert hamming_distance(simhash(ANNOUNCEMENT), simhash(UNRELATED)) > 12
+
+    def test_signed_storage_round_trip(self):
+        fingerprint = (1 << 63) + 5
+        assert to_signed(fingerprint) < 0
+        assert to_unsigned(to_signed(fingerprint)) == fingerprint
+
+    def test_short_texts_are_not_fingerprinted(self):
+        columns = fingerprint_columns("ok thanks")
+        assert set(columns.values()) == {None}
+        assert len(columns) == 9
+
+    def test_bands_are_sized_to_max_distance(self):
+        assert [bits for _, bits in band_layout(6)] == [10, 9, 9, 9, 9, 9, 9]
+        assert [bits for _, bits in band_layout(3)] == [16, 16, 16, 16]
+        assert [bits for _, bits in band_layout(0)] == [22, 21, 21]  # 32 bit band columns
+        assert [bits for _, bits in band_layout(FINGERPRINT_BANDS - 1)] == [8] * FINGERPRINT_BANDS
+        with pytest.raises(ValueError):
+            band_layout(FINGERPRINT_BANDS)
+        columns = band_columns(simhash(ANNOUNCEMENT), band_layout(3))
+        assert list(columns.values())[4:] == [None] * 4
+
+    def test_fingerprints_within_max_distance_share_a_band(self):
+        rng = random.Random(7)
+        for max_distance in range(FINGERPRINT_BANDS):
+            layout = band_layout(max_distance)
+            for _ in range(200):
+                fingerprint = rng.getrandbits(64)
+                near = fingerprint
+                for bit in rng.sample(range(64), max_distance):
+                    near ^= 1 << bit
+                assert set(enumerate(fingerprint_bands(fingerprint, layout))) & set(enumerate(fingerprint_bands(near, layout)))
+
+    def test_unrelated_fingerprints_rarely_share_a_band(self):
+        rng = random.Random(11)
+        query = rng.getrandbits(64)
+        for max_distance, expected in ((DEFAULT_MAX_DISTANCE, 7 / 512), (3, 4 / 65536)):
+            layout = band_layout(max_distance)
+            query_bands = set(enumerate(fingerprint_bands(query, layout)))
+            matches = sum(bool(query_bands & set(enumerate(fingerprint_bands(rng.getrandbits(64), layout))))
+                          for _ in range(20000))
+            assert matches / 20000 < 2 * expected + 0.001
+
+
+class TestNearDuplicateDetection:
+    """Test near-duplicate lookup and reuse in the message pipeline."""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'near.db'}")
+        Base.metadata.create_all(engine)
+        return sessionmaker(bind=engine, expire_on_commit=False)
+
+    def make_service(self, db, mode="reuse", batch_writer=None):
+        message_service = MessageService(db, batch_writer=batch_writer, near_duplicate_mode=mode)
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'meeting'
+        message_service.classification_service.extract_entities.side_effect = lambda **kwargs: [
+            Entity(entity_type=EntityType.PROJECT, entity_value='Alpha')
+        ]
+        message_service.embedding_service = Mock()
+        return message_service
+
+    def test_repository_finds_closest_candidate(self, session_factory):
+        db = session_factory()
+        for source_id, text in (('1', ANNOUNCEMENT), ('2', UNRELATED)):
+            db.add(Content(source_id=source_id, content_type=ContentType.TEXT, content_data=text, source=Source.TELEGRAM,
+                           category=Category.OTHER, timestamp=datetime(2025, 6, 1), **fingerprint_columns(text)))
+        db.commit()
+        repository = ContentRepository(db)
+
+        content, distance = repository.find_near_duplicate(fingerprint_columns(FORWARDED)['fingerprint'], 6)
+        assert content.source_id == '1' and distance <= 6
+        assert repository.find_near_duplicate(fingerprint_columns(FORWARDED)['fingerprint'], 6,
+                                              since=datetime(2025, 7, 1)) is None
+
+    def test_cross_source_copy_reuses_classification_and_is_linked(self, session_factory):
+        db = session_factory()
+        message_service = self.make_service(db)
+
+        original = message_service.process_message('telegram', telegram_update(1, ANNOUNCEMENT))
+        copy = message_service.process_message('email', gmail_message('gmail-1', FORWARDED))
+
+        assert message_service.classification_service.extract_category.call_count == 1
+        assert copy.category == Category.MEETING
+        assert (original.category_provenance, copy.category_provenance) == ("llm", "near_duplicate")
+        assert [entity.entity_value for entity in copy.entities] == ['Alpha']
+        link = db.query(ContentDuplicate).one()
+        assert (link.content_id, link.duplicate_of_id) == (copy.id, original.id)
+
+    def test_same_source_copy_is_not_linked(self, session_factory):
+        db = session_factory()
+        message_service = self.make_service(db)
+
+        message_service.process_message('telegram', telegram_update(1, ANNOUNCEMENT))
+        message_service.process_message('telegram', telegram_update(2, FORWARDED))
+        message_service.process_message('telegram', telegram_update(3, UNRELATED))
+
+        assert message_service.classification_service.extract_category.call_count == 2
+        assert db.query(ContentDuplicate).count() == 0
+
+    def test_link_mode_still_classifies(self, session_factory):
+        db = session_factory()
+        message_service = self.make_service(db, mode="link")
+
+        message_service.process_message('telegram', telegram_update(1, ANNOUNCEMENT))
+        message_service.process_message('email', gmail_message('gmail-1', FORWARDED))
+
+        assert message_service.classification_service.extract_category.call_count == 2
+        assert db.query(ContentDuplicate).count() == 1
+
+    def test_links_are_written_by_the_batch_writer(self, session_factory):
+        writer = BatchWriter(session_factory, max_rows=100, max_delay_ms=60000)
+        message_service = self.make_service(session_factory(), batch_writer=writer)
+
+        message_service.process_message('telegram', telegram_update(1, ANNOUNCEMENT))
+        message_service.flush_pending()
+        copy = message_service.process_message('email', gmail_message('gmail-1', FORWARDED))
+        message_service.flush_pending()
+        writer.close()
+
+        db = session_factory()
+        assert db.query(ContentDuplicate).one().content_id == copy.id
+        assert db.query(Entity).count() == 2
+
+    def test_unknown_mode_is_rejected(self, session_factory):
+        with pytest.raises(ValueError):
+            MessageService(session_factory(), near_duplicate_mode="sometimes")
+
+    def test_distance_the_bands_cannot_find_is_rejected(self, session_factory):
+        assert MessageService(session_factory()).near_duplicate_mode == "link"
+        for max_distance in (DEFAULT_MAX_DISTANCE + 1, FINGERPRINT_BANDS):
+            with patch.dict(config.config_json, {"near_duplicate": {"max_distance": max_distance}}):
+                with pytest.raises(ValueError):
+                    MessageService(session_factory())
+
+    def test_bands_are_rebuilt_for_a_new_layout(self, session_factory):
+        db = session_factory()
+        for source_id, text_value in (('1', ANNOUNCEMENT), ('2', UNRELATED), ('3', 'ok')):
+            db.add(Content(source_id=source_id, content_type=ContentType.TEXT, content_data=text_value, source=Source.TELEGRAM,
+                           category=Category.OTHER, timestamp=datetime(2025, 6, 1), **fingerprint_columns(text_value)))
+        db.commit()
+        repository = ContentRepository(db)
+        try:
+            configure_fingerprint_bands(4)
+            assert repository.rebuild_fingerprint_bands(batch_size=1) == 2
+            content, distance = repository.find_near_duplicate(fingerprint_columns(FORWARDED)['fingerprint'], 4)
+            assert content.source_id == '1' and distance <= 4
+            assert content.fingerprint_band_4 is not None and content.fingerprint_band_5 is None
+        finally:
+            configure_fingerprint_bands(DEFAULT_MAX_DISTANCE)
+
+    def test_migration_rebuilds_bands_for_max_distance(self):
+        import importlib.util
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+        path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions", "f3b8d1c7e592_rebuild_fingerprint_bands.py")
+        spec = importlib.util.spec_from_file_location("rebuild_fingerprint_bands", path)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        bands = ", ".join(f"fingerprint_band_{band} INTEGER" for band in range(FINGERPRINT_BANDS))
+        fingerprint = simhash(ANNOUNCEMENT)
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            connection.execute(text(f"CREATE TABLE content (id VARCHAR(36) PRIMARY KEY, fingerprint BIGINT, {bands})"))
+            connection.execute(text("INSERT INTO content (id, fingerprint) VALUES ('1', :fingerprint), ('2', NULL)"),
+                               {"fingerprint": to_signed(fingerprint)})
+            with Operations.context(MigrationContext.configure(connection)):
+                with patch.dict(config.config_json, {"near_duplicate": {"max_distance": 3}}):
+                    migration.upgrade()
+                stored = connection.execute(text("SELECT * FROM content ORDER BY id")).all()
+                assert list(stored[0][2:]) == list(band_columns(fingerprint, band_layout(3)).values())
+                assert set(stored[1][1:]) == {None}
+                migration.downgrade()
+                stored = connection.execute(text("SELECT * FROM content WHERE id = '1'")).one()
+                assert list(stored[2:]) == fingerprint_bands(fingerprint, band_layout(FINGERPRINT_BANDS - 1))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,127 @@
+import os
+import pytest
+from unittest.mock import Mock
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from models import Base, Category
+from services.content_table_service import to_content_response
+from services.message_service import MessageService
+from services.pre_classifier import Rule, RuleClassifier, pre_classifier_stats
+from sources.email.fake_gmail import load_eml_fixtures, eml_to_gmail_message
+
+PROMO_EML = (
+    b"From: Deals <deals@shop.example.com>\nSubject: 30% off everything this weekend\n"
+    b"List-Unsubscribe: <mailto:unsubscribe@shop.example.com>\nDate: Tue, 10 Jun 2025 09:00:00 +0000\n"
+    b"Content-Type: text/plain; charset=utf-8\n\nBig sale on all shoes and bags this weekend only.\n"
+    b"To stop receiving these emails, unsubscribe here.\n"
+)
+
+RULES = [
+    Rule("calendar_part", "mime_type", "text/calendar", "meeting", 0.95),
+    Rule("unsubscribe_header", "header", ".", "spam", 0.7, header="List-Unsubscribe"),
+    Rule("unsubscribe_footer", "content", r"\bunsubscribe\b", "spam", 0.7),
+    Rule("boss_sender", "sender", "boss@example.com", "task", 0.5, source="email"),
+]
+
+
+class TestPreClassifier:
+    """Test the rule cascade in front of the category agent."""
+
+    @pytest.fixture(autouse=True)
+    def reset_stats(self):
+        pre_classifier_stats.reset()
+        yield
+        pre_classifier_stats.reset()
+
+    @pytest.fixture
+    def message_service(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        message_service = MessageService(sessionmaker(bind=engine)(), near_duplicate_mode="off")
+        message_service.pre_classifier = RuleClassifier(RULES)
+        message_service.classification_service = Mock()
+        message_service.classification_service.extract_category.return_value = 'information'
+        message_service.classification_service.extract_entities.return_value = []
+        message_service.embedding_service = Mock()
+        return message_service
+
+    def test_single_confident_rule_decides(self):
+        decision = RuleClassifier(RULES).classify({'mime_types': ['text/plain', 'text/calendar']})
+        assert (decision.category, decision.provenance, decision.rules) == ("meeting", "rules", ["calendar_part"])
+
+    def test_agreeing_rules_add_up(self):
+        classifier = RuleClassifier(RULES)
+        assert classifier.classify({'content': 'click to unsubscribe'}) is None
+        decision = classifier.classify({'content': 'click to unsubscribe', 'headers': {'list-unsubscribe': '<mailto:x>'}})
+        assert decision.category == "spam" and decision.confidence == 0.91
+        assert decision.rules == ["unsubscribe_header", "unsubscribe_footer"]
+
+        assert pre_classifier_stats.snapshot() == {
+            'evaluated': 2, 'llm_calls_avoided': 1, 'avoided_rate': 0.5,
+            'rule_hits': {'unsubscribe_footer': 2, 'unsubscribe_header': 1},
+        }
+
+    def test_source_filter_and_disabled_classifier(self):
+        message = {'source': 'telegram', 'sender': 'boss@example.com'}
+        assert RuleClassifier(RULES, min_confidence=0.5).classify(message) is None
+        assert RuleClassifier(RULES, enabled=False).classify({'mime_types': ['text/calendar']}) is None
+
+    def test_invalid_rules_are_rejected(self):
+        with pytest.raises(ValueError):
+            Rule("bad_kind", "body", "x", "spam", 0.9)
+        with pytest.raises(ValueError):
+            Rule("bad_category", "subject", "x", "newsletter", 0.9)
+        with pytest.raises(ValueError):
+            Rule("no_header", "header", "x", "spam", 0.9)
+
+    def test_calendar_invite_skips_the_category_agent(self, message_service):
+        invite = load_eml_fixtures()["06_calendar_invite.eml"]
+        content = message_service.process_message('email', eml_to_gmail_message(invite, "invite-1"))
+
+        assert content.category == Category.MEETING
+        message_service.classification_service.extract_category.assert_not_called()
+        message_service.classification_service.extract_entities.assert_called_once()
+
+    def test_promo_from_raw_message_is_spam(self, message_service):
+        content = message_service.process_message('email', eml_to_gmail_message(PROMO_EML, "promo-1", "raw"))
+        assert content.category == Category.SPAM
+        message_service.classification_service.extract_category.assert_not_called()
+
+        message_service.db.expire_all()
+        stored = message_service.content_repository.get_content_by_id(content.id)
+        assert (stored.category_provenance, stored.category_confidence) == ("rules", 0.91)
+        assert stored.category_rules == ["unsubscribe_header", "unsubscribe_footer"]
+        response = to_content_response(stored)
+        assert (response.category_provenance, response.category_rules) == ("rules", stored.category_rules)
+        assert stored.to_dict()['category_confidence'] == 0.91
+
+    def test_other_mail_goes_to_the_agent(self, message_service):
+        plain = load_eml_fixtures()["01_plain_ascii.eml"]
+        content = message_service.process_message('email', eml_to_gmail_message(plain, "plain-1"))
+        assert content.category == Category.INFORMATION
+        message_service.classification_service.extract_category.assert_called_once()
+        assert pre_classifier_stats.snapshot()['llm_calls_avoided'] == 0
+        assert (content.category_provenance, content.category_confidence, content.category_rules) == ("llm", None, None)
+
+        message_service.update_content(content, {'category': 'task'})
+        assert (content.category, content.category_provenance) == (Category.TASK, "manual")
+
+    def test_migration_adds_category_provenance(self):
+        import importlib.util
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+        path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions", "e2a9c6d4b817_add_content_category_provenance.py")
+        spec = importlib.util.spec_from_file_location("add_content_category_provenance", path)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE content (id VARCHAR(36) PRIMARY KEY, content_data TEXT NOT NULL)"))
+            connection.execute(text("INSERT INTO content (id, content_data) VALUES ('1', 'old row')"))
+            with Operations.context(MigrationContext.configure(connection)):
+                migration.upgrade()
+                assert connection.execute(text("SELECT category_provenance, category_rules FROM content")).one() == (None, None)
+                migration.downgrade()
+                columns = [row[1] for row in connection.execute(text("PRAGMA table_info(content)"))]
+                assert not any(column.startswith('category_') for column in columns)
@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import pytest
+import numpy as np
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, Content, ContentType, Source, Category
+from clients.embedding_client import HashingEmbeddingClient, get_embedding_client
+from repository.vector_index import VectorIndex
+from services.embedding_service import EmbeddingService
+from services.content_table_service import ContentTableService
+from schemas.schemas import SemanticSearchQuery
+
+
+class TestHashingEmbeddingClient:
+    """Test the deterministic local embedding backend."""
+
+    def test_embedding_is_deterministic_and_normalized(self):
+        client = HashingEmbeddingClient(dimension=64)
+        first = client.embed("Meeting tomorrow about project Alpha")
+        second = HashingEmbeddingClient(dimension=64).embed("Meeting tomorrow about project Alpha")
+
+        assert first.dtype == np.float32
+        assert first.shape == (64,)
+        assert np.array_equal(first, second)
+        assert np.linalg.norm(first) == pytest.approx(1.0, rel=1e-5)
+
+    def test_empty_text_gives_zero_vector(self):
+        vector = HashingEmbeddingClient(dimension=32).embed("")
+        assert not vector.any()
+
+    def test_unknown_backend_raises(self):
+        with pytest.raises(ValueError):
+            get_embedding_client("does-not-exist", 32)
+
+
+def _append_many(index_path, prefix):
+    client = HashingEmbeddingClient(dimension=64)
+    index = VectorIndex(index_path, 64)
+    for number in range(50):
+        index.add(f"{prefix}{number}", client.embed(f"message {prefix}{number}"))
+
+
+class TestVectorIndex:
+    """Test the memory-mapped vector index."""
+
+    @pytest.fixture
+    def client(self):
+        return HashingEmbeddingClient(dimension=64)
+
+    def test_append_and_search(self, tmp_path, client):
+        index = VectorIndex(str(tmp_path), 64)
+        index.add("a", client.embed("meeting about the budget tomorrow"))
+        index.add("b", client.embed("buy now limited offer fifty percent off"))
+        index.add("c", client.embed("please review the budget report"))
+
+        results = index.search(client.embed("budget meeting"), top_k=2)
+
+        assert len(index) == 3
+        assert [content_id for content_id, _ in results][0] == "a"
+        assert len(results) == 2
+        assert results[0][1] >= results[1][1]
+
+    def test_index_reloads_lazily_from_disk(self, tmp_path, client):
+        index = VectorIndex(str(tmp_path), 64)
+        index.add("a", client.embed("first message"))
+        index.add("b", client.embed("second message"))
+
+        reopened = VectorIndex(str(tmp_path), 64)
+        assert reopened._matrix is None
+
+        results = reopened.search(client.embed("second message"), top_k=1)
+        assert results[0][0] == "b"
+
+        reopened.add("c", client.embed("third message"))
+        assert reopened.search(client.embed("third message"), top_k=1)[0][0] == "c"
+
+    def test_files_left_out_of_step_by_a_crash_are_realigned(self, tmp_path, client):
+        index = VectorIndex(str(tmp_path), 64)
+        for content_id in ("a", "b"):
+            index.add(content_id, client.embed(f"message {content_id}"))
+        # an id whose vector never made it, then a half written id
+        with open(index.ids_path, "a", encoding="utf-8") as f:
+            f.write("orphan\nhal")
+
+        reopened = VectorIndex(str(tmp_path), 64)
+        assert len(reopened) == 2
+        reopened.add("c", client.embed("message c"))
+        with open(index.ids_path, encoding="utf-8") as f:
+            assert f.read() == "a\nb\nc\n"
+        assert os.path.getsize(index.vectors_path) == 3 * 64 * 4
+
+        # a vector whose id never made it is cut off by the next append
+        with open(index.vectors_path, "ab") as f:
+            f.write(client.embed("lost").astype("float32").tobytes())
+        reopened = VectorIndex(str(tmp_path), 64)
+        assert len(reopened) == 3
+        reopened.add("d", client.embed("message d"))
+        assert [reopened.search(client.embed(f"message {content_id}"), top_k=1)[0][0] for content_id in "abcd"] == list("abcd")
+
+    def test_appends_from_another_instance_are_kept(self, tmp_path, client):
+        # two processes each hold their own index over the same files
+        first, second = VectorIndex(str(tmp_path), 64), VectorIndex(str(tmp_path), 64)
+        first.add("a", client.embed("message a"))
+        assert len(second) == 1
+        first.add("b", client.embed("message b"))
+        second.add("c", client.embed("message c"))
+        first.add("d", client.embed("message d"))
+
+        with open(first.ids_path, encoding="utf-8") as f:
+            assert f.read() == "a\nb\nc\nd\n"
+        assert os.path.getsize(first.vectors_path) == 4 * 64 * 4
+        assert [second.search(client.embed(f"message {content_id}"), top_k=1)[0][0] for content_id in "abcd"] == list("abcd")
+
+    def test_concurrent_processes_append_without_losing_rows(self, tmp_path):
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_append_many, args=(str(tmp_path), prefix)) for prefix in "xy"]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        index = VectorIndex(str(tmp_path), 64)
+        assert len(index) == 2 * 50
+        assert os.path.getsize(index.vectors_path) == 2 * 50 * 64 * 4
+        client = HashingEmbeddingClient(dimension=64)
+        assert index.search(client.embed("message y7"), top_k=1)[0][0] == "y7"
+
+    def test_adding_existing_id_overwrites_row(self, tmp_path, client):
+        index = VectorIndex(str(tmp_path), 64)
+        index.add("a", client.embed("old text"))
+        index.add("a", client.embed("completely new words"))
+
+        assert len(index) == 1
+        assert index.search(client.embed("completely new words"), top_k=1)[0][1] == pytest.approx(1.0, rel=1e-5)
+
+    def test_wrong_dimension_raises(self, tmp_path):
+        index = VectorIndex(str(tmp_path), 64)
+        with pytest.raises(ValueError):
+            index.add("a", np.zeros(10, dtype=np.float32))
+
+    def test_search_on_empty_index(self, tmp_path, client):
+        index = VectorIndex(str(tmp_path), 64)
+        assert index.search(client.embed("anything"), top_k=5) == []
+
+
+class TestSemanticSearchService:
+    """Test semantic search through ContentTableService."""
+
+    @pytest.fixture
+    def db_session(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(bind=engine)
+        session = SessionLocal()
+        yield session
+        session.close()
+
+    def test_semantic_search_returns_contents_in_score_order(self, db_session, tmp_path):
+        embedding_service = EmbeddingService(HashingEmbeddingClient(dimension=64), VectorIndex(str(tmp_path), 64))
+        contents = [
+            Content(source_id='1', content_type=ContentType.TEXT, content_data='Quarterly budget review meeting',
+                    source=Source.EMAIL, category=Category.MEETING, subject='Budget', timestamp=datetime.now()),
+            Content(source_id='2', content_type=ContentType.TEXT, content_data='Win a free lottery prize now',
+                    source=Source.TELEGRAM, category=Category.SPAM, timestamp=datetime.now()),
+        ]
+        db_session.add_all(contents)
+        db_session.commit()
+        for content in contents:
+            embedding_service.index_content(content)
+
+        service = ContentTableService(db_session)
+        service.embedding_service = embedding_service
+        results = service.semantic_search(SemanticSearchQuery(query_text="budget meeting", top_k=2))
+
+        assert [result.source_id for result in results] == ['1', '2']
+        assert results[0].entities == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -211,6 +211,7 @@ class TestMessageService:
         
         mock_content = Mock(spec=Content)
         message_service.content_repository.create_content = Mock(return_value=mock_content)
+        message_service.content_repository.content_exists = Mock(return_value=False)
         
         raw_data = {
             "message": {
@@ -0,0 +1,44 @@
+import random
+import pytest
+from unittest.mock import patch
+from utils import text_utils
+from utils.text_normalization import CleanedText, clean_text, clean_many, clean_payload
+
+
+ALPHABET = (
+    "abcXYZ019 àéß абвЖ ابت 的一是 😀🚀 ＡＢ！ ﬁ½™ éñ"
+    "\x9d\x9c\x93\x94\x91\x92\x85\x96\x97\x00\x07\x0b\x0c\x1f\x7f\t\n\r    "
+)
+
+
+class TestTextNormalization:
+    """Test that utils.text_normalization matches utils.text_utils.clean_text."""
+
+    @pytest.fixture
+    def random_texts(self):
+        rng = random.Random(41)
+        return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 80))) for _ in range(2000)]
+
+    def test_output_matches_original_clean_text(self, random_texts):
+        for text in random_texts:
+            assert clean_text(text) == text_utils.clean_text(text)
+
+    def test_clean_many_matches_clean_text(self, random_texts):
+        batch = random_texts + random_texts[:50]
+        assert clean_many(batch) == [text_utils.clean_text(text) for text in batch]
+
+    def test_bytes_and_empty_input(self):
+        assert clean_text("“Hi”\x85  there".encode("utf-8")) == text_utils.clean_text("“Hi”\x85  there")
+        assert clean_text("") == "" and clean_text(None) == ""
+
+    def test_cleaned_text_is_not_cleaned_again(self):
+        cleaned = clean_text("Meeting \x96 Friday\x85")
+        assert isinstance(cleaned, CleanedText)
+        with patch("utils.text_normalization._clean") as inner_clean:
+            assert clean_text(cleaned) is cleaned
+            assert clean_payload({"content_data": cleaned, "tags": [cleaned]}) == {"content_data": cleaned, "tags": [cleaned]}
+            inner_clean.assert_not_called()
+
+    def test_clean_payload_keeps_non_text_values(self):
+        payload = {"content_data": " a\x00b ", "meta": {"subject": "\x93Hi\x94"}, "ids": [1, "x\ty"], "count": 3}
+        assert clean_payload(payload) == {"content_data": "ab", "meta": {"subject": '"Hi"'}, "ids": [1, "x y"], "count": 3}
@@ -0,0 +1,102 @@
+import threading
+import time
+from contextlib import contextmanager
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+        closed: calls go through, `failure_threshold` failures in a row open the circuit
+        open: calls are rejected right away (CircuitOpenError) for `reset_timeout_seconds`
+        half open: after the timeout one probe call goes through, success closes the circuit, failure opens it again
+        only errors `is_failure` accepts count (an outage, not a bad request), the others are re-raised untouched
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 60, is_failure=None, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.is_failure = is_failure or (lambda error: True)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self.opens = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected, without using up the half open probe"""
+        with self._lock:
+            if self.state == OPEN:
+                return self.clock() - self.opened_at < self.reset_timeout_seconds
+            return self.state == HALF_OPEN and self._probe_in_flight
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                    print(f"Circuit breaker opened after {self.consecutive_failures} failures, "
+                          f"retrying in {self.reset_timeout_seconds}s")
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self._probe_in_flight = False
+
+    @contextmanager
+    def guard(self):
+        """run the call inside under the breaker (works around an await too)"""
+        if not self.allow_request():
+            raise CircuitOpenError(f"circuit open since {self.clock() - self.opened_at:.1f}s")
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                # the service answered, just not with what we wanted
+                self.record_success()
+            raise
+        self.record_success()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'opens': self.opens,
+                'rejected_calls': self.rejected,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+            self.opens = 0
+            self.rejected = 0
@@ -0,0 +1,169 @@
+"""
+latency, token, error and cost accounting of every LLM call (agents, transcription, embeddings)
+per agent and per message source, exposed by GET /metrics
+
+the source and the per message totals come from the message being processed: MessageService wraps its work in
+message_usage(source), every call recorded inside adds to that message's MessageUsage (stored on the content row
+when llm_usage_per_content is on). contextvars, so it follows the poller threads and the async tasks alike
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+# upper bounds of the latency histogram buckets (ms), the last one catches everything slower
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000, float("inf"))
+# USD per million tokens (per minute of audio for transcription models), overridable in config.json "llm_pricing"
+DEFAULT_LLM_PRICING = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "text-embedding-3-small": {"input": 0.02},
+    "whisper-1": {"per_minute": 0.006},
+}
+
+
+@dataclass
+class MessageUsage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+    cost_usd: float = 0.0
+
+    def content_columns(self) -> dict:
+        return {
+            'llm_prompt_tokens': self.prompt_tokens,
+            'llm_completion_tokens': self.completion_tokens,
+            'llm_latency_ms': round(self.latency_ms),
+            'llm_cost_usd': round(self.cost_usd, 8),
+        }
+
+
+_current_source: ContextVar[str] = ContextVar("llm_source", default="unknown")
+_current_usage: ContextVar[MessageUsage] = ContextVar("llm_message_usage", default=None)
+
+
+@contextmanager
+def message_usage(source: str):
+    """attribute the LLM calls made inside to `source` and sum them up for the message"""
+    usage = MessageUsage()
+    source_token, usage_token = _current_source.set(source), _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_source.reset(source_token)
+        _current_usage.reset(usage_token)
+
+
+def _new_stats() -> dict:
+    return {
+        'calls': 0, 'errors': 0, 'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0,
+        'audio_seconds': 0.0, 'cost_usd': 0.0, 'cache_savings_usd': 0.0, 'latency_ms_sum': 0.0,
+        'cache_hit_calls': 0, 'cache_hit_latency_ms_sum': 0.0, 'cache_miss_calls': 0, 'cache_miss_latency_ms_sum': 0.0,
+        'latency_ms_buckets': [0] * len(LATENCY_BUCKETS_MS),
+    }
+
+
+class LLMMetrics:
+    def __init__(self, pricing: dict = None):
+        self.pricing = {**DEFAULT_LLM_PRICING, **(pricing or {})}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def configure_pricing(self, pricing: dict):
+        """set the process wide prices, called by the OpenAI clients with the config.json values"""
+        self.pricing = {**DEFAULT_LLM_PRICING, **(pricing or {})}
+
+    def estimate_cost(self, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                      cached_prompt_tokens: int = 0, audio_seconds: float = 0.0) -> float:
+        price = self.pricing.get(model, {})
+        uncached = prompt_tokens - cached_prompt_tokens
+        return (
+            uncached * price.get("input", 0.0)
+            + cached_prompt_tokens * price.get("cached_input", price.get("input", 0.0))
+            + completion_tokens * price.get("output", 0.0)
+        ) / 1_000_000 + (audio_seconds or 0.0) / 60 * price.get("per_minute", 0.0)
+
+    def record(self, agent: str, model: str, latency_seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+               cached_prompt_tokens: int = 0, audio_seconds: float = None, error: bool = False, source: str = None):
+        source = source or _current_source.get()
+        latency_ms = latency_seconds * 1000
+        cost = 0.0 if error else self.estimate_cost(model, prompt_tokens, completion_tokens, cached_prompt_tokens, audio_seconds)
+        # what the cached prefix would have cost at the full input price
+        cache_savings = self.estimate_cost(model, prompt_tokens, completion_tokens, 0, audio_seconds) - cost if cached_prompt_tokens else 0.0
+        with self._lock:
+            stats = self._stats.setdefault((agent, source), _new_stats())
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['prompt_tokens'] += prompt_tokens
+            stats['cached_prompt_tokens'] += cached_prompt_tokens
+            stats['completion_tokens'] += completion_tokens
+            stats['audio_seconds'] += audio_seconds or 0.0
+            stats['cost_usd'] += cost
+            stats['cache_savings_usd'] += cache_savings
+            stats['latency_ms_sum'] += latency_ms
+            if not error and prompt_tokens:
+                outcome = 'cache_hit' if cached_prompt_tokens else 'cache_miss'
+                stats[f'{outcome}_calls'] += 1
+                stats[f'{outcome}_latency_ms_sum'] += latency_ms
+            stats['latency_ms_buckets'][next(i for i, bound in enumerate(LATENCY_BUCKETS_MS) if latency_ms <= bound)] += 1
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.calls += 1
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+            usage.latency_ms += latency_ms
+            usage.cost_usd += cost
+
+    @contextmanager
+    def track(self, agent: str, model: str, audio_seconds: float = None):
+        """
+        time the call made inside, the caller sets call['usage'] to the response's usage,
+        an exception counts as an error (and is re-raised)
+        """
+        call = {'usage': None}
+        start = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            self.record(agent, model, time.perf_counter() - start, audio_seconds=audio_seconds, error=True)
+            raise
+        usage = call['usage']
+        prompt_details = getattr(usage, 'prompt_tokens_details', None)
+        self.record(
+            agent, model, time.perf_counter() - start,
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+            completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+            cached_prompt_tokens=getattr(prompt_details, 'cached_tokens', 0) or 0,
+            audio_seconds=audio_seconds,
+        )
+
+    def snapshot(self) -> dict:
+        """
+        {agent: {source: stats}} with the histogram as {"le_<ms>": count}, the mean latency,
+        and the prompt cache effect: share of prompt tokens served from the cache and mean latency with / without a hit
+        """
+        with self._lock:
+            stats = {key: {**value, 'latency_ms_buckets': list(value['latency_ms_buckets'])} for key, value in self._stats.items()}
+        result = {}
+        for (agent, source), value in sorted(stats.items()):
+            buckets = value.pop('latency_ms_buckets')
+            value['latency_ms_mean'] = value['latency_ms_sum'] / value['calls'] if value['calls'] else 0.0
+            value['latency_ms_histogram'] = {
+                f"le_{'inf' if bound == float('inf') else int(bound)}": count for bound, count in zip(LATENCY_BUCKETS_MS, buckets)
+            }
+            value['cost_usd'] = round(value['cost_usd'], 8)
+            value['cache_savings_usd'] = round(value['cache_savings_usd'], 8)
+            value['cached_prompt_ratio'] = value['cached_prompt_tokens'] / value['prompt_tokens'] if value['prompt_tokens'] else 0.0
+            for outcome in ('cache_hit', 'cache_miss'):
+                latency_sum = value.pop(f'{outcome}_latency_ms_sum')
+                value[f'latency_ms_mean_{outcome}'] = latency_sum / value[f'{outcome}_calls'] if value[f'{outcome}_calls'] else None
+            result.setdefault(agent, {})[source] = value
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+llm_metrics = LLMMetrics()
@@ -0,0 +1,105 @@
+"""
+64 bit SimHash fingerprints for near-duplicate detection (same announcement forwarded / slightly edited / sent
+through both email and telegram)
+near texts get fingerprints that differ in only a few bits, so "near" is a small hamming distance.
+the fingerprint is also split into bands stored in their own indexed columns (up to FINGERPRINT_BANDS of them):
+with max_distance + 1 bands two fingerprints within max_distance always share at least one whole band (pigeonhole),
+so candidates are found with an indexed equality lookup and only those are compared bit by bit.
+the bands are sized to near_duplicate.max_distance, fewer and wider bands match fewer unrelated rows
+(an unrelated row shares a band with probability ~bands / 2**band_bits: 7 bands of 9 bits for distance 6 ~1.4%,
+4 bands of 16 bits for distance 3 ~0.006%). changing max_distance changes the layout, the stored bands then need
+python -m scripts.rebuild_fingerprint_bands
+messages are short, so features are character 4-grams of the normalized text (word features flip too many bits
+per edit), with them a forward/re-worded copy lands at ~2-6 bits and unrelated messages at ~17+
+"""
+
+import hashlib
+import re
+
+FINGERPRINT_BITS = 64
+# band columns on the content table, the most bands a layout can use (so max_distance < FINGERPRINT_BANDS)
+FINGERPRINT_BANDS = 8
+# at least 3 bands keeps them within 22 bits, the band columns are 32 bit integers
+MIN_BANDS = 3
+DEFAULT_MAX_DISTANCE = 6
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SHINGLE_SIZE = 4
+
+
+def _features(text: str) -> list[str]:
+    # punctuation, case and whitespace differences ("Fwd:", "!!") should not count as edits
+    normalized = " ".join(_TOKEN_RE.findall(text.lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return [normalized] if normalized else []
+    return [normalized[index:index + SHINGLE_SIZE] for index in range(len(normalized) - SHINGLE_SIZE + 1)]
+
+
+def token_count(text: str) -> int:
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+def simhash(text: str) -> int:
+    """Unsigned 64 bit SimHash of `text` (0 for text without words)"""
+    weights = [0] * FINGERPRINT_BITS
+    for feature in _features(text or ""):
+        feature_hash = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if feature_hash >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return bin((first ^ second) & ((1 << FINGERPRINT_BITS) - 1)).count("1")
+
+
+def band_layout(max_distance: int) -> list[tuple[int, int]]:
+    """(shift, bits) of each band for lookups up to `max_distance` bits apart: max_distance + 1 bands, as wide as possible"""
+    if not 0 <= max_distance < FINGERPRINT_BANDS:
+        raise ValueError(f"near-duplicate max_distance must be between 0 and {FINGERPRINT_BANDS - 1}, got {max_distance}")
+    bands = max(max_distance + 1, MIN_BANDS)
+    layout, shift = [], 0
+    for band in range(bands):
+        bits = FINGERPRINT_BITS // bands + (1 if band < FINGERPRINT_BITS % bands else 0)
+        layout.append((shift, bits))
+        shift += bits
+    return layout
+
+
+_layout = band_layout(DEFAULT_MAX_DISTANCE)
+
+
+def configure_fingerprint_bands(max_distance: int):
+    """Set the process wide band layout, called once from db.py (and the migration) with near_duplicate.max_distance"""
+    _layout[:] = band_layout(max_distance)
+
+
+def fingerprint_band_count() -> int:
+    """bands of the current layout, lookups find every fingerprint less than this many bits apart"""
+    return len(_layout)
+
+
+def fingerprint_bands(fingerprint: int, layout: list[tuple[int, int]] = None) -> list[int]:
+    return [(fingerprint >> shift) & ((1 << bits) - 1) for shift, bits in layout or _layout]
+
+
+def band_columns(fingerprint: int, layout: list[tuple[int, int]] = None) -> dict:
+    """fingerprint_band_<n> column values of the (unsigned) fingerprint, the columns the layout doesn't use are None"""
+    bands = fingerprint_bands(fingerprint, layout) if fingerprint is not None else []
+    return {f'fingerprint_band_{band}': bands[band] if band < len(bands) else None for band in range(FINGERPRINT_BANDS)}
+
+
+def to_signed(fingerprint: int) -> int:
+    """the databases only have signed 64 bit integers, store the fingerprint as its two's complement"""
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >= 1 << (FINGERPRINT_BITS - 1) else fingerprint
+
+
+def to_unsigned(fingerprint: int) -> int:
+    return fingerprint + (1 << FINGERPRINT_BITS) if fingerprint < 0 else fingerprint
+
+
+def fingerprint_columns(text: str, min_tokens: int = 5) -> dict:
+    """Content column values for the fingerprint of `text`, all None when the text is too short to compare"""
+    if token_count(text) < min_tokens:
+        return {'fingerprint': None, **band_columns(None)}
+    fingerprint = simhash(text)
+    return {'fingerprint': to_signed(fingerprint), **band_columns(fingerprint)}
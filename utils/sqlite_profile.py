@@ -0,0 +1,67 @@
+"""
+SQLite performance profile, applied to every new connection through an engine connect event
+the defaults trade a little durability on power loss (synchronous=NORMAL in WAL mode) for much better
+write throughput, and WAL lets the API read while the pollers write
+"""
+
+import threading
+from sqlalchemy import event, text
+
+DEFAULT_SQLITE_PROFILE = {
+    "enabled": True,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,      # 256MB of the db file mapped in memory
+    "cache_size": -65536,        # negative means KiB, so 64MB page cache per connection
+    "busy_timeout": 5000,        # ms to wait on a lock instead of failing with "database is locked"
+    "temp_store": "MEMORY",
+    "optimize_interval_seconds": 3600,
+}
+
+_PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout", "temp_store")
+
+
+def sqlite_profile_from_config(config_json: dict) -> dict:
+    return {**DEFAULT_SQLITE_PROFILE, **config_json.get("sqlite_profile", {})}
+
+
+def apply_sqlite_profile(engine, profile: dict):
+    """Register the PRAGMAs on `engine` (sync engine or AsyncEngine.sync_engine), no-op for other databases"""
+    if engine.dialect.name != "sqlite" or not profile.get("enabled", True):
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in _PRAGMAS:
+                value = profile.get(pragma)
+                if value is not None:
+                    cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
+
+
+def optimize_sqlite(engine):
+    """PRAGMA optimize refreshes the query planner statistics only where they are worth it, cheap to run often"""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as connection:
+        connection.execute(text("PRAGMA optimize"))
+
+
+def start_optimize_scheduler(engine, interval_seconds: int) -> threading.Event:
+    """Run optimize_sqlite every `interval_seconds` on a daemon thread, set the returned event to stop it"""
+    stop_event = threading.Event()
+    if engine.dialect.name != "sqlite" or not interval_seconds:
+        return stop_event
+
+    def _loop():
+        while not stop_event.wait(interval_seconds):
+            try:
+                optimize_sqlite(engine)
+            except Exception as e:
+                print(f"Error running PRAGMA optimize: {e}")
+
+    threading.Thread(target=_loop, daemon=True).start()
+    return stop_event
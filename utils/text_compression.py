@@ -0,0 +1,68 @@
+"""
+transparent compression for the large text columns (Content.content_data / content_html)
+a compressed value is stored as MAGIC + codec id + ':' + base85(zlib(utf-8 text)), so it still fits a TEXT column
+on every database, and any value without the magic prefix (legacy rows, short values) is returned as it is.
+plain text that happens to start with MAGIC is never stored raw, it is escaped as MAGIC + 'p:' + text
+"""
+
+import base64
+import zlib
+
+MAGIC = "\x1fZ"              # unit separator, never part of real message text
+CODEC_ZLIB = "z"
+CODEC_PLAIN = "p"            # escaped plain text, for values that start with MAGIC themselves
+
+DEFAULT_TEXT_COMPRESSION = {
+    "enabled": True,
+    "threshold_bytes": 1024,     # values smaller than this stay plain text
+    "level": 6,
+}
+
+_settings = dict(DEFAULT_TEXT_COMPRESSION)
+
+
+def text_compression_from_config(config_json: dict) -> dict:
+    return {**DEFAULT_TEXT_COMPRESSION, **config_json.get("text_compression", {})}
+
+
+def configure_text_compression(settings: dict):
+    """Set the process wide threshold/level, called once from db.py (and the migration) with the config.json values"""
+    _settings.update(settings)
+
+
+def is_compressed(value) -> bool:
+    return isinstance(value, str) and value.startswith(MAGIC)
+
+
+def compress_text(value, settings: dict = None):
+    """the stored form of a plain text value (the input is always plain text, never an already stored value)"""
+    settings = settings or _settings
+    if value is None:
+        return value
+    # text starting with the marker itself must not be mistaken for a compressed value on read
+    plain = f"{MAGIC}{CODEC_PLAIN}:{value}" if is_compressed(value) else value
+    if not settings.get("enabled", True):
+        return plain
+    raw = value.encode("utf-8")
+    if len(raw) < settings.get("threshold_bytes", 1024):
+        return plain
+    encoded = f"{MAGIC}{CODEC_ZLIB}:" + base64.b85encode(zlib.compress(raw, settings.get("level", 6))).decode("ascii")
+    # incompressible text (already short, random ids...) is kept plain instead of growing
+    return encoded if len(encoded) < len(plain) else plain
+
+
+def decompress_text(value):
+    """the plain text of a stored value, a value that can't be decoded is returned as it is (and logged)"""
+    if not is_compressed(value):
+        return value
+    codec, _, payload = value[len(MAGIC):].partition(":")
+    if codec == CODEC_PLAIN:
+        return payload
+    try:
+        if codec != CODEC_ZLIB:
+            raise ValueError(f"unknown codec {codec!r}")
+        return zlib.decompress(base64.b85decode(payload)).decode("utf-8")
+    except Exception as e:
+        # a raw value written before marker-prefixed text was escaped, better shown as stored than breaking the read
+        print(f"Could not decompress text value, returning it as stored: {e}")
+        return value
@@ -0,0 +1,87 @@
+"""
+utils.text_utils.clean_text with the cleaned result marked (CleanedText), so the later stages
+(classification kwargs, agent input) don't clean the same text again, and a batch API that cleans repeated texts once.
+a single text is cleaned the same way as the original: a precompiled pattern with a replacement table and
+str.translate were both measured (benchmarks/bench_text_normalization.py) and were no faster, slower on
+non-latin scripts, the saving is only in not cleaning a text twice
+"""
+
+import re
+import unicodedata
+
+# windows-1252 punctuation that ends up as C1 control characters
+_REPLACEMENTS = {
+    '\x9d': "'",
+    '\x9c': '"',
+    '\x93': '"',
+    '\x94': '"',
+    '\x91': "'",
+    '\x92': "'",
+    '\x85': '...',
+    '\x96': '-',
+    '\x97': '--',
+}
+# control characters except \t \n \r (those are whitespace and collapsed below)
+_CONTROL_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+
+
+class CleanedText(str):
+    """a str that already went through clean_text, cleaning it again returns it as is"""
+    __slots__ = ()
+
+
+def _clean(text: str) -> str:
+    text = unicodedata.normalize('NFKC', text)
+    for character, replacement in _REPLACEMENTS.items():
+        text = text.replace(character, replacement)
+    text = _CONTROL_RE.sub('', text)
+    return ' '.join(text.split())
+
+
+def clean_text(text) -> str:
+    """
+    Clean and normalize text to handle encoding issues and special characters.
+    """
+    if not text:
+        return ""
+    if isinstance(text, CleanedText):
+        return text
+    try:
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', errors='ignore')
+        return CleanedText(_clean(text))
+    except Exception as e:
+        print(f"Warning: Error cleaning text: {e}")
+        try:
+            return text.encode('utf-8', errors='ignore').decode('utf-8')
+        except Exception:
+            return str(text)[:1000]
+
+
+def clean_many(texts) -> list[str]:
+    """clean_text over a batch, texts repeated in the batch (signatures, templates) are cleaned once"""
+    cleaned = {}
+    results = []
+    for text in texts:
+        if isinstance(text, str) and not isinstance(text, CleanedText):
+            if text not in cleaned:
+                cleaned[text] = clean_text(text)
+            results.append(cleaned[text])
+        else:
+            results.append(clean_text(text))
+    return results
+
+
+def clean_payload(data: dict) -> dict:
+    """clean_text on every string of a (nested) payload, lists included"""
+    cleaned_data = {}
+    for key, value in data.items():
+        if isinstance(value, str):
+            cleaned_data[key] = clean_text(value)
+        elif isinstance(value, dict):
+            cleaned_data[key] = clean_payload(value)
+        elif isinstance(value, list):
+            cleaned_data[key] = [clean_text(item) if isinstance(item, str) else item for item in value]
+        else:
+            cleaned_data[key] = value
+    return cleaned_data
@@ -0,0 +1,92 @@
+"""
+token estimates for the text we send to the LLM agents
+uses tiktoken when it is installed (optional, not in requirements.txt), otherwise the usual ~4 characters per token
+and the truncation strategies used to keep agent inputs inside their token budget (ai_agents/<agent>/budget.json)
+"""
+
+import re
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+CHARS_PER_TOKEN = 4
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _head(text: str, max_tokens: int) -> str:
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+def _tail(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[-max_tokens:])
+    return text[-max_tokens * CHARS_PER_TOKEN:]
+
+
+def _cut_at_word(text: str, from_end: bool = False) -> str:
+    """don't leave half a word at the cut (only looks a few characters back)"""
+    if from_end:
+        index = text.find(" ", 0, 20)
+        return text[index + 1:] if index >= 0 else text
+    index = text.rfind(" ", max(len(text) - 20, 0))
+    return text[:index] if index > 0 else text
+
+
+def truncate_head(text: str, max_tokens: int, marker: str = " [...]", **_) -> str:
+    return _cut_at_word(_head(text, max_tokens - estimate_tokens(marker))) + marker
+
+
+def truncate_head_tail(text: str, max_tokens: int, head_ratio: float = 0.7, marker: str = " [...] ", **_) -> str:
+    """keep the start (greeting, ask) and the end (deadline, sign-off) of a long message"""
+    available = max_tokens - estimate_tokens(marker)
+    head_tokens = int(available * head_ratio)
+    return (
+        _cut_at_word(_head(text, head_tokens)) + marker
+        + _cut_at_word(_tail(text, available - head_tokens), from_end=True)
+    )
+
+
+def truncate_first_sentences(text: str, max_tokens: int, marker: str = " [...]", **_) -> str:
+    """as many whole sentences from the start as fit, falls back to a plain head cut for one huge sentence"""
+    available = max_tokens - estimate_tokens(marker)
+    kept, used = [], 0
+    for sentence in _SENTENCE_RE.split(text):
+        tokens = estimate_tokens(sentence) + 1
+        if used + tokens > available:
+            break
+        kept.append(sentence)
+        used += tokens
+    if not kept:
+        return truncate_head(text, max_tokens, marker)
+    return " ".join(kept) + marker
+
+
+TRUNCATION_STRATEGIES = {
+    "head": truncate_head,
+    "head_tail": truncate_head_tail,
+    "first_sentences": truncate_first_sentences,
+}
+
+
+def truncate_to_tokens(text: str, max_tokens: int, strategy: str = "head_tail", **options) -> str:
+    """`text` itself when it fits in `max_tokens`, otherwise cut down with one of TRUNCATION_STRATEGIES"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if strategy not in TRUNCATION_STRATEGIES:
+        raise ValueError(f"Unknown truncation strategy: {strategy}. Available: {list(TRUNCATION_STRATEGIES)}")
+    return TRUNCATION_STRATEGIES[strategy](text, max_tokens, **options)